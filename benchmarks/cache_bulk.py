@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Per-key vs. bulk throughput of the result cache, on a `diskcache.Cache` configured the same
+way as in `process_files`. Values look like per-example ROUGE scores.
+
+Usage: python benchmarks/cache_bulk.py [--size 100000]
+"""
+
+from argparse import ArgumentParser
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gem_metrics.cache import (
+    content_digest,
+    get_many,
+    open_cache,
+    set_many,
+)  # noqa: E402
+
+
+def make_items(size: int, prefix: str):
+    score = {"precision": 0.5, "recall": 0.25, "fmeasure": 0.33333}
+    return {
+        ("ROUGE", content_digest(prefix, i)): {
+            rouge_type: dict(score) for rouge_type in ["rouge1", "rouge2", "rougeL"]
+        }
+        for i in range(size)
+    }
+
+
+def timed(label: str, size: int, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16}{elapsed:>10.2f}s{size / elapsed:>14.0f} keys/s")
+
+
+def main():
+    ap = ArgumentParser(description="diskcache per-key vs. bulk throughput benchmark")
+    ap.add_argument("--size", type=int, default=100000)
+    args = ap.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="gem_metrics_cache_bench_")
+    try:
+        cache = open_cache(cache_dir)
+        per_key_items = make_items(args.size, "per-key")
+        bulk_items = make_items(args.size, "bulk")
+
+        def write_per_key():
+            for key, value in per_key_items.items():
+                cache[key] = value
+
+        def read_per_key():
+            for key in per_key_items:
+                cache.get(key, None)
+
+        print(f"{args.size} items")
+        timed("per-key write", args.size, write_per_key)
+        timed("bulk write", args.size, lambda: set_many(cache, bulk_items))
+        timed("per-key read", args.size, read_per_key)
+        timed("bulk read", args.size, lambda: get_many(cache, list(bulk_items)))
+        cache.close()
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+chrF, chrF+ and chrF++ statistics: one sacrebleu pass per variant (the previous
+`CHRF.compute`) vs. the single-pass `ChrfEngine`, on synthetic sentences with several
+references each.
+
+Usage: python benchmarks/chrf.py [--examples 2000] [--refs 3]
+"""
+
+from argparse import ArgumentParser
+from itertools import zip_longest
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gem_metrics.chrf import CHRF  # noqa: E402
+
+WORDS = (
+    "a an the man woman dog cat sits stands on near in front of table street field "
+    "red blue small large is are with two people ball playing holding looking"
+).split()
+
+
+def random_sentence(rnd: random.Random) -> str:
+    words = [rnd.choice(WORDS) for _ in range(rnd.randint(8, 25))]
+    return " ".join(words).capitalize() + "."
+
+
+def main():
+    ap = ArgumentParser(description="chrF benchmark")
+    ap.add_argument("--examples", type=int, default=2000)
+    ap.add_argument("--refs", type=int, default=3, help="References per example")
+    args = ap.parse_args()
+
+    rnd = random.Random(0)
+    hyps = [random_sentence(rnd) for _ in range(args.examples)]
+    refs = [[random_sentence(rnd) for _ in range(args.refs)] for _ in hyps]
+    metric = CHRF()
+
+    start = time.perf_counter()
+    ref_streams = list(zip_longest(*refs))
+    per_variant = {
+        key: variant._extract_corpus_statistics(hyps, ref_streams)
+        for key, variant in metric.metrics.items()
+    }
+    per_variant_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stats = [metric.engine.segment_statistics(h, r) for h, r in zip(hyps, refs)]
+    engine_time = time.perf_counter() - start
+
+    for key in metric.metrics:
+        assert [s[key] for s in stats] == per_variant[key], "Statistics differ"
+    print(f"{args.examples} examples, {args.refs} references each")
+    print(f"{'per variant':>12}{'engine':>10}{'speedup':>10}")
+    print(
+        f"{per_variant_time:>11.2f}s{engine_time:>9.2f}s"
+        f"{per_variant_time / engine_time:>9.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+CIDEr scoring time: the original per-n-gram implementation (`CIDER.compute_score`) vs.
+the vectorized `CiderEngine`, on synthetic captions with several references each.
+The n-gram counting (shared by both, and cached per example) is not included.
+
+Usage: python benchmarks/cider.py [--sizes 1000 10000] [--refs 5]
+"""
+
+from argparse import ArgumentParser
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gem_metrics.cider import CIDER, CiderEngine  # noqa: E402
+
+WORDS = (
+    "a an the man woman dog cat sits stands on near in front of table street field "
+    "red blue small large is are with two people ball playing holding looking"
+).split()
+
+
+def random_caption(rnd: random.Random):
+    return [rnd.choice(WORDS) for _ in range(rnd.randint(8, 16))]
+
+
+def main():
+    ap = ArgumentParser(description="CIDEr benchmark")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    ap.add_argument("--refs", type=int, default=5, help="References per example")
+    args = ap.parse_args()
+
+    rnd = random.Random(0)
+    metric = CIDER()
+    print(f"{'examples':>9}{'original':>11}{'engine':>10}{'speedup':>10}")
+    for size in args.sizes:
+        ctest = [dict(metric.cook_test(random_caption(rnd))) for _ in range(size)]
+        crefs = [
+            [
+                dict(ref)
+                for ref in metric.cook_refs(
+                    [random_caption(rnd) for _ in range(args.refs)]
+                )
+            ]
+            for _ in range(size)
+        ]
+
+        metric.reset()
+        metric.ctest = [dict(test) for test in ctest]
+        metric.crefs = [[dict(ref) for ref in refs] for refs in crefs]
+        start = time.perf_counter()
+        _, original = metric.compute_score()
+        original_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        engine = CiderEngine(crefs).scores(ctest)
+        engine_time = time.perf_counter() - start
+
+        assert np.allclose(original, engine), "CiderEngine scores differ"
+        print(
+            f"{size:>9}{original_time:>10.2f}s{engine_time:>9.2f}s"
+            f"{original_time / engine_time:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
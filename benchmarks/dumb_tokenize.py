@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Throughput of `tokenize.dumb_tokenize` vs. the original implementation (one `re.sub` pass
+per rule, kept below for comparison), on synthetic texts of different lengths.
+
+Usage: python benchmarks/dumb_tokenize.py [--texts 20000] [--sentences 1 3 10]
+"""
+
+from argparse import ArgumentParser
+import os
+import random
+import re
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gem_metrics.tokenize import dumb_tokenize_many  # noqa: E402
+
+WORDS = (
+    "the a cat dog sat on mat near city centre restaurant food is good bad cheap "
+    "expensive family friendly not , . and with it's don't (really) $5 -- e.g. 3.5 "
+    "well-known «quoted» гонка ciudad 中文"
+).split()
+
+
+def legacy_dumb_tokenize(text: str) -> List[str]:
+    """Original `dumb_tokenize` -- one regex pass over the text per rule."""
+
+    toks = text
+    # separate quotes everywhere
+    toks = re.sub(r'(["<>{}“”«»–|—„‚‘]|\[|\]|``|\'\'|‘‘|\^)', r" \1 ", toks)
+
+    # the following characters (double-characters) are separated everywhere (except inside URLs)
+    toks = re.sub(r"([;!()?#\$£%&*…]|--)", r" \1 ", toks)
+
+    # short hyphen is separated if it is followed or preceeded by non-alphanuneric character and
+    # is not a part of --, or a unary minus
+    toks = re.sub(r"([^\-\w])\-([^\-0-9])", r"\1 - \2", toks)
+    toks = re.sub(
+        r"([0-9]\s+)\-([0-9])", r"\1 - \2", toks
+    )  # preceded by a number - not a unary minus
+    toks = re.sub(r"([^\-])\-([^\-\w])", r"\1 - \2", toks)
+
+    # plus is separated everywhere, except at the end of a word (separated by a space) and as unary plus
+    toks = re.sub(r"(\w)\+(\w)", r"\1 + \2", toks)
+    toks = re.sub(r"([0-9]\s*)\+([0-9])", r"\1 + \2", toks)
+    toks = re.sub(r"\+([^\w\+])", r"+ \1", toks)
+
+    # apostrophe is separated if it is followed or preceeded by non-alphanumeric character,
+    # is not part of '', and is not followed by a digit (e.g. '60).
+    toks = re.sub(r"([^\'’\w])([\'’])([^\'’\d])", r"\1 \2 \3", toks)
+    toks = re.sub(r"([^\'’])([\'’])([^\'’\w])", r"\1 \2 \3", toks)
+
+    # dot, comma, slash, and colon are separated if they do not connect two numbers
+    toks = re.sub(r"(\D|^)([\.,:\/])", r"\1 \2", toks)
+    toks = re.sub(r"([\.,:\/])(\D|$)", r"\1 \2", toks)
+
+    # three dots belong together
+    toks = re.sub(r"\.\s*\.\s*\.", r"...", toks)
+
+    # most common contractions
+    toks = re.sub(r"([\'’´])(s|m|d|ll|re|ve)\s", r" \1\2 ", toks)  # I'm, I've etc.
+    toks = re.sub(r"(n[\'’´]t\s)", r" \1 ", toks)  # do n't
+
+    # other contractions, as implemented in Treex
+    toks = re.sub(r" ([Cc])annot\s", r" \1an not ", toks)
+    toks = re.sub(r" ([Dd])\'ye\s", r" \1\' ye ", toks)
+    toks = re.sub(r" ([Gg])imme\s", r" \1im me ", toks)
+    toks = re.sub(r" ([Gg])onna\s", r" \1on na ", toks)
+    toks = re.sub(r" ([Gg])otta\s", r" \1ot ta ", toks)
+    toks = re.sub(r" ([Ll])emme\s", r" \1em me ", toks)
+    toks = re.sub(r" ([Mm])ore\'n\s", r" \1ore \'n ", toks)
+    toks = re.sub(r" \'([Tt])is\s", r" \'\1 is ", toks)
+    toks = re.sub(r" \'([Tt])was\s", r" \'\1 was ", toks)
+    toks = re.sub(r" ([Ww])anna\s", r" \1an na ", toks)
+
+    # clean extra space
+    toks = re.sub(r"\s+", " ", toks)
+    toks = toks.strip()
+    return toks.split(" ")
+
+
+def random_text(rnd: random.Random, num_sentences: int) -> str:
+    return " ".join(
+        " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(10, 30))).capitalize()
+        + "."
+        for _ in range(num_sentences)
+    )
+
+
+def timed(func, texts):
+    start = time.perf_counter()
+    result = func(texts)
+    return time.perf_counter() - start, result
+
+
+def main():
+    ap = ArgumentParser(description="dumb_tokenize throughput benchmark")
+    ap.add_argument("--texts", type=int, default=20000)
+    ap.add_argument("--sentences", type=int, nargs="+", default=[1, 3, 10])
+    args = ap.parse_args()
+
+    rnd = random.Random(0)
+    print(f"{'sentences':>10}{'original':>12}{'new':>12}{'speedup':>10}  (texts/s)")
+    for num_sentences in args.sentences:
+        texts = [random_text(rnd, num_sentences) for _ in range(args.texts)]
+        old_time, old = timed(lambda t: [legacy_dumb_tokenize(x) for x in t], texts)
+        new_time, new = timed(dumb_tokenize_many, texts)
+        assert old == new, "Outputs differ"
+        print(
+            f"{num_sentences:>10}{len(texts) / old_time:>12.0f}{len(texts) / new_time:>12.0f}"
+            f"{old_time / new_time:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Word-level edit distance: the previous WER implementation (full DP matrix filled in a
+Python double loop; with int32 instead of uint8 cells so that it is correct on long
+texts) vs. the bit-parallel `edit_distance` module, on synthetic documents.
+
+Usage: python benchmarks/edit_distance.py [--tokens 1000] [--pairs 5]
+
+Tokens are interned IDs, as in `WER.compute`.
+"""
+
+from argparse import ArgumentParser
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gem_metrics.edit_distance import edit_distance, word_error_rates  # noqa: E402
+
+
+def legacy_edit_distance(r, h):
+    """The previous `WER.get_wer` distance computation (with int32 cells)."""
+    d = np.zeros((len(r) + 1) * (len(h) + 1), dtype=np.int32).reshape(
+        (len(r) + 1, len(h) + 1)
+    )
+    for i in range(len(r) + 1):
+        d[i][0] = i
+    for j in range(len(h) + 1):
+        d[0][j] = j
+    for i in range(1, len(r) + 1):
+        for j in range(1, len(h) + 1):
+            if r[i - 1] == h[j - 1]:
+                d[i][j] = d[i - 1][j - 1]
+            else:
+                substitute = d[i - 1][j - 1] + 1
+                insert = d[i][j - 1] + 1
+                delete = d[i - 1][j] + 1
+                d[i][j] = min(substitute, insert, delete)
+    return int(d[len(r)][len(h)])
+
+
+def random_document(rnd: random.Random, num_tokens: int, vocab_size: int = 2000):
+    return [rnd.randrange(vocab_size) for _ in range(num_tokens)]
+
+
+def perturb(rnd: random.Random, doc, rate: float = 0.3, vocab_size: int = 2000):
+    """Return a copy of the document with about `rate` of the tokens edited."""
+    out = []
+    for token in doc:
+        edit = rnd.random()
+        if edit < rate / 3:
+            continue  # deletion
+        if edit < 2 * rate / 3:
+            out.append(rnd.randrange(vocab_size))  # substitution
+        else:
+            out.append(token)
+        if rnd.random() < rate / 3:
+            out.append(rnd.randrange(vocab_size))  # insertion
+    return out
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    ap = ArgumentParser(description="Edit distance benchmark")
+    ap.add_argument("--tokens", type=int, default=1000, help="Tokens per document")
+    ap.add_argument("--pairs", type=int, default=5, help="Document pairs to compare")
+    args = ap.parse_args()
+
+    rnd = random.Random(0)
+    refs = [random_document(rnd, args.tokens) for _ in range(args.pairs)]
+    preds = [perturb(rnd, ref) for ref in refs]
+
+    legacy, legacy_time = timed(
+        lambda: [legacy_edit_distance(r, h) for r, h in zip(refs, preds)]
+    )
+    bitpar, bitpar_time = timed(
+        lambda: [edit_distance(r, h) for r, h in zip(refs, preds)]
+    )
+    assert legacy == bitpar, "Bit-parallel distances differ from the DP"
+    _, batch_time = timed(word_error_rates, preds, [[ref] for ref in refs])
+
+    print(f"{args.pairs} pairs of ~{args.tokens}-token documents")
+    print(f"{'method':<16}{'ms/pair':>10}{'speedup':>10}")
+    for label, elapsed in [
+        ("legacy DP", legacy_time),
+        ("bit-parallel", bitpar_time),
+        ("batch WER", batch_time),
+    ]:
+        print(
+            f"{label:<16}{elapsed / args.pairs * 1000:>10.2f}"
+            f"{legacy_time / elapsed:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
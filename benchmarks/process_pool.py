@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Wall-clock scaling of `process_submission` from 1 to N workers on a synthetic
+multi-dataset submission, for both the process and the thread backend.
+
+Usage: python benchmarks/process_pool.py [--datasets 8] [--size 500] [--max_workers 8] [--skew 1]
+
+Use `--skew N` to make the first dataset N times larger than the rest (as with xsum or
+wiki_lingua in a full GEM submission).
+"""
+
+from argparse import ArgumentParser
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import gem_metrics  # noqa: E402
+from gem_metrics.texts import References, Submission, release_caches  # noqa: E402
+
+import logzero  # noqa: E402
+
+WORDS = (
+    "the a cat dog sat on mat near city centre restaurant food is good bad cheap "
+    "expensive family friendly not , . and with"
+).split()
+
+LIGHT_METRICS = ["bleu", "rouge", "chrf", "nist", "ngrams", "ter", "local_recall"]
+
+
+def random_sentence(rnd: random.Random, length: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+
+def build_submission(num_datasets: int, size: int, skew: int = 1, seed: int = 0):
+    """Return (Submission, references dict) with `num_datasets` datasets of `size` instances
+    (the first one is `skew` times larger)."""
+    rnd = random.Random(seed)
+    tasks, refs = {}, {}
+    for ds_idx in range(num_datasets):
+        name = f"synthetic_{ds_idx}"
+        ids = [f"{name}-{i}" for i in range(size * (skew if ds_idx == 0 else 1))]
+        tasks[name] = {
+            "values": [
+                {"gem_id": i, "generated": random_sentence(rnd, rnd.randint(10, 30))}
+                for i in ids
+            ]
+        }
+        refs[name] = References(
+            {
+                "values": [
+                    {
+                        "gem_id": i,
+                        "target": [
+                            random_sentence(rnd, rnd.randint(10, 30)) for _ in range(2)
+                        ],
+                    }
+                    for i in ids
+                ]
+            }
+        )
+    submission = Submission(
+        {"submission_name": "benchmark", "param_count": 0, "tasks": tasks}
+    )
+    return submission, refs
+
+
+def main():
+    ap = ArgumentParser(description="process_submission worker scaling benchmark")
+    ap.add_argument("--datasets", type=int, default=8)
+    ap.add_argument("--size", type=int, default=500)
+    ap.add_argument("--skew", type=int, default=1)
+    ap.add_argument("--max_workers", type=int, default=os.cpu_count())
+    ap.add_argument("--backends", nargs="+", default=["process", "thread"])
+    args = ap.parse_args()
+
+    logzero.loglevel(logzero.WARNING)
+    metric_dict = gem_metrics.metric_list_to_metric_dict(LIGHT_METRICS)
+    empty_dict = gem_metrics.metric_list_to_metric_dict([])
+
+    worker_counts = sorted({1, 2, 4, 8, 16, 32, args.max_workers})
+    worker_counts = [n for n in worker_counts if n <= args.max_workers]
+
+    print(
+        f"{args.datasets} datasets x {args.size} instances (skew {args.skew}), "
+        f"metrics: {LIGHT_METRICS}"
+    )
+    print(f"{'backend':<10}{'workers':>8}{'seconds':>10}{'speedup':>10}")
+    for backend in args.backends:
+        baseline = None
+        for num_workers in worker_counts:
+            # the same data for every run, with nothing kept from the previous ones (the
+            # tokenization store, cached views and the vocabulary are process-wide)
+            release_caches()
+            submission, refs = build_submission(args.datasets, args.size, args.skew)
+            start = time.perf_counter()
+            gem_metrics.process_submission(
+                submission,
+                refs,
+                {},
+                metric_dict,
+                empty_dict,
+                num_threads=num_workers,
+                parallel_backend=backend,
+            )
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"{backend:<10}{num_workers:>8}{elapsed:>10.2f}{baseline / elapsed:>9.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
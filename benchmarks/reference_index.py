@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Scoring a new submission with corpus-level metrics (CIDEr, NIST), without and with the
+reference index, on synthetic captions with several references each. Each submission is
+different, so nothing is found in the per-example cache (none is used).
+
+- "no index": reference-side structures are computed for every submission,
+- "index, 1st": the first submission also builds and saves the index,
+- "index, next": later submissions (in a new run) load the index from disk.
+
+Usage: python benchmarks/reference_index.py [--examples 5000] [--refs 4]
+"""
+
+from argparse import ArgumentParser
+import os
+import random
+import sys
+import tempfile
+import time
+
+import logzero
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gem_metrics import compute_metric  # noqa: E402
+from gem_metrics.cider import CIDER  # noqa: E402
+from gem_metrics.nist import NIST  # noqa: E402
+from gem_metrics.reference_index import reference_index  # noqa: E402
+from gem_metrics.texts import Predictions, References  # noqa: E402
+
+WORDS = (
+    "a an the man woman dog cat sits stands on near in front of table street field "
+    "red blue small large is are with two people ball playing holding looking"
+).split()
+
+
+def random_caption(rnd: random.Random) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(8, 16)))
+
+
+def random_predictions(rnd: random.Random, num_examples: int) -> Predictions:
+    return Predictions(
+        {
+            "values": [
+                {"gem_id": f"id-{i}", "generated": random_caption(rnd)}
+                for i in range(num_examples)
+            ]
+        }
+    )
+
+
+def timed(metric_class, preds, refs):
+    start = time.perf_counter()
+    result = compute_metric(metric_class, preds, refs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    ap = ArgumentParser(description="Reference index benchmark")
+    ap.add_argument("--examples", type=int, default=5000)
+    ap.add_argument("--refs", type=int, default=4, help="References per example")
+    args = ap.parse_args()
+    logzero.loglevel(logzero.WARNING)
+
+    rnd = random.Random(0)
+    refs = References(
+        {
+            "values": [
+                {
+                    "gem_id": f"id-{i}",
+                    "target": [random_caption(rnd) for _ in range(args.refs)],
+                }
+                for i in range(args.examples)
+            ]
+        }
+    )
+    # tokenize the references before timing (shared by all variants)
+    refs.list_tokenized_lower_nopunct
+
+    print(f"{args.examples} examples, {args.refs} references each")
+    print(f"{'metric':<8}{'no index':>11}{'index, 1st':>13}{'index, next':>14}")
+    with tempfile.TemporaryDirectory() as folder:
+        for metric_class in [CIDER, NIST]:
+            preds = [random_predictions(rnd, args.examples) for _ in range(3)]
+            for pred in preds:
+                pred.list_tokenized_lower_nopunct
+            _, plain_time = timed(metric_class, preds[0], refs)
+            expected = compute_metric(metric_class, preds[2], refs)
+
+            reference_index.open(folder)
+            _, first_time = timed(metric_class, preds[1], refs)
+            # a new run: only what's on disk is available
+            reference_index.clear()
+            result, next_time = timed(metric_class, preds[2], refs)
+            reference_index.close()
+            assert result == expected, "Scores with the reference index differ"
+
+            print(
+                f"{metric_class.__name__:<8}{plain_time:>10.2f}s{first_time:>12.2f}s"
+                f"{next_time:>13.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Memory held by `Texts` objects with and without slim mode (`Texts.slim`, where the
+original instances in `all_data` are dropped after construction), on a synthetic
+submission made by scaling up `test_data/submission.json`.
+
+Usage: python benchmarks/texts_memory.py [--scale 1000]
+
+Two cases are measured: predictions from a submission file (loaded incrementally, keeping
+the used fields only) and references built from the same instances in memory, with all
+their fields (as read by `json.load`).
+"""
+
+from argparse import ArgumentParser
+import copy
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gem_metrics.texts import References, Submission, Texts  # noqa: E402
+
+SUBMISSION = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "test_data", "submission.json"
+)
+
+
+def scaled_submission(scale: int) -> dict:
+    """Return the test submission with each dataset repeated `scale` times (with unique
+    IDs and slightly different texts)."""
+    with open(SUBMISSION, encoding="UTF-8") as fh:
+        data = json.load(fh)
+    for dataset in data["tasks"].values():
+        values = []
+        for i in range(scale):
+            for j, item in enumerate(dataset["values"]):
+                item = copy.deepcopy(item)
+                item["gem_id"] = f"id-{i}-{j}"
+                item["generated"] = f"{item['generated']} ({i})"
+                values.append(item)
+        dataset["values"] = values
+    return data
+
+
+def load_predictions(filename: str) -> list:
+    submission = Submission(filename)
+    return [submission.predictions_for(ds) for ds in submission.datasets]
+
+
+def load_references(scale: int) -> list:
+    """References with the generated texts as targets, keeping all other fields."""
+    tasks = scaled_submission(scale)["tasks"]
+    for dataset in tasks.values():
+        for item in dataset["values"]:
+            item["target"] = item.pop("generated")
+    return [References(dataset) for dataset in tasks.values()]
+
+
+def held_memory(load) -> int:
+    """Bytes still allocated after loading (the loaded objects are kept alive)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        texts = load()
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del texts
+    return held
+
+
+def main():
+    ap = ArgumentParser(description="Texts memory benchmark (slim mode)")
+    ap.add_argument("--scale", type=int, default=1000)
+    args = ap.parse_args()
+
+    data = scaled_submission(args.scale)
+    num_instances = sum(len(ds["values"]) for ds in data["tasks"].values())
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "submission.json")
+        with open(filename, "w", encoding="UTF-8") as fh:
+            json.dump(data, fh)
+        file_size = os.path.getsize(filename)
+        del data
+
+        # warm up lazily loaded data (e.g. language codes), so it's not measured
+        held_memory(lambda: load_predictions(filename))
+
+        print(f"{num_instances} instances, {file_size / 2**20:.1f} MB file")
+        print(f"{'texts':<12}{'all_data':>12}{'slim':>12}{'saved':>8}")
+        for label, load in [
+            ("predictions", lambda: load_predictions(filename)),
+            ("references", lambda: load_references(args.scale)),
+        ]:
+            held = {}
+            for slim in (False, True):
+                Texts.slim = slim
+                held[slim] = held_memory(load)
+            print(
+                f"{label:<12}{held[False] / 2**20:>10.1f}MB{held[True] / 2**20:>10.1f}MB"
+                f"{1 - held[True] / held[False]:>8.0%}"
+            )
+        Texts.slim = False
+
+
+if __name__ == "__main__":
+    main()
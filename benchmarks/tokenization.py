@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Wall-clock time of serial vs. parallel batch tokenization (`tokenize.tokenize_batch`)
+across corpus sizes, on synthetic summary-length texts.
+
+Usage: python benchmarks/tokenization.py [--sizes 1000 10000 100000] [--workers 2 4 8]
+    [--tokenizer punkt|dumb]
+
+Parallel runs are forced (no size threshold), so that the break-even point is visible.
+"""
+
+from argparse import ArgumentParser
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gem_metrics.tokenize import (  # noqa: E402
+    default_tokenize_func,
+    dumb_tokenize,
+    tokenize_batch,
+)
+
+from pycountry import languages  # noqa: E402
+
+WORDS = (
+    "the a cat dog sat on mat near city centre restaurant food is good bad cheap "
+    "expensive family friendly not , . and with it's don't (really) $5 -- e.g."
+).split()
+
+
+def random_text(rnd: random.Random, num_sentences: int) -> str:
+    return " ".join(
+        " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(10, 30))).capitalize()
+        + "."
+        for _ in range(num_sentences)
+    )
+
+
+def main():
+    ap = ArgumentParser(description="Batch tokenization benchmark")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count()])
+    ap.add_argument("--sentences", type=int, default=3, help="Sentences per text")
+    ap.add_argument("--tokenizer", choices=["punkt", "dumb"], default="punkt")
+    args = ap.parse_args()
+
+    if args.tokenizer == "punkt":
+        func = default_tokenize_func(languages.get(alpha_2="en"))
+    else:
+        func = dumb_tokenize
+    rnd = random.Random(0)
+
+    print(f"tokenizer: {args.tokenizer}, {args.sentences} sentences per text")
+    print(f"{'texts':>8}{'workers':>8}{'seconds':>10}{'speedup':>10}")
+    for size in args.sizes:
+        texts = [random_text(rnd, args.sentences) for _ in range(size)]
+        start = time.perf_counter()
+        serial = tokenize_batch(func, texts, num_workers=1)
+        baseline = time.perf_counter() - start
+        print(f"{size:>8}{1:>8}{baseline:>10.2f}{1:>9.2f}x")
+        for num_workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            parallel = tokenize_batch(func, texts, num_workers, min_parallel=0)
+            elapsed = time.perf_counter() - start
+            assert parallel == serial, "Parallel tokenization differs from serial"
+            print(
+                f"{size:>8}{num_workers:>8}{elapsed:>10.2f}{baseline / elapsed:>9.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
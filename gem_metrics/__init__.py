@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 from argparse import ArgumentParser
+from collections import Counter, deque
+from contextlib import contextmanager
 from copy import copy
 from dataclasses import dataclass
 from gem_metrics.config import (
@@ -14,16 +16,25 @@ from gem_metrics.config import (
 )
 from diskcache import Cache
 import json
-from multiprocessing import Process, Manager
-from multiprocessing.pool import ThreadPool as Pool
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import queue
 
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import sys
 import traceback
 from logzero import logger
 
 # Data holder classes
-from .texts import Predictions, References, Sources, Submission
+from .texts import Predictions, References, Sources, Submission, Texts
+from .texts import release_caches, view_budget
+from .tokenize import tokenization_store, tokenizer_version
+
+# incremental loading of input files
+from .jsonstream import load_json
+
+# memory-mapped references/sources
+from .columnar import columnar_path, is_columnar
 
 # auto-download
 from .data import ensure_download
@@ -31,6 +42,18 @@ from .data import ensure_download
 # metric types (metrics are imported dynamically)
 from .metric import ReferencedMetric, ReferencelessMetric, SourceAndReferencedMetric
 
+# reusing metric instances across datasets
+from .metric import MetricPool
+
+# persisted reference-side structures of corpus-level metrics
+from .reference_index import reference_index
+
+# content-addressed cache keys
+from .cache import TieredCache, content_digest, open_cache, reopen_cache, texts_digest
+
+# splitting the work into (dataset, metric) tasks
+from .scheduler import Task, applicable_metrics, build_tasks
+
 
 def metric_list_to_metric_dict(metric_list: List[str]) -> Dict[str, List]:
     """
@@ -95,6 +118,173 @@ def metric_list_to_metric_dict(metric_list: List[str]) -> Dict[str, List]:
     return metric_dict
 
 
+def dataset_info(
+    outs: Predictions,
+    refs: Optional[References] = None,
+    srcs: Optional[Sources] = None,
+) -> Dict:
+    """Check that predictions, references and sources for a dataset match and return the
+    basic information about the dataset that goes into its results."""
+    values = {"predictions_file": outs.filename, "N": len(outs)}
+
+    # make caching work if the predictions have no IDs of their own
+    if outs.ids is None:
+        outs.assign_ids_and_unscramble(None)
+
+    if refs is not None:
+        if len(refs) != len(outs):
+            raise ValueError(
+                f'Incorrect length for data "{outs.filename}" -- outputs: {len(outs)} vs. references: {len(refs)}'
+            )
+        values["references_file"] = refs.filename
+
+        if srcs is not None and len(srcs) != len(outs):
+            raise ValueError(
+                f'Incorrect length for data "{outs.filename}" -- outputs: {len(outs)} vs. sources: {len(srcs)}'
+            )
+    return values
+
+
+def compute_metric(
+    metric_class,
+    outs: Predictions,
+    refs: Optional[References] = None,
+    srcs: Optional[Sources] = None,
+    cache: Optional[Cache] = None,
+    dataset_name: Optional[str] = "",
+    metric_pool: Optional[MetricPool] = None,
+) -> Dict:
+    """Compute a single metric for a single dataset, using the cache if available.
+
+    Referenced metrics need `refs`, sourced and referenced metrics need both `refs` and `srcs`.
+    If `metric_pool` is given, the metric instance is taken from it (and returned to it for
+    reuse), otherwise a new instance is created and thrown away after use.
+
+    Returns:
+      A dict with the results of the given metric.
+    """
+    args = _metric_args(metric_class, outs, refs, srcs)
+
+    with _use_metric(metric_class, metric_pool) as metric:
+        if cache is not None:
+            # Content-addressed -- the metric name, configuration and tokenizer version and
+            # the hash of all its inputs, so that challenge sets, renamed or identical
+            # submissions are found while changed inputs or settings are not.
+            cache_overall_key = (
+                metric_class.__name__,
+                content_digest(
+                    metric.config(),
+                    tokenizer_version(outs.tokenize_func),
+                    texts_digest(*args),
+                ),
+            )
+            previous_result = cache.get(cache_overall_key, None)
+            if previous_result is not None:
+                logger.info(
+                    f"Using cached {metric_class.__name__} result for {outs.filename}..."
+                )
+                return previous_result
+
+        logger.info(f"Computing {metric_class.__name__} for {outs.filename}...")
+        result = metric.compute_cached(cache, *args)
+    if cache is not None:
+        cache[cache_overall_key] = result
+    return result
+
+
+def compute_metric_with_subsets(
+    metric_class,
+    outs: Predictions,
+    refs: Optional[References] = None,
+    srcs: Optional[Sources] = None,
+    subsets: Optional[Dict[str, List]] = None,
+    cache: Optional[Cache] = None,
+    dataset_name: Optional[str] = "",
+    metric_pool: Optional[MetricPool] = None,
+) -> Tuple[Dict, Dict[str, Dict]]:
+    """Compute a single metric for a dataset and for subsets of it (e.g. contrast sets).
+
+    `subsets` maps subset names to lists of IDs. As with separate datasets built for the
+    subsets, subsets have no sources, so sourced metrics are only computed on the full
+    dataset.
+
+    For metrics that support caching, each example is scored only once and the scores for
+    all the subsets are aggregated from the individual scores (see
+    `AbstractMetric.aggregate_subsets`). Other metrics are recomputed on each subset.
+
+    Returns:
+      A tuple: dict with the results for the full dataset, dict of subset name -> results.
+    """
+    if not subsets or issubclass(metric_class, SourceAndReferencedMetric):
+        return (
+            compute_metric(
+                metric_class, outs, refs, srcs, cache, dataset_name, metric_pool
+            ),
+            {},
+        )
+
+    args = _metric_args(metric_class, outs, refs, srcs)
+    with _use_metric(metric_class, metric_pool) as metric:
+        if metric.support_caching():
+            logger.info(
+                f"Computing {metric_class.__name__} for {outs.filename} "
+                f"and {len(subsets)} subsets..."
+            )
+            scores = metric.compute_per_example(cache, *args)
+            reference_tables = metric.lookup_reference_tables(*args)
+            result = metric.aggregate(scores, reference_tables)
+            return result, metric.aggregate_subsets(scores, subsets, reference_tables)
+
+    result = compute_metric(
+        metric_class, outs, refs, srcs, cache, dataset_name, metric_pool
+    )
+    subset_results = {}
+    for subset_name, id_list in subsets.items():
+        subset_outs = copy(outs)
+        subset_outs.assign_ids_and_unscramble(id_list)
+        subset_refs = None
+        if refs is not None:
+            subset_refs = copy(refs)
+            subset_refs.assign_ids_and_unscramble(id_list)
+        subset_results[subset_name] = compute_metric(
+            metric_class,
+            subset_outs,
+            subset_refs,
+            None,
+            cache,
+            subset_name,
+            metric_pool,
+        )
+    return result, subset_results
+
+
+def _metric_args(
+    metric_class,
+    outs: Predictions,
+    refs: Optional[References] = None,
+    srcs: Optional[Sources] = None,
+) -> List:
+    """Return the arguments the given metric class needs to be computed."""
+    if issubclass(metric_class, ReferencelessMetric):
+        return [outs]
+    elif issubclass(metric_class, ReferencedMetric):
+        return [outs, refs]
+    return [outs, refs, srcs]
+
+
+@contextmanager
+def _use_metric(metric_class, metric_pool: Optional[MetricPool] = None):
+    """Borrow a metric instance from the pool, or create a temporary one."""
+    if metric_pool is not None:
+        with metric_pool.use(metric_class) as metric:
+            yield metric
+    else:
+        metric = metric_class()
+        yield metric
+        # Explicit deletion due to memory leak when multiple models were instantiated.
+        del metric
+
+
 def compute(
     outs: Predictions,
     refs: Optional[References] = None,
@@ -103,6 +293,7 @@ def compute(
     metrics_list: List[str] = None,
     cache: Optional[Cache] = None,
     dataset_name: Optional[str] = "",
+    metric_pool: Optional[MetricPool] = None,
 ) -> Dict:
     """Main metrics computation routine for a single dataset.
 
@@ -117,95 +308,126 @@ def compute(
           only used if metrics_dict is None.
       cache: a diskcache.Cache object for fast lookups of redundant computations.
       dataset_name: name of the dataset (just passed to the output json)
+      metric_pool: a MetricPool to reuse metric instances across calls (optional).
 
     Returns:
       values: A dict with the results with metric names as keys.
     """
-    # initialize values storage.
-    values = {"predictions_file": outs.filename, "N": len(outs)}
-
     # check we have some metrics to compute
     assert metrics_dict is not None or metrics_list is not None
     if metrics_dict is None:
         metrics_dict = metric_list_to_metric_dict(metrics_list)
 
-    # make caching work if the predictions have no IDs of their own
-    if outs.ids is None:
-        outs.assign_ids_and_unscramble(None)
-
-    # compute referenceless metrics.
-    for metric_class in metrics_dict["referenceless_metrics"]:
-        if cache is not None:
-            # Add caching - need metric name, output filename, and dataset_name (to support challenge_sets).
-            cache_overall_key = (metric_class.__name__, outs.filename, dataset_name)
-            previous_result = cache.get(cache_overall_key, None)
-            if previous_result is not None:
-                values.update(previous_result)
-                logger.info(
-                    f"Using cached {metric_class.__name__} result for {outs.filename}..."
-                )
-                continue
-        logger.info(f"Computing {metric_class.__name__} for {outs.filename}...")
-        metric = metric_class()
-        result = metric.compute_cached(cache, outs)
-        values.update(result)
-        if cache is not None:
-            cache[cache_overall_key] = result
-        # Explicit deletion due to memory leak when multiple models were instantiated.
-        del metric
+    # initialize values storage.
+    values = dataset_info(outs, refs, srcs)
 
-    # compute ref-based metrics
-    if refs is not None:
-        if len(refs) != len(outs):
-            raise ValueError(
-                f'Incorrect length for data "{outs.filename}" -- outputs: {len(outs)} vs. references: {len(refs)}'
+    # referenceless metrics first, then ref-based, then ref-src-based (if refs/srcs are given)
+    for metric_class in applicable_metrics(metrics_dict, refs, srcs):
+        values.update(
+            compute_metric(
+                metric_class, outs, refs, srcs, cache, dataset_name, metric_pool
             )
-        values["references_file"] = refs.filename
-        for metric_class in metrics_dict["referenced_metrics"]:
-            if cache is not None:
-                cache_overall_key = (metric_class.__name__, outs.filename, dataset_name)
-                previous_result = cache.get(cache_overall_key, None)
-                if previous_result is not None:
-                    values.update(previous_result)
-                    logger.info(
-                        f"Using cached {metric_class.__name__} result for {outs.filename}..."
-                    )
-                    continue
-            logger.info(f"Computing {metric_class.__name__} for {outs.filename}...")
-            metric = metric_class()
-            result = metric.compute_cached(cache, outs, refs)
-            values.update(result)
-            if cache is not None:
-                cache[cache_overall_key] = result
-            del metric
-
-    # compute ref-src-based metrics
-    if refs is not None and srcs is not None:
-        if len(srcs) != len(outs):
-            raise ValueError(
-                f'Incorrect length for data "{outs.filename}" -- outputs: {len(outs)} vs. sources: {len(srcs)}'
-            )
-        values["references_file"] = refs.filename
-        for metric_class in metrics_dict["sourced_and_referenced_metrics"]:
-            if cache is not None:
-                cache_overall_key = (metric_class.__name__, outs.filename, dataset_name)
-                previous_result = cache.get(cache_overall_key, None)
-                if previous_result is not None:
-                    values.update(previous_result)
-                    logger.info(
-                        f"Using cached {metric_class.__name__} result for {outs.filename}..."
-                    )
-                    continue
-            logger.info(f"Computing {metric_class.__name__} for {outs.filename}...")
-            metric = metric_class()
-            result = metric.compute_cached(cache, outs, refs, srcs)
-            values.update(result)
-            if cache is not None:
-                cache[cache_overall_key] = result
-            del metric
+        )
     return values
 
 
+# Per-worker view of the submission being processed by `process_submission`. Filled in
+# once per worker (inherited directly on fork), so that predictions, references and their
+# tokenization are not re-sent with every job.
+_WORKER_DATA = {}
+
+
+def _global_settings() -> Dict:
+    """Process-wide settings made by `process_files` (class attributes and shared
+    singletons), to be re-applied in worker processes that don't inherit them, and
+    restored once `process_files` is done."""
+    wer = sys.modules.get(__name__ + ".wer")
+    return {
+        "slim_texts": Texts.slim,
+        "texts_max_bytes": view_budget.max_bytes,
+        "reference_index": reference_index.folder,
+        "wer_workers": wer.WER.num_workers if wer is not None else 1,
+        "tokenize_workers": tokenization_store.num_workers,
+    }
+
+
+def _apply_global_settings(settings: Dict):
+    Texts.slim = settings["slim_texts"]
+    view_budget.set_limit(settings["texts_max_bytes"])
+    if settings["reference_index"] is not None:
+        reference_index.open(settings["reference_index"])
+    elif reference_index.folder is not None:
+        reference_index.close()
+    if settings["wer_workers"] != 1 or sys.modules.get(__name__ + ".wer") is not None:
+        from .wer import WER
+
+        WER.num_workers = settings["wer_workers"]
+    tokenization_store.num_workers = settings["tokenize_workers"]
+
+
+def _init_worker(data: Optional[Dict] = None):
+    """Pool initializer for `process_submission` workers."""
+    if data is not None:
+        _WORKER_DATA.update(data)
+    # Settings are inherited on fork, but not with other start methods.
+    if _WORKER_DATA.get("settings") is not None:
+        _apply_global_settings(_WORKER_DATA["settings"])
+    # SQLite connections must not be shared across processes -- reopen the cache.
+    if _WORKER_DATA.get("cache") is not None:
+        _WORKER_DATA["cache"] = reopen_cache(_WORKER_DATA["cache"])
+    # Each worker process keeps its own warm metric instances.
+    if _WORKER_DATA.get("metric_pool") is not None:
+        _WORKER_DATA["metric_pool"] = MetricPool()
+    # The same goes for the persistent tokenization cache.
+    if _WORKER_DATA.get("tokenization_cache") is not None:
+        tokenization_store.persistent = reopen_cache(_WORKER_DATA["tokenization_cache"])
+
+
+def _worker_predictions(dataset: str) -> Predictions:
+    """Predictions for a dataset in a worker. Thread workers share the ones created by
+    `process_submission`, process workers create their own (kept until the dataset is
+    done, see `_release_worker_datasets`)."""
+    if not _WORKER_DATA["own_predictions"]:
+        return _WORKER_DATA["outs"].predictions_for(dataset)
+    held = _WORKER_DATA.setdefault("predictions", {})
+    if dataset not in held:
+        held[dataset] = _WORKER_DATA["outs"].create_predictions(dataset)
+    return held[dataset]
+
+
+def _release_worker_datasets(done: Tuple[str, ...]):
+    """Drop the predictions of a process worker for datasets that are done, and the
+    tokenizations of their texts."""
+    held = _WORKER_DATA.get("predictions", {})
+    for dataset in done:
+        if dataset not in held:
+            continue
+        held.pop(dataset).release(tokens=True)
+        for texts in (_WORKER_DATA["refs"], _WORKER_DATA["srcs"]):
+            if texts.get(dataset) is not None:
+                texts[dataset].release(tokens=True)
+
+
+def _compute_task(
+    job: Tuple[Task, Tuple[str, ...]],
+) -> Tuple[Task, Tuple[Dict, Dict[str, Dict]]]:
+    """Worker job -- compute one metric for one dataset of the shared submission (and
+    its subsets), after releasing the datasets that are done. Returns the task along with
+    the results."""
+    task, done = job
+    _release_worker_datasets(done)
+    return task, compute_metric_with_subsets(
+        task.metric_class,
+        _worker_predictions(task.dataset),
+        _WORKER_DATA["refs"].get(task.dataset, None),
+        _WORKER_DATA["srcs"].get(task.dataset, None),
+        _WORKER_DATA["subsets"].get(task.dataset, None),
+        _WORKER_DATA["cache"],
+        task.dataset,
+        _WORKER_DATA["metric_pool"],
+    )
+
+
 def process_submission(
     outs: Submission,
     refs: Optional[Dict],
@@ -214,6 +436,10 @@ def process_submission(
     serial_metric_dict: Dict[str, List],
     cache: Optional[Cache] = None,
     num_threads: Optional[int] = 12,
+    parallel_backend: str = "process",
+    metric_pool: Optional[MetricPool] = None,
+    subsets: Optional[Dict[str, Dict[str, List]]] = None,
+    release_datasets: bool = False,
 ) -> Dict:
     """Process a (potentially) multi-dataset submission. Expects a Submission object
     holding all the predictions, and potentially references and/or sources in a dictionary keyed by
@@ -222,84 +448,251 @@ def process_submission(
     If no references/sources are given and the dataset names correspond to GEM task datasets,
     default references/sources are used.
 
+    The parallel metrics are split into (dataset, metric) tasks, which are computed by a pool
+    of `num_threads` workers, most expensive tasks first (see `scheduler.build_tasks`).
+    The workers are either processes (`parallel_backend="process"`, default -- needed to get
+    any speedup on the pure-Python metrics) or threads (`parallel_backend="thread"`).
+
+    If `metric_pool` is given, metric instances are reused across datasets (process workers
+    each keep a pool of their own).
+
+    `subsets` may define named subsets of datasets (dataset name -> subset name -> list of
+    IDs, e.g. contrast sets). Their results are computed together with the full dataset
+    (see `compute_metric_with_subsets`) and listed after all datasets, under the subset
+    names.
+
+    Datasets are processed lazily: the predictions for a dataset are only created when its
+    first task is handed out to the workers, and with `release_datasets`, they are released
+    from the submission (see `Submission.release`), together with the tokenizations of the
+    dataset's texts, as soon as all its parallel and serial metrics are computed -- only
+    the datasets in progress are held in memory. Process workers drop their own copies of
+    finished datasets when they get their next task.
+
     Returns a dict keyed by dataset names, containing the dicts for each dataset's results.
     """
-    # Handle the CPU-bound metrics in parallel to speed up computation.
-    manager = Manager()
-    shared_dict = manager.dict()
-    shared_dict["submission_name"] = outs.name
-    shared_dict["param_count"] = outs.param_count
-
-    def multiprocess_compute(dataset, outs_ds, refs_ds, srcs_ds, metrics_dict, cache):
-        shared_dict[dataset] = compute(
-            outs_ds, refs_ds, srcs_ds, metrics_dict, None, cache, dataset
-        )
+    results = {"submission_name": outs.name, "param_count": outs.param_count}
+    refs = refs if refs is not None else {}
+    srcs = srcs if srcs is not None else {}
+    subsets = subsets if subsets is not None else {}
+
+    # Results are listed in this order, filled in as the datasets are processed.
+    datasets = outs.datasets
+    for dataset in datasets:
+        results[dataset] = {}
+    for dataset in datasets:
+        for subset_name in subsets.get(dataset, {}):
+            results[subset_name] = {}
+    tasks = build_tasks(
+        {dataset: outs.corpus_size(dataset) for dataset in datasets},
+        refs,
+        srcs,
+        parallel_metric_dict,
+    )
 
-    job_args = []
+    done = []  # datasets whose metrics are all computed
 
-    for dataset in outs.datasets:
-        logger.info(f"Computing metrics for {dataset}...")
+    def prepare(dataset: str):
+        """Create the predictions for a dataset and fill in its basic information."""
         outs_ds = outs.predictions_for(dataset)
-        refs_ds = refs.get(dataset, None)
-        srcs_ds = srcs.get(dataset, None)
-        job_args.append(
-            (dataset, outs_ds, refs_ds, srcs_ds, parallel_metric_dict, cache)
+        if parallel_backend == "thread" and tokenization_store.num_workers > 1:
+            # Tokenize the dataset in parallel (see `tokenize_batch`) once, instead of
+            # in each of the threads that start on it at the same time.
+            for texts in (outs_ds, refs.get(dataset), srcs.get(dataset)):
+                if texts is not None:
+                    texts.list_tokenized
+        results[dataset].update(
+            dataset_info(outs_ds, refs.get(dataset), srcs.get(dataset))
         )
+        for subset_name, id_list in subsets.get(dataset, {}).items():
+            results[subset_name].update(
+                {"predictions_file": outs_ds.filename, "N": len(id_list)}
+            )
+            if refs.get(dataset) is not None:
+                results[subset_name]["references_file"] = refs[dataset].filename
+
+    def finish(dataset: str, task_values: Dict):
+        """Add the parallel metric results for a dataset (in the same order of metrics as
+        `compute`), compute its serial metrics, release it if requested."""
+        for metric_class in applicable_metrics(
+            parallel_metric_dict, refs.get(dataset), srcs.get(dataset)
+        ):
+            values, subset_values = task_values.pop(metric_class)
+            results[dataset].update(values)
+            for subset_name, subset_result in subset_values.items():
+                results[subset_name].update(subset_result)
+
+        serial_metrics = applicable_metrics(
+            serial_metric_dict, refs.get(dataset), srcs.get(dataset)
+        )
+        if serial_metrics:
+            logger.info(f"Computing serial metrics for {dataset}...")
+        for metric_class in serial_metrics:
+            values, subset_values = compute_metric_with_subsets(
+                metric_class,
+                outs.predictions_for(dataset),
+                refs.get(dataset, None),
+                srcs.get(dataset, None),
+                subsets.get(dataset, None),
+                cache,
+                dataset,
+                metric_pool,
+            )
+            results[dataset].update(values)
+            for subset_name, subset_result in subset_values.items():
+                results[subset_name].update(subset_result)
+
+        done.append(dataset)
+        if release_datasets:
+            # (also drops the tokenizations of the dataset's texts)
+            outs.release(dataset)
+            for texts in (refs.get(dataset), srcs.get(dataset)):
+                if texts is not None:
+                    texts.release(tokens=True)
+
+    # Handle the CPU-bound metrics in parallel to speed up computation.
+    data = {
+        "outs": outs,
+        "refs": refs,
+        "srcs": srcs,
+        "subsets": subsets,
+        "cache": cache,
+        "metric_pool": metric_pool,
+        "tokenization_cache": tokenization_store.persistent,
+        "settings": _global_settings(),
+        "own_predictions": parallel_backend == "process",
+    }
+    if parallel_backend == "process":
+        ctx = multiprocessing.get_context()
+        if ctx.get_start_method() == "fork":
+            # Workers inherit the data from the parent, nothing needs to be pickled.
+            # Nothing is created or tokenized up front: each worker creates the
+            # predictions for the datasets of its tasks (see `_worker_predictions`) and
+            # tokenizes them when a metric needs them.
+            _WORKER_DATA.update(data)
+            pool = ctx.Pool(processes=num_threads, initializer=_init_worker)
+        else:
+            # Data is pickled once per worker, not once per job.
+            pool = ctx.Pool(
+                processes=num_threads, initializer=_init_worker, initargs=(data,)
+            )
+    elif parallel_backend == "thread":
+        _WORKER_DATA.update(data)
+        pool = ThreadPool(processes=num_threads)
+    else:
+        raise ValueError(f"Unknown parallel backend: {parallel_backend}")
 
-    pool = Pool(processes=num_threads)
-    pool.starmap(multiprocess_compute, [x for x in job_args])
-    pool.close()
-    pool.join()
+    logger.info(
+        f"Computing {len(tasks)} parallel metric tasks for {len(datasets)} datasets "
+        f"with {num_threads} {parallel_backend} workers..."
+    )
+    # Tasks are handed out one by one, in the order of decreasing cost, with at most
+    # `num_threads` waiting at a time -- the predictions for a dataset are created when
+    # its first task is handed out, and released once its last one is done.
+    open_tasks = Counter(task.dataset for task in tasks)
+    task_values = {dataset: {} for dataset in datasets}
+    pending = deque(tasks)
+    handed_out = queue.Queue()
+    prepared = set()
+
+    def hand_out():
+        """Queue the next task (or the end of the tasks), preparing its dataset first."""
+        if not pending:
+            handed_out.put(None)
+            return
+        task = pending.popleft()
+        if task.dataset not in prepared:
+            prepare(task.dataset)
+            prepared.add(task.dataset)
+        # workers learn which datasets are done along with their next task
+        handed_out.put((task, tuple(done)))
+
+    try:
+        for _ in range(num_threads):
+            hand_out()
+        for task, values in pool.imap_unordered(
+            _compute_task, iter(handed_out.get, None), chunksize=1
+        ):
+            task_values[task.dataset][task.metric_class] = values
+            open_tasks[task.dataset] -= 1
+            # keep the workers busy while the serial metrics are computed
+            hand_out()
+            if not open_tasks[task.dataset]:
+                finish(task.dataset, task_values.pop(task.dataset))
+    finally:
+        # (stops handing out tasks if anything failed)
+        handed_out.put(None)
+        pool.terminate()
+        pool.join()
+        _WORKER_DATA.clear()
+
+    logger.info("Moving on to the datasets without parallel metrics now.")
+    for dataset in list(task_values):
+        if dataset not in prepared:
+            prepare(dataset)
+        finish(dataset, task_values.pop(dataset))
+
+    return results
 
-    logger.info("Moving on to the serial metrics now.")
 
-    for dataset in outs.datasets:
-        logger.info(f"Computing serial metrics for {dataset}...")
-        outs_ds = outs.predictions_for(dataset)
-        refs_ds = refs.get(dataset, None)
-        srcs_ds = srcs.get(dataset, None)
-        shared_dict[dataset].update(
-            compute(outs_ds, refs_ds, srcs_ds, serial_metric_dict, None, cache, dataset)
+@dataclass
+class ReferenceBundle:
+    """References, sources and parent IDs of a standard GEM dataset, all built from a
+    single parse of its reference file."""
+
+    references: Optional[References] = None
+    sources: Optional[Sources] = None
+    parent_ids: Optional[List[str]] = None
+
+
+def load_reference_bundle(dataset_name: str) -> ReferenceBundle:
+    """Load the reference file for a standard GEM dataset (attempt download) once and
+    build both references and sources from it. Parts that are not present are None."""
+    bundle = ReferenceBundle()
+    if dataset_name not in get_all_datasets():
+        return bundle
+    language = get_language_for_dataset(dataset_name)
+    try:
+        dataset_file = ensure_download(
+            "references",
+            dataset_name + ".json",
+            get_url_for_dataset(dataset_name),
         )
-
-    return dict(shared_dict)
+        # use columnar versions if they were created (see `columnar.convert`)
+        references_path = columnar_path(dataset_file, References)
+        if is_columnar(references_path):
+            bundle.references = References(references_path, language=language)
+            bundle.parent_ids = bundle.references.parent_ids
+            sources_path = columnar_path(dataset_file, Sources)
+            if is_columnar(sources_path):
+                bundle.sources = Sources(sources_path, language=language)
+            return bundle
+        # keep the fields used by both references and sources
+        fields = References.fields() + Sources.fields()
+        data = load_json(dataset_file, list(dict.fromkeys(fields)))
+        if isinstance(data, list):
+            data = {"values": data}
+        data["filename"] = dataset_file
+        bundle.references = References(data, language=language)
+        bundle.parent_ids = bundle.references.parent_ids
+    except Exception as e:
+        logger.warn(f"Could not format references for {dataset_name}: {str(e)}")
+        traceback.print_tb(e.__traceback__)
+        return bundle
+    try:
+        bundle.sources = Sources(data, language=language)
+    except Exception:
+        logger.info(f"{dataset_name} does not have source associated.")
+    return bundle
 
 
 def load_references(dataset_name: str) -> Optional[References]:
     """Load a file with references for a standard GEM dataset (attempt download), return None if not present."""
-    if dataset_name in get_all_datasets():
-        try:
-            dataset_file = ensure_download(
-                "references",
-                dataset_name + ".json",
-                get_url_for_dataset(dataset_name),
-            )
-            return References(
-                dataset_file, language=get_language_for_dataset(dataset_name)
-            )
-        except Exception as e:
-            logger.warn(f"Could not format references for {dataset_name}: {str(e)}")
-            traceback.print_tb(e.__traceback__)
-            return None
-    return None
+    return load_reference_bundle(dataset_name).references
 
 
-def load_sources(dataset_name: str) -> Optional[References]:
-    """Load a file with references for a standard GEM dataset (attempt download), return None if not present."""
-    if dataset_name in get_all_datasets():
-        try:
-            dataset_file = ensure_download(
-                "references",
-                dataset_name + ".json",
-                get_url_for_dataset(dataset_name),
-            )
-            return Sources(
-                dataset_file, language=get_language_for_dataset(dataset_name)
-            )
-        except Exception as e:
-            logger.info(f"{dataset_name} does not have source associated.")
-            return None
-    return None
+def load_sources(dataset_name: str) -> Optional[Sources]:
+    """Load a file with sources for a standard GEM dataset (attempt download), return None if not present."""
+    return load_reference_bundle(dataset_name).sources
 
 
 def load_subpopulation_dataset(dataset_name: str) -> Optional[Dict]:
@@ -332,11 +725,36 @@ class Config:
     use_heavy_metrics: bool = False
     metric_list: list = None
     cache_folder: str = ""
+    cache_memory_mb: int = 512
     num_threads: int = 12
+    parallel_backend: str = "process"
+    contrast_sets: str = "groupby"
+    texts_memory_mb: int = 0
+    tokenize_workers: int = 1
+    tokenization_cache_folder: str = ""
+    slim_texts: bool = False
+    wer_workers: int = 1
+    reference_index: bool = False
 
 
 def process_files(config):
     """Main entry point -- load inputs, call metrics measuring, print outputs"""
+    # Process-wide settings are only changed for this run, later library calls in the
+    # same process get the previous ones back.
+    settings = _global_settings()
+    tokenization_cache = tokenization_store.persistent
+    # Only keep the extracted texts and IDs, not the original instances (for this run).
+    Texts.slim = config.slim_texts
+    try:
+        _process_files(config)
+    finally:
+        if tokenization_store.persistent is not tokenization_cache:
+            tokenization_store.persistent.close()
+            tokenization_store.persistent = tokenization_cache
+        _apply_global_settings(settings)
+
+
+def _process_files(config):
     parallel_metric_dict = metric_list_to_metric_dict(config.metric_list)
     parallel_metrics_list = []
     if config.use_heavy_metrics:
@@ -352,19 +770,32 @@ def process_files(config):
     # Optionally, set up cache.
     cache = None
     if config.cache_folder:
-        # Set up to grow up to 10 GB without evictions and operating in-memory.
-        cache = Cache(
-            config.cache_folder,
-            size_limit=int(4e11),
-            cull_limit=0,
-            eviction_policy="none",
-            sqlite_cache_size=32000,
+        # Recently used entries are kept in memory, in front of the disk cache.
+        cache = TieredCache(
+            open_cache(config.cache_folder),
+            max_bytes=config.cache_memory_mb * 2**20,
         )
-        cache.stats(enable=True)
 
-    # load system predictions
-    with open(config.predictions_file, encoding="UTF-8") as fh:
-        data = json.load(fh)
+    # Metric instances are kept warm for the whole run.
+    metric_pool = MetricPool()
+
+    # Optionally, limit the memory used by tokenized texts.
+    view_budget.set_limit(config.texts_memory_mb * 2**20 or None)
+    # Optionally, shard WER computation over multiple processes.
+    if config.wer_workers != 1:
+        from .wer import WER
+
+        WER.num_workers = config.wer_workers
+    tokenization_store.num_workers = config.tokenize_workers
+    # Optionally, keep tokenized texts across runs.
+    if config.tokenization_cache_folder:
+        tokenization_store.persistent = open_cache(config.tokenization_cache_folder)
+    # Optionally, keep reference-side structures of corpus-level metrics across runs.
+    if config.reference_index:
+        reference_index.open()
+
+    # load system predictions (incrementally, keeping only the fields that are used)
+    data = load_json(config.predictions_file, Predictions.fields())
 
     # multi-file submissions
     if isinstance(data, dict) and "submission_name" in data:
@@ -372,38 +803,36 @@ def process_files(config):
 
         ref_data = {}
         if config.references_file:
-            with open(config.references_file, encoding="UTF-8") as fh:
-                ref_data = json.load(fh)
-                for dataset_name in ref_data.keys():
-                    ref_data[dataset_name] = References(
-                        ref_data[dataset_name],
-                        language=get_language_for_dataset(dataset_name),
-                    )
+            ref_data = load_json(config.references_file, References.fields())
+            for dataset_name in ref_data.keys():
+                ref_data[dataset_name] = References(
+                    ref_data[dataset_name],
+                    language=get_language_for_dataset(dataset_name),
+                )
 
         src_data = {}
         if config.sources_file:
-            with open(config.sources_file, encoding="UTF-8") as fh:
-                src_data = json.load(fh)
-                for dataset_name in src_data.keys():
-                    src_data[dataset_name] = Sources(
-                        src_data[dataset_name],
-                        language=get_language_for_dataset(dataset_name),
-                    )
+            src_data = load_json(config.sources_file, Sources.fields())
+            for dataset_name in src_data.keys():
+                src_data[dataset_name] = Sources(
+                    src_data[dataset_name],
+                    language=get_language_for_dataset(dataset_name),
+                )
 
         # Use default reference+source files if no custom ones are provided.
         for dataset in data.datasets:
-            if dataset not in ref_data:
-                ref_data[dataset] = load_references(dataset)
-
-            if dataset not in src_data:
-                src_data[dataset] = load_sources(dataset)
+            if dataset not in ref_data or dataset not in src_data:
+                # references and sources come from the same file, parse it once
+                bundle = load_reference_bundle(dataset)
+                ref_data.setdefault(dataset, bundle.references)
+                src_data.setdefault(dataset, bundle.sources)
 
             # Ensure that the reference files are ordered the same way.
             if ref_data[dataset] is not None:
                 # Only if reference have IDs.
                 if hasattr(ref_data[dataset], "ids"):
-                    outs_ds = data.predictions_for(dataset)
-                    outs_ds.assign_ids_and_unscramble(id_list=ref_data[dataset].ids)
+                    # (applied when the predictions are created)
+                    data.order(dataset, ref_data[dataset].ids)
 
         # For challenge sets, assume that we have a gem_parent_id and construct
         # the corresponding test subset.
@@ -425,14 +854,17 @@ def process_files(config):
                     new_refs = copy(ref_data[parent_dataset_name])
                     new_refs.assign_ids_and_unscramble(ref_data[dataset].parent_ids)
                     ref_data[new_dataset_name] = new_refs
-                    # Construct new predictions.
-                    new_preds = copy(data.predictions_for(parent_dataset_name))
-                    new_preds.assign_ids_and_unscramble(ref_data[dataset].parent_ids)
-                    data.entries[new_dataset_name] = new_preds
+                    # New predictions are created when the dataset is processed.
+                    data.derive(
+                        new_dataset_name,
+                        parent_dataset_name,
+                        ref_data[dataset].parent_ids,
+                    )
                     logger.info("Dataset successfully added.")
 
         # Next construct the contrast sets. The files define a list of IDs we can
         # match on.
+        contrast_subsets = {}
         for dataset in data.datasets:
             if dataset in get_all_subpopulation_sets():
                 # Assemble dictionary of all the subsets.
@@ -442,16 +874,23 @@ def process_files(config):
                         new_dataset_name = (
                             f"{dataset}_contrast_{set_name}-{subset_name}"
                         )
+                        # Aggregate scores of the full dataset, don't score again.
+                        if config.contrast_sets == "groupby":
+                            logger.info(
+                                "Adding new contrast subset %s" % new_dataset_name
+                            )
+                            contrast_subsets.setdefault(dataset, {})[
+                                new_dataset_name
+                            ] = id_list
+                            continue
                         logger.info("Adding new contrast dataset %s" % new_dataset_name)
                         # Optionally, construct new references.
                         if ref_data[dataset] is not None:
                             new_refs = copy(ref_data[dataset])
                             new_refs.assign_ids_and_unscramble(id_list)
                             ref_data[new_dataset_name] = new_refs
-                        # Construct new predictions.
-                        new_preds = copy(data.predictions_for(dataset))
-                        new_preds.assign_ids_and_unscramble(id_list)
-                        data.entries[new_dataset_name] = new_preds
+                        # New predictions are created when the dataset is processed.
+                        data.derive(new_dataset_name, dataset, id_list)
                         logger.info("Dataset successfully added.")
         # Compute all the values.
         values = process_submission(
@@ -462,6 +901,10 @@ def process_files(config):
             serial_metric_dict=serial_metric_dict,
             cache=cache,
             num_threads=config.num_threads,
+            parallel_backend=config.parallel_backend,
+            metric_pool=metric_pool,
+            subsets=contrast_subsets,
+            release_datasets=True,
         )
 
     # Single-file mode.
@@ -491,7 +934,21 @@ def process_files(config):
             else:
                 serial_metric_dict[metric_type] = metric_list
 
-        values = compute(outs, refs, srcs, serial_metric_dict, None, cache)
+        values = compute(
+            outs, refs, srcs, serial_metric_dict, None, cache, metric_pool=metric_pool
+        )
+
+    metric_pool.release()
+    release_caches()
+    if tokenization_store.persistent is not None:
+        logger.info(
+            "Tokenizations loaded from the persistent cache (main process): "
+            f"{tokenization_store.persistent_hits}"
+        )
+        tokenization_store.persistent.close()
+        tokenization_store.persistent = None
+    if cache is not None:
+        logger.info(f"In-memory cache statistics (main process): {cache.stats()}")
 
     # print output
     out_fh = sys.stdout
@@ -567,12 +1024,99 @@ def main():
             "If this argument is specified, it will point to the caching folder. "
         ),
     )
+    ap.add_argument(
+        "--cache_memory_mb",
+        type=int,
+        default=512,
+        help=(
+            "Size of the in-memory cache (in MB) kept in front of the disk cache set with "
+            "--cache_folder. Each parallel worker process has its own."
+        ),
+    )
     ap.add_argument(
         "--num_threads",
+        "--num_workers",
         type=int,
-        help="Number of threads that will be started in parallel.",
+        help="Number of parallel workers (threads or processes) used for the light metrics.",
         default=12,
     )
+    ap.add_argument(
+        "--parallel_backend",
+        choices=["process", "thread"],
+        default="process",
+        help=(
+            "Run the parallel workers as separate processes (default, scales on multi-core "
+            "machines) or as threads (lower overhead, but limited by the GIL)."
+        ),
+    )
+    ap.add_argument(
+        "--texts_memory_mb",
+        type=int,
+        default=0,
+        help=(
+            "Memory limit (in MB) for tokenized versions of predictions/references/sources "
+            "and stored tokenizations kept in memory; the least recently used ones are "
+            "dropped and recomputed when needed. Defaults to 0 (unlimited)."
+        ),
+    )
+    ap.add_argument(
+        "--tokenize_workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of processes used to tokenize large datasets up front (default: 1, "
+            "no parallel tokenization). Datasets with fewer than 10k distinct texts are "
+            "always tokenized serially."
+        ),
+    )
+    ap.add_argument(
+        "--tokenization_cache_folder",
+        type=str,
+        default="",
+        help=(
+            "Folder for a persistent cache of tokenized texts (may be the same as "
+            "--cache_folder). References are then only tokenized once, not once per "
+            "submission."
+        ),
+    )
+    ap.add_argument(
+        "--wer_workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of processes used to compute WER on large datasets (default: 1). Only "
+            "takes effect where WER isn't already computed in a worker process, i.e. with "
+            "--parallel_backend thread."
+        ),
+    )
+    ap.add_argument(
+        "--reference_index",
+        action="store_true",
+        help=(
+            "Store reference-side structures of corpus-level metrics (CIDEr, NIST) in "
+            "data/references/index and reuse them in later runs, so that only the "
+            "predictions are processed for each submission."
+        ),
+    )
+    ap.add_argument(
+        "--keep_all_data",
+        action="store_true",
+        help=(
+            "Keep the original instances (with all their fields) of predictions, "
+            "references and sources in memory as `all_data`. By default, only the texts "
+            "and IDs are kept."
+        ),
+    )
+    ap.add_argument(
+        "--contrast_sets",
+        choices=["groupby", "recompute"],
+        default="groupby",
+        help=(
+            "How to evaluate contrast sets: aggregate individual scores of the full dataset "
+            "for each subset (groupby, default), or compute all metrics on each subset "
+            "as a separate dataset (recompute)."
+        ),
+    )
     args = ap.parse_args()
 
     # Workaround for metrics that use cmd flags - write all args to config.
@@ -584,7 +1128,16 @@ def main():
         use_heavy_metrics=args.heavy_metrics,
         metric_list=args.metric_list,
         cache_folder=args.cache_folder,
+        cache_memory_mb=args.cache_memory_mb,
         num_threads=args.num_threads,
+        parallel_backend=args.parallel_backend,
+        contrast_sets=args.contrast_sets,
+        texts_memory_mb=args.texts_memory_mb,
+        tokenize_workers=args.tokenize_workers,
+        tokenization_cache_folder=args.tokenization_cache_folder,
+        slim_texts=not args.keep_all_data,
+        wer_workers=args.wer_workers,
+        reference_index=args.reference_index,
     )
 
     # hack to make BLEURT work -- it'll fail for anything in argv except the program name :-(
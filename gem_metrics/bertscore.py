@@ -13,10 +13,16 @@ class BERTScore(ReferencedMetric):
     def __init__(self):
         """Load the BERT checkpoint into memory."""
         # Moved to initialize to support caching without initialization.
-        pass
+        self.metric = None
+        self.model_type = "distilbert-base-uncased"
+
+    def config(self):
+        return {"model_type": self.model_type}
 
     def _initialize(self):
-        self.metric = load_metric("bertscore", batch_size=64)
+        # Only load once, instances are reused across datasets.
+        if self.metric is None:
+            self.metric = load_metric("bertscore", batch_size=64)
 
     def _make_serializable(self, score_entry) -> List[float]:
         """Convert from tensor object to list of floats."""
@@ -29,7 +35,7 @@ class BERTScore(ReferencedMetric):
         )
         # Use language-appropriate scorer.
         score = self.metric.compute(
-            lang=predictions.language.alpha_2, model_type="distilbert-base-uncased"
+            lang=predictions.language.alpha_2, model_type=self.model_type
         )
 
         precisions = self._make_serializable(score["precision"])
@@ -39,11 +45,6 @@ class BERTScore(ReferencedMetric):
         scores = {}
         for pred_id, prec, rec, f1 in zip(predictions.ids, precisions, recalls, f1s):
             score_obj = {"bertscore": {"precision": prec, "recall": rec, "f1": f1}}
-
-            # Write to cache if not None.
-            if cache is not None:
-                cache_key = (self.__class__.__name__, predictions.filename, pred_id)
-                cache[cache_key] = score_obj
             scores[pred_id] = score_obj
 
         return scores
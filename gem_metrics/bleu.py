@@ -3,21 +3,32 @@
 from .metric import ReferencedMetric
 from .texts import Predictions, References
 
-from typing import Dict
-import sacrebleu
+from typing import Dict, List
+from sacrebleu.metrics import BLEU as _BLEU
+from sacrebleu.utils import sum_of_lists
 from itertools import zip_longest
 
 
 class BLEU(ReferencedMetric):
-    """BLEU uncased BLEU from SacreBLEU."""
+    """BLEU uncased BLEU from SacreBLEU.
 
-    def support_caching(self):
-        # BLEU is corpus-level, so individual examples can't be aggregated.
-        return False
+    BLEU is corpus-level, so per-example n-gram match statistics are computed (and cached)
+    and the corpus score is computed from their sums.
+    """
+
+    def __init__(self):
+        self.metric = _BLEU(lowercase=True)
 
     def compute(self, cache, predictions: Predictions, references: References) -> Dict:
         ref_streams = list(zip_longest(*references.untokenized))
-        bleu = sacrebleu.corpus_bleu(
-            predictions.untokenized, ref_streams, lowercase=True
+        stats = self.metric._extract_corpus_statistics(
+            predictions.untokenized, ref_streams
         )
+        return dict(zip(predictions.ids, stats))
+
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Compute the corpus-level score from per-example statistics."""
+        if not score_list:
+            return {}
+        bleu = self.metric._compute_score_from_stats(sum_of_lists(score_list))
         return {"bleu": round(bleu.score, 5)}
@@ -11,9 +11,13 @@ class BLEURT(ReproReferencedMetric):
     def __init__(
         self, checkpoint_path="bleurt-base-128", device: int = 0, batch_size: int = 64
     ):
+        self.checkpoint_path = checkpoint_path
         metric = _BLEURT(device=device, model=checkpoint_path, batch_size=batch_size)
         super().__init__(metric)
 
+    def config(self):
+        return {"checkpoint_path": self.checkpoint_path}
+
     def _postprocess(self, score_dicts: List) -> List:
         # The Repro version contains two scores, one with a mean over multiple
         # references per instance and one with a max. The original GEM implementation
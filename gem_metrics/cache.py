@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Helpers for the result cache (a `diskcache.Cache`, or anything that behaves like a dict).
+
+Cache keys are content-addressed: they are built from hashes of the texts being scored
+(and the metric's name and configuration), not from file names or IDs, so identical
+inputs are shared across submissions and changed inputs never produce stale hits.
+"""
+
+from collections import OrderedDict
+from diskcache import Cache
+import hashlib
+import json
+import pickle
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+# Number of keys read/written per SQLite transaction in `get_many`/`set_many` -- large enough
+# to amortize the transaction overhead, small enough not to hold the lock for long.
+BULK_BATCH_SIZE = 5000
+
+# `TieredCache` measures the pickled size of every n-th value of each kind and uses the
+# average for the others (values of one metric have similar sizes).
+SIZE_SAMPLE_RATE = 16
+
+
+def content_digest(*parts: Any) -> str:
+    """Return a SHA-256 hex digest of the given JSON-serializable parts."""
+    serialized = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("UTF-8")).hexdigest()
+
+
+def texts_digest(*texts) -> str:
+    """Return a SHA-256 hex digest of the contents of the given `Texts` objects (their
+    untokenized data in the current order, language and -- for predictions -- task).
+    `None`s are allowed and hashed as empty placeholders."""
+    digest = hashlib.sha256()
+    for texts_obj in texts:
+        if texts_obj is None:
+            digest.update(b"null\n")
+            continue
+        header = [
+            texts_obj.__class__.__name__,
+            getattr(texts_obj.language, "alpha_2", None),
+            getattr(texts_obj, "task", None),
+            len(texts_obj),
+        ]
+        digest.update(json.dumps(header).encode("UTF-8") + b"\n")
+        for item in texts_obj.untokenized:
+            digest.update(json.dumps(item, ensure_ascii=False).encode("UTF-8") + b"\n")
+    return digest.hexdigest()
+
+
+def open_cache(cache_folder: str) -> Cache:
+    """Open (or create) the persistent result cache in the given folder."""
+    # Set up to grow up to 10 GB without evictions and operating in-memory.
+    cache = Cache(
+        cache_folder,
+        size_limit=int(4e11),
+        cull_limit=0,
+        eviction_policy="none",
+        sqlite_cache_size=32000,
+    )
+    cache.stats(enable=True)
+    return cache
+
+
+def _batches(items: List, batch_size: int) -> Iterable[List]:
+    for start in range(0, len(items), batch_size):
+        yield items[start : start + batch_size]
+
+
+def get_many(cache, keys: Iterable) -> Dict:
+    """Look up all the given keys at once, return a dict with the ones that were found.
+
+    For a `diskcache.Cache`, lookups are grouped into transactions of `BULK_BATCH_SIZE` keys
+    instead of one SQLite transaction per key. Plain dicts work, too.
+    """
+    if hasattr(cache, "get_many"):
+        return cache.get_many(keys)
+    found = {}
+    keys = list(keys)
+    for batch in _batches(keys, BULK_BATCH_SIZE):
+        if hasattr(cache, "transact"):
+            with cache.transact(retry=True):
+                values = [cache.get(key, None) for key in batch]
+        else:
+            values = [cache.get(key, None) for key in batch]
+        found.update(
+            (key, value) for key, value in zip(batch, values) if value is not None
+        )
+    return found
+
+
+def set_many(cache, items: Dict):
+    """Store all the given key-value pairs at once (grouped into transactions of
+    `BULK_BATCH_SIZE` items for a `diskcache.Cache`)."""
+    if hasattr(cache, "set_many"):
+        return cache.set_many(items)
+    for batch in _batches(list(items.items()), BULK_BATCH_SIZE):
+        if hasattr(cache, "transact"):
+            with cache.transact(retry=True):
+                for key, value in batch:
+                    cache.set(key, value)
+        else:
+            cache.update(batch)
+
+
+class TieredCache:
+    """Two-level cache: a bounded in-process LRU dictionary in front of a persistent store
+    (typically the `diskcache.Cache` from `open_cache`).
+
+    Reads are served from memory if possible and only go to the store on a miss (the result
+    is then kept in memory). Writes go to both. The memory tier holds at most `max_bytes`
+    (estimated from the pickled size of a sample of the values, see `_estimate_size`),
+    least recently used entries are dropped first. Hits and misses of the memory tier are counted, see `stats()`.
+
+    Supports the `get`/`[]`/`get_many`/`set_many` subset of the `diskcache.Cache` interface.
+    """
+
+    def __init__(self, store, max_bytes: int = 512 * 2**20):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._size_samples = (
+            {}
+        )  # kind -> [entries seen, entries measured, bytes measured]
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Optional[str]:
+        return getattr(self.store, "directory", None)
+
+    def _lookup(self, key):
+        """Memory tier lookup, returns None on miss. Must hold the lock."""
+        value = self._memory.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._memory.move_to_end(key)
+        return value
+
+    def _estimate_size(self, key, value) -> int:
+        """Estimate the size of an entry. Every `SIZE_SAMPLE_RATE`-th entry of each kind
+        (the metric name, for keys from `cache_keys`) is pickled and measured, the others
+        are assumed to have the average size. Must hold the lock."""
+        kind = (key[0] if isinstance(key, tuple) and key else None, type(value))
+        samples = self._size_samples.setdefault(kind, [0, 0, 0])
+        samples[0] += 1
+        if (samples[0] - 1) % SIZE_SAMPLE_RATE:
+            return samples[2] // samples[1]
+        size = len(pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL))
+        samples[1] += 1
+        samples[2] += size
+        return size
+
+    def _remember(self, key, value):
+        """Add an entry to the memory tier, evict old ones if over budget. Must hold the lock."""
+        size = self._estimate_size(key, value)
+        if size > self.max_bytes:
+            return
+        if key in self._memory:
+            self._bytes -= self._sizes[key]
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        self._sizes[key] = size
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            old_key, _ = self._memory.popitem(last=False)
+            self._bytes -= self._sizes.pop(old_key)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+        if value is not None:
+            return value
+        value = self.store.get(key, None)
+        if value is None:
+            return default
+        with self._lock:
+            self._remember(key, value)
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def set(self, key, value):
+        self.store[key] = value
+        with self._lock:
+            self._remember(key, value)
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def get_many(self, keys: Iterable) -> Dict:
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                value = self._lookup(key)
+                if value is not None:
+                    found[key] = value
+                else:
+                    missing.append(key)
+        if missing:
+            from_store = get_many(self.store, missing)
+            with self._lock:
+                for key, value in from_store.items():
+                    self._remember(key, value)
+            found.update(from_store)
+        return found
+
+    def set_many(self, items: Dict):
+        set_many(self.store, items)
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, value)
+
+    def clear_memory(self):
+        """Drop the in-memory tier (the persistent store is kept)."""
+        with self._lock:
+            self._memory.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Return memory tier statistics -- hits, misses, number of entries, size in bytes."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+                "bytes": self._bytes,
+            }
+
+    def close(self):
+        self.clear_memory()
+        if hasattr(self.store, "close"):
+            self.store.close()
+
+    def __getstate__(self):
+        # The memory tier is local to each process, only the store is shared.
+        return {"store": self.store, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["store"], state["max_bytes"])
+
+
+def reopen_cache(cache):
+    """Return a fresh handle to the same cache, safe to use in a forked worker process
+    (SQLite connections must not be shared across processes)."""
+    if isinstance(cache, TieredCache):
+        return TieredCache(reopen_cache(cache.store), cache.max_bytes)
+    if isinstance(cache, Cache):
+        return Cache(cache.directory)
+    return cache
@@ -3,9 +3,70 @@
 from .metric import ReferencedMetric
 from .texts import Predictions, References
 
-from itertools import zip_longest
-import sacrebleu
-from typing import Dict
+from collections import Counter
+from sacrebleu.metrics import CHRF as _CHRF
+from sacrebleu.metrics.helpers import extract_all_char_ngrams, extract_word_ngrams
+from sacrebleu.utils import sum_of_lists
+from typing import Dict, List, Optional, Sequence
+
+
+class ChrfEngine:
+    """Sentence-level statistics for several chrF variants (sacrebleu `CHRF` objects that
+    only differ in `word_order`) from a single n-gram extraction.
+
+    The variants share the character n-grams and add word unigrams/bigrams, so character
+    and word n-grams are extracted once for each hypothesis and reference, and their match
+    statistics are computed once for each order. Each variant then gets the same statistics
+    as from sacrebleu -- including the choice of the best reference by its own F-score.
+    """
+
+    def __init__(self, metrics: Dict[str, _CHRF]):
+        self.metrics = metrics
+        # the variant with the most word n-gram orders extracts everything needed
+        self.full = max(metrics.values(), key=lambda metric: metric.word_order)
+
+    def _ngrams(self, text: str) -> List[Counter]:
+        """Character n-gram counts of all orders, followed by word n-gram counts."""
+        metric = self.full
+        ngrams = extract_all_char_ngrams(text, metric.char_order, metric.whitespace)
+        if metric.word_order > 0:
+            words = metric._remove_punctuation(text)
+            for n in range(metric.word_order):
+                ngrams.append(extract_word_ngrams(words, n + 1))
+        return ngrams
+
+    def segment_statistics(
+        self, hypothesis: str, references: Sequence[Optional[str]]
+    ) -> Dict[str, List[int]]:
+        """Return the [hypothesis, reference, match] counts for each n-gram order (flattened)
+        of each variant, against the best reference for that variant. References may be
+        `None` (missing)."""
+        metric = self.full
+        hyp_ngrams = self._ngrams(metric._preprocess_segment(hypothesis))
+        best = {key: ([], -1.0) for key in self.metrics}
+        for ref in references:
+            if ref is None:
+                continue
+            ref_ngrams = self._ngrams(metric._preprocess_segment(ref))
+            stats = []
+            for hyp_counts, ref_counts in zip(hyp_ngrams, ref_ngrams):
+                stats.extend(metric._get_match_statistics(hyp_counts, ref_counts))
+            for key, variant in self.metrics.items():
+                variant_stats = stats[: 3 * variant.order]
+                f_score = variant._compute_f_score(variant_stats)
+                if f_score > best[key][1]:
+                    best[key] = (variant_stats, f_score)
+        return {key: stats for key, (stats, _) in best.items()}
+
+    def corpus_scores(self, stats_list: List[Dict[str, List[int]]]) -> Dict[str, float]:
+        """Return the corpus-level score of each variant, given the statistics of all
+        sentences (or any subset of them)."""
+        return {
+            key: metric._compute_score_from_stats(
+                sum_of_lists([stats[key] for stats in stats_list])
+            ).score
+            for key, metric in self.metrics.items()
+        }
 
 
 class CHRF(ReferencedMetric):
@@ -36,24 +97,32 @@ class CHRF(ReferencedMetric):
 
     and adds word unigrams and bigrams to the metric.
     In CHRF+, only unigrams are added.
+
+    All variants are corpus-level, so per-example n-gram match statistics are computed (and
+    cached) and the corpus scores are computed from their sums. The statistics of all
+    variants are computed in a single pass (see `ChrfEngine`).
     """
 
-    def support_caching(self):
-        # corpus-level, so individual examples won't be aggregated.
-        return False
+    VARIANTS = {"chrf" + "+" * word_order: word_order for word_order in range(0, 3)}
+
+    def __init__(self):
+        self.metrics = {
+            key: _CHRF(word_order=word_order, eps_smoothing=True)
+            for key, word_order in self.VARIANTS.items()
+        }
+        self.engine = ChrfEngine(self.metrics)
 
     def compute(self, cache, predictions: Predictions, references: References) -> Dict:
-        ref_streams = list(zip_longest(*references.untokenized))
-        scores = {}
-
-        for word_order in range(0, 3):
-            key = "chrf" + "+" * word_order
-            chrf = sacrebleu.corpus_chrf(
-                predictions.untokenized,
-                ref_streams,
-                word_order=word_order,
-                eps_smoothing=True,
+        # character and word n-grams are extracted once for all variants
+        return {
+            pred_id: self.engine.segment_statistics(pred, refs)
+            for pred_id, pred, refs in zip(
+                predictions.ids, predictions.untokenized, references.untokenized
             )
-            scores[key] = chrf.score
+        }
 
-        return scores
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Compute the corpus-level scores from per-example statistics."""
+        if not score_list:
+            return {}
+        return self.engine.corpus_scores(score_list)
@@ -4,14 +4,222 @@
 import copy
 import math
 from collections import defaultdict
-from typing import Dict
+from typing import Dict, List
 
 import numpy as np
 
 from .metric import ReferencedMetric
+from .reference_index import encode_ngrams, ngram_index
 from .texts import Predictions, References
 
 
+class CiderEngine:
+    """Vectorized CIDEr computation over sparse n-gram vectors (same results as
+    `CIDER.compute_score`).
+
+    N-grams are interned to integer IDs. Reference tf-idf weights, norms and lengths are
+    computed once, when the engine is created -- the document frequencies only depend on
+    the references -- and the clipped cosine similarities of any number of test sets are
+    then computed with NumPy, joining test and reference n-grams by sorted keys.
+
+    Inputs are n-gram counts as produced by `CIDER.precook`: a list of reference counts
+    per example (`crefs`) and one test count per example (`ctest`).
+    """
+
+    def __init__(self, crefs: List[List[Dict]], n: int = 4, sigma: float = 6.0):
+        self.n = n
+        self.sigma = sigma
+        self.index = {}
+        ids, counts, sentences = self._intern(
+            [ref for refs in crefs for ref in refs], self.index
+        )
+        self.orders = self._orders(self.index, 0)
+        groups = np.cumsum([0] + [len(refs) for refs in crefs], dtype=np.int64)
+        self._build(groups, sentences, ids, counts)
+
+    def _build(self, groups, sentences, ids, counts):
+        """Compute the reference-side structures from the reference n-gram entries (IDs and
+        counts, with the reference sentence of each), given the first sentence of each
+        example (`groups`)."""
+        self.vocab_size = len(self.orders)
+        self.groups = groups
+
+        # document frequency -- the number of examples where each n-gram is in any reference
+        num_examples = len(groups) - 1
+        sentence_examples = np.repeat(np.arange(num_examples), np.diff(groups))
+        examples = sentence_examples[sentences]
+        pairs = np.unique(examples * self.vocab_size + ids)
+        df = np.bincount(pairs % self.vocab_size, minlength=self.vocab_size)
+        self.ref_len = np.log(float(num_examples))
+        self.idf = self.ref_len - np.log(np.maximum(1.0, df))
+
+        weights = counts * self.idf[ids]
+        num_sentences = int(groups[-1])
+        self.ref_norms = self._norms(
+            sentences, self.orders[ids], weights, num_sentences
+        )
+        self.ref_lengths = self._lengths(
+            sentences, self.orders[ids], counts, num_sentences
+        )
+        self.sentence_examples = sentence_examples
+        # reference entries sorted by (sentence, n-gram ID), for lookups
+        keys = sentences * self.vocab_size + ids
+        order = np.argsort(keys, kind="stable")
+        self.ref_keys = keys[order]
+        self.ref_weights = weights[order]
+        self.ref_counts = counts[order]
+
+    # reference-side arrays stored in the reference index (see `tables`)
+    TABLES = [
+        "groups",
+        "orders",
+        "idf",
+        "ref_norms",
+        "ref_lengths",
+        "ref_keys",
+        "ref_weights",
+        "ref_counts",
+    ]
+
+    def tables(self) -> Dict:
+        """Return the reference-side structures, to be stored in the reference index (see
+        `from_tables`)."""
+        tables = {name: getattr(self, name) for name in self.TABLES}
+        tables["vocab"] = encode_ngrams(self.index)
+        return tables
+
+    @classmethod
+    def from_tables(cls, tables, n: int = 4, sigma: float = 6.0) -> "CiderEngine":
+        """Create an engine from the structures returned by `tables`."""
+        engine = cls.__new__(cls)
+        engine.n = n
+        engine.sigma = sigma
+        engine.index = ngram_index(tables["vocab"])
+        for name in cls.TABLES:
+            setattr(engine, name, tables[name])
+        engine.vocab_size = len(engine.orders)
+        num_examples = len(engine.groups) - 1
+        engine.ref_len = np.log(float(num_examples))
+        engine.sentence_examples = np.repeat(
+            np.arange(num_examples), np.diff(engine.groups)
+        )
+        return engine
+
+    def subset(self, rows: np.ndarray) -> "CiderEngine":
+        """Return an engine for the given examples (in the given order) -- the same as if
+        it was created with their references only, with document frequencies counted on
+        them. The n-gram vocabulary is shared."""
+        num_refs = np.diff(self.groups)[rows]
+        groups = np.cumsum(np.concatenate(([0], num_refs)), dtype=np.int64)
+        # new number of each selected reference sentence (-1 = not selected)
+        renumber = np.full(len(self.sentence_examples), -1, dtype=np.int64)
+        selected = np.repeat(self.groups[rows] - groups[:-1], num_refs) + np.arange(
+            groups[-1]
+        )
+        renumber[selected] = np.arange(len(selected))
+        sentences = renumber[self.ref_keys // self.vocab_size]
+        keep = sentences >= 0
+        engine = copy.copy(self)
+        engine._build(
+            groups,
+            sentences[keep],
+            self.ref_keys[keep] % self.vocab_size,
+            self.ref_counts[keep],
+        )
+        return engine
+
+    @staticmethod
+    def _intern(cooked: List[Dict], index: Dict):
+        """Return n-gram IDs, counts and the index of the source dict for all entries of
+        the given n-gram counts. New n-grams are added to `index`."""
+        ids, counts, sizes = [], [], []
+        add = index.setdefault
+        for cnts in cooked:
+            # (the new ID is evaluated before the n-gram is added)
+            ids.extend([add(ngram, len(index)) for ngram in cnts])
+            counts.extend(cnts.values())
+            sizes.append(len(cnts))
+        return (
+            np.fromiter(ids, dtype=np.int64, count=len(ids)),
+            np.fromiter(counts, dtype=float, count=len(counts)),
+            np.repeat(np.arange(len(cooked), dtype=np.int64), sizes),
+        )
+
+    @staticmethod
+    def _orders(index: Dict, start: int) -> np.ndarray:
+        """N-gram orders (0-based) of the n-grams with IDs from `start` on."""
+        return np.array(
+            [len(ngram) - 1 for ngram in list(index)[start:]], dtype=np.int64
+        )
+
+    def _norms(self, rows, orders, weights, num_rows: int) -> np.ndarray:
+        squares = np.bincount(
+            rows * self.n + orders, weights=weights**2, minlength=num_rows * self.n
+        )
+        return np.sqrt(squares).reshape(num_rows, self.n)
+
+    @staticmethod
+    def _lengths(rows, orders, counts, num_rows: int) -> np.ndarray:
+        # as in the original implementation, the length is the number of bigrams
+        return np.bincount(rows, weights=counts * (orders == 1), minlength=num_rows)
+
+    def scores(self, ctest: List[Dict]) -> np.ndarray:
+        """Return the CIDEr score of each example, given the test n-gram counts."""
+        num_examples = len(self.groups) - 1
+        num_sentences = len(self.sentence_examples)
+        # unknown n-grams get new IDs (with a document frequency of 0) for this call only
+        index = dict(self.index)
+        ids, counts, examples = self._intern(ctest, index)
+        orders = np.concatenate((self.orders, self._orders(index, self.vocab_size)))
+        idf = np.concatenate(
+            (self.idf, np.full(len(index) - self.vocab_size, self.ref_len))
+        )
+        weights = counts * idf[ids]
+        norms = self._norms(examples, orders[ids], weights, num_examples)
+        lengths = self._lengths(examples, orders[ids], counts, num_examples)
+
+        # pair each test n-gram with each reference of its example, look it up there
+        known = ids < self.vocab_size
+        ids, weights, examples = ids[known], weights[known], examples[known]
+        num_refs = np.diff(self.groups)[examples]
+        entries = np.repeat(np.arange(len(ids)), num_refs)
+        starts = np.repeat(np.cumsum(num_refs) - num_refs, num_refs)
+        sentences = self.groups[examples[entries]] + np.arange(len(entries)) - starts
+        keys = sentences * self.vocab_size + ids[entries]
+        pos = np.zeros(len(keys), dtype=np.int64)
+        found = np.zeros(len(keys), dtype=bool)
+        # (there is nothing to look up in if the references have no n-grams)
+        if len(self.ref_keys):
+            pos = np.minimum(
+                np.searchsorted(self.ref_keys, keys), len(self.ref_keys) - 1
+            )
+            found = self.ref_keys[pos] == keys
+        hyp_weights, ref_weights = weights[entries][found], self.ref_weights[pos[found]]
+        # clipped dot products per reference sentence and n-gram order
+        dots = np.bincount(
+            sentences[found] * self.n + orders[ids[entries][found]],
+            weights=np.minimum(hyp_weights, ref_weights) * ref_weights,
+            minlength=num_sentences * self.n,
+        )
+        # (bincount returns integers if nothing matched)
+        dots = dots.astype(float).reshape(num_sentences, self.n)
+
+        # cosine similarities (if both norms are non-zero) with a length penalty
+        denominators = norms[self.sentence_examples] * self.ref_norms
+        nonzero = denominators != 0
+        dots[nonzero] /= denominators[nonzero]
+        delta = lengths[self.sentence_examples] - self.ref_lengths
+        dots *= np.exp(-(delta**2) / (2 * self.sigma**2))[:, None]
+
+        # mean over n-gram orders, averaged over references
+        totals = np.bincount(
+            self.sentence_examples,
+            weights=dots.mean(axis=1),
+            minlength=num_examples,
+        )
+        return totals / np.diff(self.groups) * 10.0
+
+
 class CIDER(ReferencedMetric):
     """CIDEr (Consensus-Based Image Description Evaluation) Metric. Computation is done on lower-cased data without punctuation
     (http://arxiv.org/abs/1411.5726).
@@ -24,11 +232,17 @@ class CIDER(ReferencedMetric):
         self._n = n
         # set the standard deviation parameter for gaussian penalty
         self._sigma = sigma
+        self.reset()
+
+    def config(self):
+        return {"n": self._n, "sigma": self._sigma}
+
+    def reset(self):
+        """Forget all test/reference sentences added so far."""
         self.crefs = []
         self.ctest = []
         self.document_frequency = defaultdict(float)
         self.ref_len = None
-        self.cook_append(None, None)
 
     def __iadd__(self, other):
         """add an instance (e.g., from another sentence)."""
@@ -42,19 +256,67 @@ class CIDER(ReferencedMetric):
 
         return self
 
-    def support_caching(self):
-        # CIDEr is corpus-level, so individual examples can't be aggregated.
-        return False
-
-    def compute(self, cache, predictions: Predictions, references: References) -> Dict:
-        refs = references.list_tokenized_lower_nopunct
+    def compute(
+        self,
+        cache,
+        predictions: Predictions,
+        references: References,
+        reference_tables=None,
+    ) -> Dict:
+        # Document frequencies are corpus-level, so only n-gram counts are computed here
+        # for each example; the score is computed in `aggregate`.
         preds = predictions.list_tokenized_lower_nopunct
-        for i, pred in enumerate(preds):
-            self += (pred, refs[i])
+        if reference_tables is not None:
+            # reference n-gram counts are in the reference index
+            return {
+                pred_id: {"test": dict(self.cook_test(pred, self._n))}
+                for pred_id, pred in zip(predictions.ids, preds)
+            }
+        refs = references.list_tokenized_lower_nopunct
+        return {
+            pred_id: {
+                "test": dict(self.cook_test(pred, self._n)),
+                "refs": [dict(ref) for ref in self.cook_refs(refs[i], self._n)],
+            }
+            for i, (pred_id, pred) in enumerate(zip(predictions.ids, preds))
+        }
 
-        (score, _) = self.compute_score()
+    def build_reference_tables(self, references: References) -> Dict:
+        """Reference-side structures for the reference index (see `CiderEngine.tables`)."""
+        crefs = [
+            [dict(ref) for ref in self.cook_refs(refs, self._n)]
+            for refs in references.list_tokenized_lower_nopunct
+        ]
+        return CiderEngine(crefs, self._n, self._sigma).tables()
 
-        return {"CIDEr": round(score, 5)}
+    def aggregate(self, scores: Dict, reference_tables=None) -> Dict:
+        """Compute the corpus-level score from per-example n-gram counts, with the
+        reference side taken from the reference index if it is enabled."""
+        if reference_tables is None:
+            return super().aggregate(scores)
+        if not scores:
+            return {}
+        tables = reference_tables
+        engine = tables.memo.get("engine")
+        if engine is None:
+            engine = CiderEngine.from_tables(tables, self._n, self._sigma)
+            tables.memo["engine"] = engine
+        rows = tables.rows(list(scores))
+        if not tables.covers(rows):
+            # document frequencies are counted on the scored examples only
+            engine = engine.subset(rows)
+        scores = engine.scores([stats["test"] for stats in scores.values()])
+        return {"CIDEr": round(float(np.mean(scores)), 5)}
+
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Compute the corpus-level score from per-example n-gram counts."""
+        if not score_list:
+            return {}
+        engine = CiderEngine(
+            [stats["refs"] for stats in score_list], self._n, self._sigma
+        )
+        scores = engine.scores([stats["test"] for stats in score_list])
+        return {"CIDEr": round(float(np.mean(scores)), 5)}
 
     @staticmethod
     def precook(s, n=4):
@@ -143,7 +405,7 @@ class CIDER(ReferencedMetric):
             vec = [defaultdict(float) for _ in range(self._n)]
             length = 0
             norm = [0.0 for _ in range(self._n)]
-            for (ngram, term_freq) in cnts.items():
+            for ngram, term_freq in cnts.items():
                 # give word count 1 if it doesn't appear in reference corpus
                 df = np.log(max(1.0, self.document_frequency[ngram]))
                 # ngram index
@@ -174,7 +436,7 @@ class CIDER(ReferencedMetric):
             val = np.array([0.0 for _ in range(self._n)])
             for n in range(self._n):
                 # ngram
-                for (ngram, count) in vec_hyp[n].items():
+                for ngram, count in vec_hyp[n].items():
                     # vrama91 : added clipping
                     val[n] += (
                         min(vec_hyp[n][ngram], vec_ref[n][ngram]) * vec_ref[n][ngram]
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Compact columnar on-disk format for predictions/references/sources, loaded with memory
+mapping -- loading is almost free and worker processes share the same pages.
+
+A columnar file is a directory with a `meta.json` and numpy `.npy` arrays:
+
+- string columns (`data`, `ids`, `parent_ids`): a UTF-8 blob (`<name>.blob.npy`) and
+  byte offsets of each string (`<name>.offsets.npy`); for multiple texts per instance
+  (references), `<name>.groups.npy` holds the first string of each instance,
+- optionally, pre-tokenized data (`tokens.*.npy`): int32 token IDs with offsets (as in
+  `vocab.TokenArray`), indexing a `tokens_vocab` string column. They are only used by
+  `Texts` objects with the same tokenizer (and version) as the one that produced them.
+
+Convert JSON files with `python -m gem_metrics.columnar` (see `main`), or save any
+`Texts` object with `save_columnar`.
+"""
+
+from argparse import ArgumentParser
+from collections.abc import Sequence
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+from logzero import logger
+
+from .cache import content_digest
+from .config import get_language_for_dataset
+from .tokenize import tokenizer_id, tokenizer_version
+from .vocab import TokenArray, Vocabulary
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+STRING_COLUMNS = ["data", "ids", "parent_ids"]
+
+
+def is_columnar(path) -> bool:
+    """Return true if the given path is a columnar file (directory)."""
+    return isinstance(path, str) and os.path.isfile(os.path.join(path, META_FILE))
+
+
+def _load_array(folder: str, name: str, mmap: bool) -> Optional[np.ndarray]:
+    filename = os.path.join(folder, name + ".npy")
+    if not os.path.isfile(filename):
+        return None
+    return np.load(filename, mmap_mode="r" if mmap else None)
+
+
+class StringColumn(Sequence):
+    """Read-only list of strings (or, with `groups`, of lists of strings) stored as a
+    UTF-8 blob with byte offsets -- string `i` is `blob[offsets[i]:offsets[i + 1]]`,
+    instance `j` consists of strings `groups[j]` to `groups[j + 1]`.
+
+    Strings are decoded on access. Columns loaded from disk are memory-mapped and only
+    their location is pickled, so that other processes map the same file.
+    """
+
+    def __init__(
+        self,
+        blob: np.ndarray,
+        offsets: np.ndarray,
+        groups: Optional[np.ndarray] = None,
+        source: Optional[tuple] = None,
+    ):
+        self.blob = blob
+        self.offsets = offsets
+        self.groups = groups
+        self.source = source
+
+    @classmethod
+    def from_list(cls, data: List) -> "StringColumn":
+        """Create from a list of strings (or lists of strings)."""
+        groups = None
+        if data and isinstance(data[0], list):
+            groups = np.cumsum([0] + [len(inst) for inst in data], dtype=np.int64)
+            data = [text for inst in data for text in inst]
+        encoded = [text.encode("UTF-8") for text in data]
+        offsets = np.cumsum([0] + [len(text) for text in encoded], dtype=np.int64)
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, offsets, groups)
+
+    @classmethod
+    def load(cls, folder: str, name: str, mmap: bool = True) -> "StringColumn":
+        return cls(
+            _load_array(folder, name + ".blob", mmap),
+            _load_array(folder, name + ".offsets", mmap),
+            _load_array(folder, name + ".groups", mmap),
+            source=(folder, name, mmap),
+        )
+
+    def save(self, folder: str, name: str):
+        np.save(os.path.join(folder, name + ".blob.npy"), self.blob)
+        np.save(os.path.join(folder, name + ".offsets.npy"), self.offsets)
+        if self.groups is not None:
+            np.save(os.path.join(folder, name + ".groups.npy"), self.groups)
+
+    def __reduce__(self):
+        if self.source is not None:
+            return (StringColumn.load, self.source)
+        return (StringColumn, (self.blob, self.offsets, self.groups))
+
+    def _string(self, i: int) -> str:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.blob[start:end].tobytes().decode("UTF-8")
+
+    def _strings(self, start: int, end: int) -> List[str]:
+        offsets = self.offsets[start : end + 1].tolist()
+        blob = self.blob[offsets[0] : offsets[-1]].tobytes()
+        base = offsets[0]
+        return [
+            blob[a - base : b - base].decode("UTF-8")
+            for a, b in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def __len__(self):
+        if self.groups is not None:
+            return len(self.groups) - 1
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("StringColumn index out of range")
+        if self.groups is None:
+            return self._string(index)
+        return self._strings(int(self.groups[index]), int(self.groups[index + 1]))
+
+    def __iter__(self):
+        strings = self._strings(0, len(self.offsets) - 1)
+        if self.groups is None:
+            return iter(strings)
+        groups = self.groups.tolist()
+        return (strings[a:b] for a, b in zip(groups[:-1], groups[1:]))
+
+    def tolist(self) -> List:
+        return list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, StringColumn):
+            return (
+                (self.groups is None) == (other.groups is None)
+                and (self.groups is None or np.array_equal(self.groups, other.groups))
+                and np.array_equal(self.offsets, other.offsets)
+                and np.array_equal(self.blob, other.blob)
+            )
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"StringColumn({len(self)} items)"
+
+
+class TokenColumn:
+    """Pre-tokenized data: a `TokenArray` with IDs local to the file (indexing the
+    `vocab` string column), for the tokenizer identified by `tokenizer`."""
+
+    def __init__(
+        self,
+        tokenizer: str,
+        ids: np.ndarray,
+        offsets: np.ndarray,
+        groups: Optional[np.ndarray],
+        vocab: StringColumn,
+        source: Optional[tuple] = None,
+    ):
+        self.tokenizer = tokenizer
+        self.ids = ids
+        self.offsets = offsets
+        self.groups = groups
+        self.vocab = vocab
+        self.source = source
+
+    @classmethod
+    def from_lists(cls, tokenizer: str, data: List, multi_ref: bool) -> "TokenColumn":
+        local_vocab = Vocabulary()
+        tokens = TokenArray.from_lists(local_vocab, data, multi_ref)
+        vocab = StringColumn.from_list(local_vocab.decode(np.arange(len(local_vocab))))
+        return cls(tokenizer, tokens.ids, tokens.offsets, tokens.groups, vocab)
+
+    @classmethod
+    def load(cls, folder: str, tokenizer: str, mmap: bool = True) -> "TokenColumn":
+        return cls(
+            tokenizer,
+            _load_array(folder, "tokens.ids", mmap),
+            _load_array(folder, "tokens.offsets", mmap),
+            _load_array(folder, "tokens.groups", mmap),
+            StringColumn.load(folder, "tokens_vocab", mmap),
+            source=(folder, tokenizer, mmap),
+        )
+
+    def save(self, folder: str):
+        np.save(os.path.join(folder, "tokens.ids.npy"), self.ids)
+        np.save(os.path.join(folder, "tokens.offsets.npy"), self.offsets)
+        if self.groups is not None:
+            np.save(os.path.join(folder, "tokens.groups.npy"), self.groups)
+        self.vocab.save(folder, "tokens_vocab")
+
+    def __reduce__(self):
+        if self.source is not None:
+            return (TokenColumn.load, self.source)
+        return (
+            TokenColumn,
+            (self.tokenizer, self.ids, self.offsets, self.groups, self.vocab),
+        )
+
+    def token_array(self, vocab: Vocabulary) -> TokenArray:
+        """Return the tokens as a `TokenArray` with IDs of the given vocabulary."""
+        mapping, _ = vocab.encode([self.vocab.tolist()])
+        return TokenArray(vocab, mapping[self.ids], self.offsets, self.groups)
+
+
+def tokenizer_key(func) -> str:
+    """Identity of a tokenizer function (and its version) stored with pre-tokenized data."""
+    return content_digest(tokenizer_id(func), tokenizer_version(func))
+
+
+def save_columnar(texts, path: str, tokenized: bool = False):
+    """Save a `Texts` object (its data, IDs and parent IDs in the current order) as a
+    columnar file at `path` (a directory, created if needed). With `tokenized`, the
+    tokenized data is stored too."""
+    os.makedirs(path, exist_ok=True)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "class": texts.__class__.__name__,
+        "data_key": texts.data_key,
+        "language": getattr(texts.language, "alpha_2", None),
+        "columns": [],
+        "tokenizer": None,
+    }
+    for name in STRING_COLUMNS:
+        values = getattr(texts, name)
+        if values is not None:
+            StringColumn.from_list(list(values)).save(path, name)
+            meta["columns"].append(name)
+    if tokenized:
+        meta["tokenizer"] = tokenizer_key(texts.tokenize_func)
+        TokenColumn.from_lists(
+            meta["tokenizer"], texts.list_tokenized, texts.multi_ref
+        ).save(path)
+    # written last, so that incomplete files aren't recognized
+    with open(os.path.join(path, META_FILE), "w", encoding="UTF-8") as fh:
+        json.dump(meta, fh, indent=2)
+
+
+def load_columnar(path: str, mmap: bool = True) -> Dict:
+    """Load a columnar file, return its metadata with the columns (`StringColumn`s, or
+    `None` if not present) and pre-tokenized data (`tokens`, a `TokenColumn` or `None`).
+    """
+    with open(os.path.join(path, META_FILE), encoding="UTF-8") as fh:
+        meta = json.load(fh)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise Exception(
+            f"Unsupported columnar format version {meta.get('format_version')} in {path}"
+        )
+    for name in STRING_COLUMNS:
+        meta[name] = (
+            StringColumn.load(path, name, mmap) if name in meta["columns"] else None
+        )
+    meta["tokens"] = None
+    if meta["tokenizer"] is not None:
+        meta["tokens"] = TokenColumn.load(path, meta["tokenizer"], mmap)
+    return meta
+
+
+def columnar_path(json_file: str, texts_class: Union[type, str]) -> str:
+    """Return the default location of the columnar version of the given JSON file, for
+    the given `Texts` class (e.g. `data/references/web_nlg_en_val.references` for
+    `References` from `data/references/web_nlg_en_val.json`)."""
+    name = texts_class if isinstance(texts_class, str) else texts_class.__name__
+    return os.path.splitext(json_file)[0] + "." + name.lower()
+
+
+def convert(
+    json_file: str,
+    texts_classes: Optional[Iterable[type]] = None,
+    language: str = "en",
+    tokenized: bool = False,
+    output_prefix: Optional[str] = None,
+) -> List[str]:
+    """Convert a JSON file with predictions/references/sources to columnar files, one
+    per `Texts` class (default: `References` and `Sources`, as in the GEM reference
+    files). Classes whose data is not present in the file are skipped. Returns the paths
+    of the created files (see `columnar_path` for their names)."""
+    # imported here -- `texts` uses this module for loading
+    from .jsonstream import load_json
+    from .texts import References, Sources
+
+    texts_classes = texts_classes or [References, Sources]
+    fields = [field for cls in texts_classes for field in cls.fields()]
+    data = load_json(json_file, list(dict.fromkeys(fields)))
+    if isinstance(data, list):
+        data = {"values": data}
+    data["filename"] = json_file
+    created = []
+    for texts_class in texts_classes:
+        try:
+            texts = texts_class(data, language=language, slim=True)
+        except Exception as e:
+            logger.info(f"Not converting {texts_class.__name__} in {json_file}: {e}")
+            continue
+        path = columnar_path(output_prefix or json_file, texts_class)
+        save_columnar(texts, path, tokenized)
+        created.append(path)
+    return created
+
+
+def main():
+    from .texts import Predictions, References, Sources
+
+    classes = {"predictions": Predictions, "references": References, "sources": Sources}
+    ap = ArgumentParser(description="Convert GEM JSON files to the columnar format")
+    ap.add_argument("json_files", nargs="+", help="JSON files to convert")
+    ap.add_argument(
+        "--types",
+        nargs="+",
+        choices=list(classes),
+        default=["references", "sources"],
+        help="Which data to convert (default: references and sources)",
+    )
+    ap.add_argument(
+        "--language",
+        help=(
+            "Data language (ISO 639-1 code). Defaults to the language of the GEM dataset "
+            "named like the file (e.g. data/references/mlsum_de_test.json), or English."
+        ),
+    )
+    ap.add_argument(
+        "--tokenize",
+        action="store_true",
+        help="Also store the tokenized data (with the default tokenizer for the language)",
+    )
+    args = ap.parse_args()
+    for json_file in args.json_files:
+        dataset_name = os.path.splitext(os.path.basename(json_file))[0]
+        for path in convert(
+            json_file,
+            [classes[name] for name in args.types],
+            args.language or get_language_for_dataset(dataset_name),
+            args.tokenize,
+        ):
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
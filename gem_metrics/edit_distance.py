@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Bit-parallel Levenshtein distance between token sequences (Myers 1999, in the global
+edit distance formulation of Hyyrö 2001).
+
+One of the sequences is encoded as bit vectors (Python integers, so there is no length
+limit) and each token of the other sequence is processed with a constant number of
+bitwise operations over the whole column, instead of filling the full DP matrix. Tokens
+can be any hashable values -- interned token IDs (see `vocab.TokenArray`) are fastest.
+"""
+
+import multiprocessing
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+def _match_vectors(pattern: Sequence[Hashable]) -> Dict[Hashable, int]:
+    """Return a bit vector for each distinct token, with bit `i` set where
+    `pattern[i]` is that token."""
+    vectors = {}
+    for i, token in enumerate(pattern):
+        vectors[token] = vectors.get(token, 0) | (1 << i)
+    return vectors
+
+
+def _distance(
+    pattern_len: int, vectors: Dict[Hashable, int], text: Sequence[Hashable]
+) -> int:
+    """Distance between the pattern (given by its `_match_vectors`) and `text`."""
+    if not pattern_len:
+        return len(text)
+    mask = (1 << pattern_len) - 1
+    last = 1 << (pattern_len - 1)
+    # vertical deltas of the current DP column: +1 (pos), -1 (neg) or 0
+    pos, neg = mask, 0
+    dist = pattern_len
+    for token in text:
+        match = vectors.get(token, 0)
+        xv = match | neg
+        xh = (((match & pos) + pos) ^ pos) | match
+        hpos = neg | (~(xh | pos) & mask)
+        hneg = pos & xh
+        if hpos & last:
+            dist += 1
+        elif hneg & last:
+            dist -= 1
+        # the first row of the DP matrix grows by 1 in each column (shifted-in 1 bit)
+        hpos = (hpos << 1) | 1
+        hneg <<= 1
+        pos = (hneg | ~(xv | hpos)) & mask
+        neg = hpos & xv & mask
+    return dist
+
+
+def edit_distance(a: Sequence[Hashable], b: Sequence[Hashable]) -> int:
+    """Return the Levenshtein distance (unit cost insertions, deletions and
+    substitutions) between two token sequences."""
+    # fewer (but wider) bit vector steps are faster
+    if len(a) < len(b):
+        a, b = b, a
+    return _distance(len(a), _match_vectors(a), b)
+
+
+def edit_distances_one_to_many(
+    text: Sequence[Hashable], others: Sequence[Sequence[Hashable]]
+) -> List[int]:
+    """Return the distances of `text` to each of the `others` (the bit vectors of `text`
+    are computed only once)."""
+    vectors = _match_vectors(text)
+    return [_distance(len(text), vectors, other) for other in others]
+
+
+def _word_error_stats_chunk(
+    predictions: Sequence[Sequence[Hashable]],
+    references: Sequence[Sequence[Sequence[Hashable]]],
+) -> List[Tuple[float, int, int]]:
+    stats = []
+    for prediction, refs in zip(predictions, references):
+        distances = edit_distances_one_to_many(prediction, refs)
+        stats.append(
+            min(
+                (float(dist) / len(ref) * 100, dist, len(ref))
+                for dist, ref in zip(distances, refs)
+            )
+        )
+    return stats
+
+
+def word_error_stats(
+    predictions: Sequence[Sequence[Hashable]],
+    references: Sequence[Sequence[Sequence[Hashable]]],
+    num_workers: Optional[int] = 1,
+    min_parallel: int = 1000,
+    chunks_per_worker: int = 4,
+) -> List[Tuple[float, int, int]]:
+    """Batch WER: for each prediction, return the lowest word error rate (in %) against
+    its references -- the edit distance divided by the reference length -- together with
+    that edit distance and reference length (so that they can be summed over a corpus).
+
+    `predictions` is a list of token sequences, `references` has a list of token
+    sequences per prediction.
+
+    With `num_workers` > 1 (`None` = all CPUs), the predictions are split into shards
+    that are processed in a pool of worker processes, if there are at least
+    `min_parallel` of them and this isn't a daemonic process (e.g. a `process_submission`
+    worker), which can't start a pool of its own. The results are the same.
+    """
+    num_workers = num_workers or multiprocessing.cpu_count()
+    if (
+        len(predictions) < max(min_parallel, 2)
+        or num_workers < 2
+        or multiprocessing.current_process().daemon
+    ):
+        return _word_error_stats_chunk(predictions, references)
+
+    num_workers = min(num_workers, len(predictions))
+    size = -(-len(predictions) // (num_workers * chunks_per_worker))
+    shards = [
+        (predictions[i : i + size], references[i : i + size])
+        for i in range(0, len(predictions), size)
+    ]
+    with multiprocessing.get_context().Pool(processes=num_workers) as pool:
+        stats = pool.starmap(_word_error_stats_chunk, shards, chunksize=1)
+    return [example for shard in stats for example in shard]
+
+
+def word_error_rates(
+    predictions: Sequence[Sequence[Hashable]],
+    references: Sequence[Sequence[Sequence[Hashable]]],
+    num_workers: Optional[int] = 1,
+) -> List[float]:
+    """Batch WER: for each prediction, return the lowest word error rate (in %) against
+    its references (see `word_error_stats`)."""
+    return [wer for wer, _, _ in word_error_stats(predictions, references, num_workers)]
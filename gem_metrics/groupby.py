@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Vectorized aggregation of per-example scores over (possibly overlapping) groups of
+examples, such as the subsets of a contrast set.
+"""
+
+import numpy as np
+from typing import Dict, List, Tuple
+
+
+def _leaf_paths(score: Dict) -> List[Tuple]:
+    """Return key paths to all numeric values of a (one- or two-level) score dict."""
+    paths = []
+    for key, value in score.items():
+        if isinstance(value, dict):
+            paths.extend((key, subkey) for subkey in value)
+        else:
+            paths.append((key,))
+    return paths
+
+
+def _get(score: Dict, path: Tuple):
+    for key in path:
+        score = score[key]
+    return score
+
+
+def group_means(
+    scores: Dict[str, Dict], groups: Dict[str, List], decimals: int = 5
+) -> Dict[str, Dict]:
+    """Average per-example scores within each group.
+
+    Args:
+      scores: per-example scores keyed by ID -- dicts of numbers or dicts of dicts of
+          numbers, as accepted by `AbstractMetric._aggregate_scores`.
+      groups: group name -> list of IDs. Groups may overlap; empty groups get `{}`.
+      decimals: rounding of the results.
+
+    Returns:
+      group name -> score dict with the same structure as the individual scores.
+
+    All groups are aggregated at once, using `np.bincount` over the (group, example)
+    membership pairs, instead of building and averaging a score list for every group.
+    """
+    if not scores:
+        return {name: {} for name in groups}
+    ids = list(scores)
+    paths = _leaf_paths(scores[ids[0]])
+    matrix = np.array(
+        [[_get(scores[pred_id], path) for path in paths] for pred_id in ids],
+        dtype=float,
+    ).reshape(len(ids), len(paths))
+
+    index = {pred_id: idx for idx, pred_id in enumerate(ids)}
+    names = list(groups)
+    members = np.fromiter(
+        (index[pred_id] for name in names for pred_id in groups[name]), dtype=np.int64
+    )
+    labels = np.repeat(np.arange(len(names)), [len(groups[name]) for name in names])
+    counts = np.bincount(labels, minlength=len(names))
+    sums = np.stack(
+        [
+            np.bincount(labels, weights=matrix[members, col], minlength=len(names))
+            for col in range(len(paths))
+        ],
+        axis=1,
+    ).reshape(len(names), len(paths))
+    means = sums / np.maximum(counts, 1)[:, np.newaxis]
+
+    results = {}
+    for group_idx, name in enumerate(names):
+        result = {}
+        if counts[group_idx]:
+            for path, value in zip(paths, means[group_idx]):
+                target = result
+                for key in path[:-1]:
+                    target = target.setdefault(key, {})
+                target[path[-1]] = round(float(value), decimals)
+        results[name] = result
+    return results
@@ -58,25 +58,36 @@ class PyMeteorWrapper:
 
     def compute_score(self, predictions, references):
         assert len(predictions) == len(references)
+        return self.score_stats(self.compute_stats(predictions, references))
+
+    def compute_stats(self, predictions, references):
+        """Return METEOR sufficient statistics (one line per prediction), to be scored
+        by `score_stats` -- alone or together with statistics of other predictions."""
+        assert len(predictions) == len(references)
+        with self.lock:
+            return [
+                self._stat(pred, refs) for pred, refs in zip(predictions, references)
+            ]
+
+    def score_stats(self, stats):
+        """Return the corpus-level score and individual scores for the given statistics."""
         scores = []
 
         eval_line = "EVAL"
-        self.lock.acquire()
-        for pred, refs in zip(predictions, references):
-            stat = self._stat(pred, refs)
+        for stat in stats:
             eval_line += " ||| {}".format(stat)
 
-        self.meteor_p.stdin.write("{}\n".format(eval_line).encode("UTF-8"))
-        self.meteor_p.stdin.flush()
-        for _ in range(len(predictions)):
-            try:
-                scores.append(
-                    float(self.meteor_p.stdout.readline().decode("UTF-8").strip())
-                )
-            except ValueError:
-                return -1.0, [0.0] * len(predictions)
-        score = float(self.meteor_p.stdout.readline().strip())
-        self.lock.release()
+        with self.lock:
+            self.meteor_p.stdin.write("{}\n".format(eval_line).encode("UTF-8"))
+            self.meteor_p.stdin.flush()
+            for _ in range(len(stats)):
+                try:
+                    scores.append(
+                        float(self.meteor_p.stdout.readline().decode("UTF-8").strip())
+                    )
+                except ValueError:
+                    return -1.0, [0.0] * len(stats)
+            score = float(self.meteor_p.stdout.readline().strip())
 
         return score, scores
 
@@ -250,10 +250,21 @@ class NISTScore(NGramScore):
         @param pred_sent: the system output sentence (string/list of tokens)
         @param ref_sents: the corresponding reference sentences (list of strings/lists of tokens)
         """
+        self.append_stats(self.segment_stats(pred_sent, ref_sents))
+
+    def segment_stats(self, pred_sent, ref_sents):
+        """Compute the statistics for a single sentence, to be added via `append_stats`
+        (possibly later and together with statistics of other sentences).
+
+        @param pred_sent: the system output sentence (string/list of tokens)
+        @param ref_sents: the corresponding reference sentences (list of strings/lists of tokens)
+        @return: a dict with output lengths, n-gram hits, reference n-gram counts & lengths
+        """
         pred_sent, ref_sents = self.check_tokenized(pred_sent, ref_sents)
+        stats = {"cand_lens": [], "hit_ngrams": []}
         # collect ngram matches
         for n in range(self.max_ngram):
-            self.cand_lens[n].append(len(pred_sent) - n)  # keep track of output length
+            stats["cand_lens"].append(len(pred_sent) - n)  # keep track of output length
             merged_ref_ngrams = self.get_ngram_counts(n + 1, ref_sents)
             pred_ngrams = self.get_ngram_counts(n + 1, [pred_sent])
             # collect ngram matches
@@ -262,16 +273,40 @@ class NISTScore(NGramScore):
                 hits = min(pred_ngrams[ngram], merged_ref_ngrams.get(ngram, 0))
                 if hits:
                     hit_ngrams[ngram] = hits
-            self.hit_ngrams[n].append(hit_ngrams)
-            # collect total reference ngram counts
+            stats["hit_ngrams"].append(hit_ngrams)
+        stats.update(self.ref_stats(ref_sents))
+        return stats
+
+    def ref_stats(self, ref_sents):
+        """Compute the reference-side statistics for a single sentence (part of
+        `segment_stats`).
+
+        @param ref_sents: the reference sentences (list of lists of tokens)
+        @return: a dict with total reference n-gram counts, reference lengths and count
+        """
+        stats = {"ref_ngrams": []}
+        # collect total reference ngram counts
+        for n in range(self.max_ngram):
+            ref_ngrams = defaultdict(int)
             for ref_sent in ref_sents:
                 for ngram in self.ngrams(n + 1, ref_sent):
-                    self.ref_ngrams[n + 1][ngram] += 1
+                    ref_ngrams[ngram] += 1
+            stats["ref_ngrams"].append(dict(ref_ngrams))
+        stats["ref_len_sum"] = sum(len(ref_sent) for ref_sent in ref_sents)
+        stats["num_refs"] = len(ref_sents)
+        return stats
+
+    def append_stats(self, stats):
+        """Increase counters with the statistics of a sentence (see `segment_stats`)."""
+        for n in range(self.max_ngram):
+            self.cand_lens[n].append(stats["cand_lens"][n])
+            self.hit_ngrams[n].append(stats["hit_ngrams"][n])
+            for ngram, count in stats["ref_ngrams"][n].items():
+                self.ref_ngrams[n + 1][ngram] += count
         # ref_ngrams: use 0-grams for information value as well
-        ref_len_sum = sum(len(ref_sent) for ref_sent in ref_sents)
-        self.ref_ngrams[0][()] += ref_len_sum
+        self.ref_ngrams[0][()] += stats["ref_len_sum"]
         # collect average reference length
-        self.avg_ref_len += ref_len_sum / float(len(ref_sents))
+        self.avg_ref_len += stats["ref_len_sum"] / float(stats["num_refs"])
 
     def score(self):
         """Return the current NIST score, according to the accumulated counts."""
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Streaming loading of prediction/reference/source/submission JSON files.
+
+The document is read in chunks and only its structure (objects, the instance lists) is
+walked incrementally -- each instance is decoded on its own (with `json.JSONDecoder.raw_decode`)
+and immediately reduced to the fields that are actually used, so the full document is
+never held in memory.
+"""
+
+import json
+from typing import Any, Iterable, Iterator, Optional, TextIO, Union
+
+CHUNK_SIZE = 1 << 20
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]}"
+
+
+def slim_instance(item: Any, fields: Optional[Iterable[str]]) -> Any:
+    """Return a dict instance with only the given fields (other values unchanged)."""
+    if fields is None or not isinstance(item, dict) or item.keys() <= set(fields):
+        return item
+    return {key: item[key] for key in fields if key in item}
+
+
+class _Reader:
+    """Incremental reader of JSON values from a text file handle."""
+
+    def __init__(self, fh: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _read(self, size: int) -> bool:
+        """Append the next chunk to the buffer (dropping the consumed part)."""
+        data = self.fh.read(size) if not self.eof else ""
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + data
+        self.pos = 0
+        return True
+
+    def _error(self, message: str):
+        return json.JSONDecodeError(message, self.buf, self.pos)
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at the end)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read(self.chunk_size):
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise self._error(f"Expecting '{char}'")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # numbers may continue in the next chunk (e.g. "1.5" + "e3")
+                if (
+                    self.eof
+                    or not isinstance(value, (int, float))
+                    or (end < len(self.buf) and self.buf[end] in _DELIMITERS)
+                ):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # incomplete value -- read more, in growing chunks for long values
+            self._read(size)
+            size *= 2
+
+    def _members(self, start: str, end: str) -> Iterator:
+        self.expect(start)
+        if self.peek() == end:
+            self.pos += 1
+            return
+        while True:
+            yield
+            char = self.peek()
+            self.pos += 1
+            if char == end:
+                return
+            if char != ",":
+                self.pos -= 1
+                raise self._error(f"Expecting ',' or '{end}'")
+
+    def keys(self) -> Iterator[str]:
+        """Iterate over the keys of an object; the caller must consume each value."""
+        for _ in self._members("{", "}"):
+            key = self.value()
+            if not isinstance(key, str):
+                raise self._error("Expecting property name")
+            self.expect(":")
+            yield key
+
+    def elements(self) -> Iterator[None]:
+        """Iterate over the elements of an array; the caller must consume each one."""
+        yield from self._members("[", "]")
+
+
+def _is_instance_list(path: tuple) -> bool:
+    """Arrays of instances: top-level arrays, arrays under a `values` key, and arrays of a
+    dataset -- directly under a top-level key (multi-dataset reference/source files) or
+    under `tasks` (submissions)."""
+    return (
+        len(path) <= 1
+        or path[-1] == "values"
+        or (len(path) >= 2 and path[-2] == "tasks")
+    )
+
+
+def _load(reader: _Reader, fields: Optional[Iterable[str]], path: tuple):
+    char = reader.peek()
+    if char == "{":
+        return {key: _load(reader, fields, path + (key,)) for key in reader.keys()}
+    if char == "[" and _is_instance_list(path):
+        return [slim_instance(reader.value(), fields) for _ in reader.elements()]
+    return reader.value()
+
+
+def load_json(
+    source: Union[str, TextIO],
+    fields: Optional[Iterable[str]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Any:
+    """Load a JSON file (a path or an open text file handle) incrementally.
+
+    Lists of instances (a top-level array, arrays under a `values` key at any depth --
+    e.g. `tasks.<dataset>.values` in a submission -- and bare dataset arrays such as
+    `tasks.<dataset>` or `<dataset>` in a multi-dataset reference file) are decoded
+    instance by instance and dict instances are reduced to the given `fields` (all fields
+    are kept if `None`).
+    """
+    if isinstance(source, str):
+        with open(source, "r", encoding="UTF-8") as fh:
+            return load_json(fh, fields, chunk_size)
+    fields = list(fields) if fields is not None else None
+    reader = _Reader(source, chunk_size)
+    result = _load(reader, fields, ())
+    if reader.peek() != "":
+        raise reader._error("Extra data")
+    return result
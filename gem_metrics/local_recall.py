@@ -23,19 +23,26 @@ class LocalRecall(ReferencedMetric):
 
     This means that the scores produced by this code will be higher than the ones produced by the original code.
     The advantage is that we don't have to rely on a part-of-speech tagger.
-    """
 
-    def support_caching(self):
-        # LocalRecall is corpus-level, so individual examples can't be aggregated.
-        return False
+    LocalRecall is corpus-level, so per-example overlap and reference vocabulary sizes are
+    computed (and cached) and summed to compute the score.
+    """
 
     def compute(self, cache, predictions: Predictions, references: References) -> Dict:
-        results = LocalRecall.local_recall_scores(
-            predictions.list_tokenized_lower_nopunct,
-            references.list_tokenized_lower_nopunct,
-        )
+        return {
+            pred_id: LocalRecall.item_outcomes(pred, refs)
+            for pred_id, pred, refs in zip(
+                predictions.ids,
+                predictions.list_tokenized_lower_nopunct,
+                references.list_tokenized_lower_nopunct,
+            )
+        }
 
-        return {"local_recall": results}
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Compute the corpus-level scores from per-example outcomes."""
+        if not score_list:
+            return {}
+        return {"local_recall": LocalRecall.aggregate_outcomes(score_list)}
 
     @staticmethod
     def build_reference_index(refs: List[List[str]]) -> Dict[int, Set]:
@@ -98,23 +105,44 @@ class LocalRecall(ReferencedMetric):
         return score
 
     @staticmethod
-    def local_recall_scores(
-        predictions: List[List[str]], full_references: List[List[List[str]]]
-    ) -> Dict:
+    def item_outcomes(prediction: List[str], refs: List[List[str]]) -> Dict:
         """
-        Compute local recall scores.
+        Return the (size_overlap, size_refs) pairs for a single item, for each importance
+        score from 1 to the number of references.
+        """
+        results = LocalRecall.check_item(prediction, refs)
+        return {
+            n: (results[f"size-overlap-{n}"], results[f"size-refs-{n}"])
+            for n in range(1, len(refs) + 1)
+        }
+
+    @staticmethod
+    def aggregate_outcomes(item_outcomes: List[Dict]) -> Dict:
+        """
+        Compute local recall scores from outcomes of individual items (see `item_outcomes`).
         """
         num_refs = set()
         outcomes = defaultdict(list)
-        for pred, refs in zip(predictions, full_references):
-            results = LocalRecall.check_item(pred, refs)
-            total_refs = len(refs)
-            num_refs.add(total_refs)
-            for n in range(1, total_refs + 1):
-                pair = (results[f"size-overlap-{n}"], results[f"size-refs-{n}"])
+        for item in item_outcomes:
+            num_refs.add(len(item))
+            for n, pair in item.items():
                 outcomes[n].append(pair)
         scores = {
             n: LocalRecall.aggregate_score(outcomes[n])
             for n in range(1, max(num_refs) + 1)
         }
         return scores
+
+    @staticmethod
+    def local_recall_scores(
+        predictions: List[List[str]], full_references: List[List[List[str]]]
+    ) -> Dict:
+        """
+        Compute local recall scores.
+        """
+        return LocalRecall.aggregate_outcomes(
+            [
+                LocalRecall.item_outcomes(pred, refs)
+                for pred, refs in zip(predictions, full_references)
+            ]
+        )
@@ -4,28 +4,60 @@ from .metric import ReferencedMetric
 from .impl.meteor import PyMeteorWrapper
 from .texts import Predictions, References
 
-from typing import Dict
+from typing import Dict, List
 from logzero import logger
 
 
 class Meteor(ReferencedMetric):
     """METEOR uses the original Java Meteor-1.5 implementation with a wrapper adapted from
-    MSCOCO/E2E-metrics."""
+    MSCOCO/E2E-metrics.
 
-    def support_caching(self):
-        # METEOR is corpus-level, so individual examples can't be aggregated.
-        # While individual scores can be computed, the overall score is different.
-        return False
+    METEOR is corpus-level (the overall score is different from the average of individual
+    scores), so per-example METEOR statistics are computed (and cached) and the corpus score
+    is computed from all of them together.
+    """
+
+    def __init__(self):
+        self.wrappers = {}
+
+    def _get_wrapper(self, language: str) -> PyMeteorWrapper:
+        """Start METEOR for the given language (or reuse a running instance)."""
+        if language not in self.wrappers:
+            self.wrappers[language] = PyMeteorWrapper(language)
+        return self.wrappers[language]
 
     def compute(self, cache, predictions: Predictions, references: References) -> Dict:
+        language = predictions.language.alpha_2
+        try:
+            m = self._get_wrapper(language)
+        except Exception as e:
+            logger.warn(f"Cannot run Meteor -- Skipping: {str(e)}")
+            return {pred_id: None for pred_id in predictions.ids}
+        try:
+            stats = m.compute_stats(predictions.untokenized, references.untokenized)
+        except BrokenPipeError:
+            logger.warn("METEOR FAILED TO COMPUTE.")
+            return {pred_id: None for pred_id in predictions.ids}
+        # scoring parameters are language-specific
+        return {
+            pred_id: {"language": language, "stats": stat}
+            for pred_id, stat in zip(predictions.ids, stats)
+        }
+
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Compute the corpus-level score from per-example statistics."""
+        if not score_list:
+            return {}
+        if any(stats is None for stats in score_list):
+            return {"meteor": None}
         try:
-            m = PyMeteorWrapper(predictions.language.alpha_2)
+            m = self._get_wrapper(score_list[0]["language"])
         except Exception as e:
             logger.warn(f"Cannot run Meteor -- Skipping: {str(e)}")
             return {"meteor": None}
         # ignore individual sentence scores
         try:
-            meteor, _ = m.compute_score(predictions.untokenized, references.untokenized)
+            meteor, _ = m.score_stats([stats["stats"] for stats in score_list])
         except BrokenPipeError:
             logger.warn("METEOR FAILED TO COMPUTE.")
             meteor = -99
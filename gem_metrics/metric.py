@@ -1,13 +1,24 @@
 #!/usr/bin/env python3
 from .texts import Predictions, References, Sources
+from .cache import content_digest, get_many, set_many
+from .groupby import group_means
+from .reference_index import reference_index
+from .tokenize import tokenizer_version
 
+from contextlib import contextmanager
 from copy import copy
+import gc
+import threading
 import numpy as np
 from typing import List, Dict
 from logzero import logger
 
 
 class AbstractMetric:
+    # Version of the format of individual scores returned by `compute`. It is a part of the
+    # cache keys, so increase it whenever the format changes (stale entries aren't used).
+    score_format = 1
+
     def compute(self):
         raise NotImplementedError
 
@@ -18,6 +29,12 @@ class AbstractMetric:
         """Function that initializes heavy models outside of the __init___."""
         pass
 
+    def reset(self):
+        """Clear any state accumulated by a previous `compute` call, so that the instance
+        can be reused for another dataset (see `MetricPool`). Models etc. should be kept.
+        """
+        pass
+
     def _aggregate_scores(self, score_list: List):
         """Helper function to aggregate multiple scores into a single one."""
         if not score_list:
@@ -48,17 +65,93 @@ class AbstractMetric:
             "Please add to this function an aggregator for your data format."
         )
 
+    def aggregate(self, scores: Dict, reference_tables=None) -> Dict:
+        """Aggregate individual scores, keyed by prediction ID (see `compute_per_example`).
+        Override this instead of `_aggregate_scores` if the IDs are needed.
+
+        `reference_tables` are the reference index tables for the references (see
+        `lookup_reference_tables`), None unless the metric has `build_reference_tables`.
+        """
+        return self._aggregate_scores(list(scores.values()))
+
+    def config(self) -> Dict:
+        """Settings of this instance that influence the scores (e.g. window size, model
+        checkpoint). They are a part of the cache keys, so override this for any metric
+        with parameters. Must be JSON-serializable."""
+        return {}
+
+    def cache_keys(
+        self, predictions: Predictions, *args, indexed: bool = False
+    ) -> List:
+        """Return content-addressed cache keys for all instances in `predictions`, based on
+        the prediction text, the corresponding reference/source texts (`args`), the
+        metric name, configuration and score format, and the tokenizer version.
+        `indexed` marks scores computed with the reference index (which may contain less
+        statistics)."""
+        name, config = self.__class__.__name__, self.config()
+        language = getattr(predictions.language, "alpha_2", None)
+        task = getattr(predictions, "task", None)
+        version = tokenizer_version(predictions.tokenize_func)
+        return [
+            (
+                name,
+                content_digest(
+                    name,
+                    config,
+                    self.score_format,
+                    indexed,
+                    language,
+                    task,
+                    version,
+                    *texts,
+                ),
+            )
+            for texts in zip(
+                predictions.untokenized, *[arg.untokenized for arg in args]
+            )
+        ]
+
     def compute_cached(self, cache, predictions: Predictions, *args):
         """Loops through the predictions to check for cache hits before computing."""
-        original_order = copy(predictions.ids)
+        if not self.support_caching():
+            # If module does not support caching, just return module output directly.
+            if not predictions.ids:
+                return {}
+            return self._compute_filtered(cache, predictions.ids, predictions, *args)
+
+        scores = self.compute_per_example(cache, predictions, *args)
+        # Aggregate individual scores.
+        return self.aggregate(scores, self.lookup_reference_tables(predictions, *args))
+
+    def lookup_reference_tables(self, predictions: Predictions, *args):
+        """Return the reference index tables of this metric for the references (the first
+        of `args`), or None if the index is disabled, not supported by the metric, or
+        doesn't cover the IDs of the predictions."""
+        return reference_index.get(self, *args[:1], predictions=predictions)
 
+    def compute_per_example(self, cache, predictions: Predictions, *args) -> Dict:
+        """Return individual scores for all predictions, keyed by ID, in the order of
+        `predictions.ids`. Cached scores are reused, the rest is computed (and cached).
+        Only for metrics that `support_caching()`.
+
+        If the reference index is enabled for the metric, its tables are only looked up
+        (and built if needed) when something has to be computed.
+        """
+        indexed = reference_index.enabled(self, *args[:1], predictions=predictions)
         to_compute = []
         cached_scores = {}
+        cache_keys = {}
         # Loop over IDs to check what needs to be computed and what is cached.
-        if cache is not None and self.support_caching():
+        if cache is not None:
+            cache_keys = dict(
+                zip(
+                    predictions.ids,
+                    self.cache_keys(predictions, *args, indexed=indexed),
+                )
+            )
+            found = get_many(cache, cache_keys.values())
             for pred_id in predictions.ids:
-                cache_key = (self.__class__.__name__, predictions.filename, pred_id)
-                current_score = cache.get(cache_key, None)
+                current_score = found.get(cache_keys[pred_id])
 
                 if current_score is not None:
                     cached_scores[pred_id] = current_score
@@ -68,34 +161,73 @@ class AbstractMetric:
             to_compute = predictions.ids
 
         # Compute the rest if anything is left to compute.
-        computed_scores = {}
         if to_compute:
-            # Initialize in case it is defined (heavy metrics).
-            self._initialize()
-            # Each class needs filter() to list of ID in order.
-            # Filtering done on copy to avoid destroying the underlying obj.
-            new_arg_list = []
-            for arg in [predictions] + list(args):
-                new_arg = copy(arg)
-                new_arg.assign_ids_and_unscramble(to_compute)
-                new_arg_list.append(new_arg)
-            computed_scores = self.compute(cache, *new_arg_list)
+            kwargs = {}
+            if indexed:
+                kwargs["reference_tables"] = self.lookup_reference_tables(
+                    predictions, *args
+                )
+            computed_scores = self._compute_filtered(
+                cache, to_compute, predictions, *args, **kwargs
+            )
+            # Write the newly computed scores to the cache (`None` = failed to compute).
+            if cache_keys:
+                set_many(
+                    cache,
+                    {
+                        cache_keys[pred_id]: score
+                        for pred_id, score in computed_scores.items()
+                        if score is not None
+                    },
+                )
+            cached_scores.update(computed_scores)
         else:
             logger.info(
                 f"Everything in {self.__class__.__name__} for {predictions.filename} was cached :)"
             )
 
-        if self.support_caching():
-            # Combine them back and reshuffle.
-            cached_scores.update(computed_scores)
-            scores = cached_scores
-            scores_ordered = [scores[pred_id] for pred_id in original_order]
-            # Aggregate individual scores.
-            aggregated_score = self._aggregate_scores(scores_ordered)
-        else:
-            # If module does not support caching, just return module output directly.
-            aggregated_score = computed_scores
-        return aggregated_score
+        # Combine them back and reshuffle.
+        return {pred_id: cached_scores[pred_id] for pred_id in predictions.ids}
+
+    def _compute_filtered(
+        self, cache, ids: List, predictions: Predictions, *args, **kwargs
+    ):
+        """Run `compute` on the given IDs only (`kwargs` are passed to it)."""
+        # Initialize in case it is defined (heavy metrics).
+        self._initialize()
+        # Each class needs filter() to list of ID in order.
+        # Filtering done on copy to avoid destroying the underlying obj.
+        new_arg_list = []
+        for arg in [predictions] + list(args):
+            new_arg = copy(arg)
+            # references/sources without IDs are aligned with the predictions
+            if new_arg.ids is None:
+                new_arg.assign_ids_and_unscramble(predictions.ids)
+            new_arg.assign_ids_and_unscramble(ids)
+            new_arg_list.append(new_arg)
+        return self.compute(cache, *new_arg_list, **kwargs)
+
+    def aggregate_subsets(
+        self, scores: Dict, subsets: Dict[str, List], reference_tables=None
+    ) -> Dict:
+        """Aggregate individual scores (see `compute_per_example`) for each of the given
+        subsets (name -> list of IDs), without recomputing anything. `reference_tables`
+        are passed to `aggregate`.
+
+        Metrics using the default mean aggregation are aggregated for all subsets at once
+        (see `groupby.group_means`), others via their `aggregate` for each subset.
+        """
+        if (
+            type(self)._aggregate_scores is AbstractMetric._aggregate_scores
+            and type(self).aggregate is AbstractMetric.aggregate
+        ):
+            return group_means(scores, subsets)
+        return {
+            name: self.aggregate(
+                {pred_id: scores[pred_id] for pred_id in ids}, reference_tables
+            )
+            for name, ids in subsets.items()
+        }
 
 
 class ReferencelessMetric(AbstractMetric):
@@ -141,12 +273,72 @@ class ReproReferencedMetric(ReferencedMetric):
         _, micro = self.metric.predict_batch(inputs)
         micro = self._postprocess(micro)
 
-        # Write to the cache if not None and collect outputs
-        id_to_scores = {}
-        for pred_id, score_dict in zip(predictions.ids, micro):
-            id_to_scores[pred_id] = score_dict
-            if cache is not None:
-                cache_key = (self.__class__.__name__, predictions.filename, pred_id)
-                cache[cache_key] = score_dict
+        # Collect outputs (they are written to the cache by `compute_cached`)
+        return {
+            pred_id: score_dict for pred_id, score_dict in zip(predictions.ids, micro)
+        }
+
+
+class MetricPool:
+    """Pool of warm metric instances, keyed by metric class and constructor arguments.
+
+    Instead of creating (and loading models for) a new metric instance for every dataset,
+    instances are borrowed from the pool and returned after use, so they can be reused for
+    the next dataset. Each instance is only used by one caller at a time and is `reset()`
+    before it is handed out again.
+
+    Instances stay alive until `release()` is called (or the pool is garbage-collected).
+    """
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(metric_class, config: Dict):
+        return (metric_class, tuple(sorted(config.items())))
+
+    @contextmanager
+    def use(self, metric_class, **config):
+        """Borrow an instance of `metric_class` (created with `config` as constructor
+        arguments if no idle one is available) for the duration of a `with` block."""
+        key = self._key(metric_class, config)
+        with self._lock:
+            idle = self._idle.get(key)
+            metric = idle.pop() if idle else None
+        if metric is None:
+            logger.info(f"Creating new {metric_class.__name__} instance.")
+            metric = metric_class(**config)
+        else:
+            metric.reset()
+        try:
+            yield metric
+        finally:
+            with self._lock:
+                self._idle.setdefault(key, []).append(metric)
+
+    def release(self, metric_class=None, **config):
+        """Drop idle instances to free memory -- all of them, all of the given class, or
+        only those with the given class and configuration."""
+        with self._lock:
+            if metric_class is None:
+                self._idle.clear()
+            elif config:
+                self._idle.pop(self._key(metric_class, config), None)
+            else:
+                for key in [key for key in self._idle if key[0] is metric_class]:
+                    del self._idle[key]
+        # Explicit collection due to memory leak when multiple models were instantiated.
+        gc.collect()
+
+    def __len__(self):
+        """Number of idle instances in the pool."""
+        with self._lock:
+            return sum(len(instances) for instances in self._idle.values())
+
+    def __getstate__(self):
+        # Instances (and the lock) are not shipped to other processes, they start empty.
+        return {}
 
-        return id_to_scores
+    def __setstate__(self, state):
+        self.__init__()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 from .metric import ReferencelessMetric
 from .texts import Predictions
+from .tokenize import decode_tokens, encode_tokens
+from .vocab import PUNCTUATION
 
 import itertools
 import random
@@ -14,30 +16,45 @@ class MSTTR(ReferencelessMetric):
 
     This is based on Emiel van Miltenburg's scripts from:
     https://github.com/evanmiltenburg/NLG-diversity/blob/main/diversity.py
+
+    MSTTR is corpus-level, so per-example lowercased tokens are stored (and cached, encoded
+    as a single string) and concatenated to compute the score. Punctuation is removed when
+    aggregating.
     """
 
+    score_format = 2
+
     def __init__(self, window_size: int = 100):
         # use MSTTR-100 by default.
-        self.rnd = random.Random(1234)
         self.window_size = window_size
+        self.reset()
+
+    def reset(self):
+        self.rnd = random.Random(1234)
 
-    def support_caching(self):
-        # MSTTR is corpus-level, so individual examples can't be aggregated.
-        return False
+    def config(self):
+        return {"window_size": self.window_size}
 
     def compute(self, cache, predictions: Predictions) -> Dict:
+        return {
+            pred_id: {"tokens": encode_tokens(lower)}
+            for pred_id, lower in zip(predictions.ids, predictions.list_tokenized_lower)
+        }
+
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Compute the corpus-level score from per-example tokens."""
+        if not score_list:
+            return {}
+        lower = [decode_tokens(stats["tokens"]) for stats in score_list]
+        lower_nopunct = [
+            [token for token in inst if token not in PUNCTUATION] for inst in lower
+        ]
         return {
             f"msttr-{self.window_size}": round(
-                self._MSTTR(predictions.list_tokenized_lower, self.window_size)[
-                    "msttr_value"
-                ],
-                5,
+                self._MSTTR(lower, self.window_size)["msttr_value"], 5
             ),
             f"msttr-{self.window_size}_nopunct": round(
-                self._MSTTR(predictions.list_tokenized_lower_nopunct, self.window_size)[
-                    "msttr_value"
-                ],
-                5,
+                self._MSTTR(lower_nopunct, self.window_size)["msttr_value"], 5
             ),
         }
 
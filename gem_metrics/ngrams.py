@@ -3,6 +3,8 @@
 from typing import Dict, List, Tuple
 from .metric import ReferencelessMetric
 from .texts import Predictions
+from .tokenize import decode_tokens, encode_tokens
+from .vocab import PUNCTUATION
 
 import numpy as np
 from nltk import ngrams
@@ -24,19 +26,31 @@ class NGramStats(ReferencelessMetric):
     Based on:
     https://github.com/evanmiltenburg/NLG-diversity/blob/main/diversity.py
     https://github.com/tuetschek/e2e-stats/blob/master/nlg_dataset_stats.py
+
+    All statistics are corpus-level, so per-example lowercased tokens are stored (and
+    cached, encoded as a single string) and the statistics are computed over all of them
+    together. Punctuation is removed when aggregating.
     """
 
-    def support_caching(self):
-        # NGramStats is corpus-level, so individual examples can't be aggregated.
-        return False
+    score_format = 2
 
     def compute(self, cache, predictions: Predictions) -> Dict:
-
+        return {
+            pred_id: {"tokens": encode_tokens(lower)}
+            for pred_id, lower in zip(predictions.ids, predictions.list_tokenized_lower)
+        }
+
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Compute the corpus-level statistics from per-example tokens."""
+        if not score_list:
+            return {}
+
+        lower = [decode_tokens(stats["tokens"]) for stats in score_list]
+        lower_nopunct = [
+            [token for token in inst if token not in PUNCTUATION] for inst in lower
+        ]
         results = {}
-        for data_id, data in [
-            ("", predictions.list_tokenized_lower),
-            ("-nopunct", predictions.list_tokenized_lower_nopunct),
-        ]:
+        for data_id, data in [("", lower), ("-nopunct", lower_nopunct)]:
 
             lengths = [len(inst) for inst in data]
             results[f"total_length{data_id}"] = sum(lengths)
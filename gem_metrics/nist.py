@@ -2,20 +2,214 @@
 
 from .texts import Predictions, References
 from .metric import ReferencedMetric
+from .reference_index import encode_ngrams, ngram_index
 from .impl.pymteval import NISTScore
 
-from typing import Dict
+import math
+import numpy as np
+from typing import Dict, List
 
 
 class NIST(ReferencedMetric):
-    """NIST from e2e-metrics."""
+    """NIST from e2e-metrics.
 
-    def support_caching(self):
-        # NIST is corpus-level, so individual examples can't be aggregated.
-        return False
+    NIST is corpus-level (n-gram information weights are based on all references), so
+    per-example n-gram statistics are computed (and cached) and the corpus score is computed
+    from all of them together.
 
-    def compute(self, cache, predictions: Predictions, references: References) -> Dict:
+    With the reference index enabled, all reference n-gram counts come from the index and
+    the per-example statistics only contain output lengths and n-gram hits.
+    """
+
+    def compute(
+        self,
+        cache,
+        predictions: Predictions,
+        references: References,
+        reference_tables=None,
+    ) -> Dict:
+        if reference_tables is not None:
+            return self._compute_indexed(predictions, reference_tables)
+        nist = NISTScore()
+        return {
+            pred_id: nist.segment_stats(pred, refs)
+            for pred_id, pred, refs in zip(
+                predictions.ids, predictions.untokenized, references.untokenized
+            )
+        }
+
+    def _compute_indexed(self, predictions: Predictions, tables) -> Dict:
+        """Compute output lengths and n-gram hits (the same as in `segment_stats`), with
+        the merged reference n-gram counts of each example from the reference index."""
+        index = self._ngram_index(tables)
+        nist = NISTScore()
+        stats_list = []
+        # all output n-grams, with their counts, example (row) and order
+        ngrams, counts, examples, orders = [], [], [], []
+        for pred in predictions.untokenized:
+            pred_sent, _ = nist.check_tokenized(pred, [])
+            stats = {"cand_lens": [], "hit_ngrams": []}
+            for n in range(nist.max_ngram):
+                stats["cand_lens"].append(len(pred_sent) - n)
+                stats["hit_ngrams"].append({})
+                pred_ngrams = nist.get_ngram_counts(n + 1, [pred_sent])
+                ngrams.extend(pred_ngrams)
+                counts.extend(pred_ngrams.values())
+                examples.extend([len(stats_list)] * len(pred_ngrams))
+                orders.extend([n] * len(pred_ngrams))
+            stats_list.append(stats)
+
+        # look up the reference counts by (row, n-gram ID)
+        ids = np.fromiter(
+            (index.get(ngram, -1) for ngram in ngrams),
+            dtype=np.int64,
+            count=len(ngrams),
+        )
+        rows = tables.rows(predictions.ids)[np.array(examples, dtype=np.int64)]
+        keys = rows * len(index) + ids
+        merged_keys = tables["merged_keys"]
+        hits = np.zeros(len(ngrams), dtype=np.int64)
+        if len(merged_keys):
+            pos = np.minimum(np.searchsorted(merged_keys, keys), len(merged_keys) - 1)
+            found = (ids >= 0) & (merged_keys[pos] == keys)
+            hits[found] = np.minimum(
+                np.array(counts, dtype=np.int64)[found],
+                tables["merged_counts"][pos[found]],
+            )
+        hits = hits.tolist()
+        for i in np.flatnonzero(hits).tolist():
+            stats_list[examples[i]]["hit_ngrams"][orders[i]][ngrams[i]] = hits[i]
+        return dict(zip(predictions.ids, stats_list))
+
+    @staticmethod
+    def _ngram_index(tables) -> Dict:
+        """N-gram IDs of the reference tables (built once per reference set)."""
+        index = tables.memo.get("index")
+        if index is None:
+            index = ngram_index(tables["vocab"])
+            tables.memo["index"] = index
+        return index
+
+    def build_reference_tables(self, references: References) -> Dict:
+        """Reference-side statistics for the reference index, with n-grams as IDs
+        (indexing `vocab`): total n-gram counts of each example (for information
+        weights), their merged (maximum) counts for n-gram hits, and reference lengths.
+        """
+        nist = NISTScore()
+        index = {}
+        ngram_ids, ngram_counts, sizes, ref_len_sum, num_refs = [], [], [], [], []
+        merged_rows, merged_ids, merged_counts = [], [], []
+        for row, refs in enumerate(references.untokenized):
+            _, ref_sents = nist.check_tokenized([], refs)
+            stats = nist.ref_stats(ref_sents)
+            # (shorter n-grams first, so prefixes of all n-grams are already indexed)
+            for ref_ngrams in stats["ref_ngrams"]:
+                ngram_ids.extend(
+                    [index.setdefault(ngram, len(index)) for ngram in ref_ngrams]
+                )
+                ngram_counts.extend(ref_ngrams.values())
+            sizes.append(sum(len(ref_ngrams) for ref_ngrams in stats["ref_ngrams"]))
+            ref_len_sum.append(stats["ref_len_sum"])
+            num_refs.append(stats["num_refs"])
+            for n in range(nist.max_ngram):
+                merged = nist.get_ngram_counts(n + 1, ref_sents)
+                merged_ids.extend([index[ngram] for ngram in merged])
+                merged_counts.extend(merged.values())
+                merged_rows.extend([row] * len(merged))
+        ngram_ids = np.array(ngram_ids, dtype=np.int64)
+        ngram_counts = np.array(ngram_counts, dtype=np.int64)
+        merged_keys = np.array(merged_rows, dtype=np.int64) * len(index) + np.array(
+            merged_ids, dtype=np.int64
+        )
+        order = np.argsort(merged_keys, kind="stable")
+        return {
+            "vocab": encode_ngrams(index),
+            # ID of each n-gram without its last token (-1 for unigrams)
+            "prefix": np.array(
+                [index[ngram[:-1]] if len(ngram) > 1 else -1 for ngram in index],
+                dtype=np.int64,
+            ),
+            "offsets": np.cumsum([0] + sizes, dtype=np.int64),
+            "ngram_ids": ngram_ids,
+            "ngram_counts": ngram_counts,
+            "totals": self._totals(ngram_ids, ngram_counts, len(index)),
+            "ref_len_sum": np.array(ref_len_sum, dtype=np.int64),
+            "num_refs": np.array(num_refs, dtype=np.int64),
+            # merged counts, sorted by (row, n-gram ID)
+            "merged_keys": merged_keys[order],
+            "merged_counts": np.array(merged_counts, dtype=np.int64)[order],
+        }
+
+    @staticmethod
+    def _totals(ngram_ids, ngram_counts, vocab_size: int) -> np.ndarray:
+        totals = np.bincount(ngram_ids, weights=ngram_counts, minlength=vocab_size)
+        return totals.astype(np.int64)
+
+    def aggregate(self, scores: Dict, reference_tables=None) -> Dict:
+        """Compute the corpus-level score from per-example statistics, with reference
+        n-gram counts from the reference index if it is enabled."""
+        if reference_tables is None:
+            return super().aggregate(scores)
+        if not scores:
+            return {}
+        tables = reference_tables
+        index = self._ngram_index(tables)
+        rows = tables.rows(list(scores))
+        totals = tables["totals"]
+        if not tables.covers(rows):
+            # information weights are based on the scored examples only
+            offsets = tables["offsets"]
+            selected = np.zeros(len(offsets) - 1, dtype=bool)
+            selected[rows] = True
+            mask = np.repeat(selected, np.diff(offsets))
+            totals = self._totals(
+                tables["ngram_ids"][mask], tables["ngram_counts"][mask], len(index)
+            )
+        nist = _IndexedNISTScore(index, tables["prefix"], totals)
+        for stats in scores.values():
+            nist.append_stats(stats)
+        for ref_len_sum, num_refs in zip(
+            tables["ref_len_sum"][rows].tolist(), tables["num_refs"][rows].tolist()
+        ):
+            nist.append_ref_stats(ref_len_sum, num_refs)
+        return {"nist": nist.score()}
+
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Compute the corpus-level score from per-example statistics."""
+        if not score_list:
+            return {}
         nist = NISTScore()
-        for pred, refs in zip(predictions.untokenized, references.untokenized):
-            nist.append(pred, refs)
+        for stats in score_list:
+            nist.append_stats(stats)
         return {"nist": nist.score()}
+
+
+class _IndexedNISTScore(NISTScore):
+    """`NISTScore` with reference n-gram counts taken from the reference index (per n-gram
+    ID, see `NIST.build_reference_tables`) instead of per-example statistics."""
+
+    def __init__(self, index: Dict, prefix: np.ndarray, totals: np.ndarray):
+        super().__init__()
+        self.index = index
+        self.prefix = prefix
+        self.totals = totals
+
+    def append_stats(self, stats):
+        for n in range(self.max_ngram):
+            self.cand_lens[n].append(stats["cand_lens"][n])
+            self.hit_ngrams[n].append(stats["hit_ngrams"][n])
+
+    def append_ref_stats(self, ref_len_sum: int, num_refs: int):
+        self.ref_ngrams[0][()] += ref_len_sum
+        self.avg_ref_len += ref_len_sum / float(num_refs)
+
+    def info(self, ngram):
+        ngram_id = self.index.get(ngram)
+        count = 0 if ngram_id is None else int(self.totals[ngram_id])
+        if not count:
+            return 0.0
+        prefix = int(self.prefix[ngram_id])
+        prefix_count = (
+            self.ref_ngrams[0][()] if prefix < 0 else int(self.totals[prefix])
+        )
+        return math.log(prefix_count / float(count), 2)
@@ -6,5 +6,9 @@ from .metric import ReproReferencedMetric
 
 class Prism(ReproReferencedMetric):
     def __init__(self, language: str = "en", device: int = 0):
+        self.language = language
         metric = _Prism(language=language, device=device)
         super().__init__(metric)
+
+    def config(self):
+        return {"language": self.language}
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Persisted reference index: reference-side structures of corpus-level metrics (such as
+CIDEr document frequencies and reference tf-idf vectors, or NIST n-gram counts for the
+information weights), computed once per reference set and metric configuration.
+
+The references of a GEM dataset are the same for every submission. With the index enabled
+(`reference_index.open()`, `--reference_index` on the command line), the structures are
+built the first time a metric sees a reference set, saved under `data/references/index/`
+and memory-mapped in later runs -- scoring a submission then only does hypothesis-side
+work.
+
+Metrics opt in by implementing `build_reference_tables(references)`, which returns named
+NumPy arrays (or lists of strings / lists of lists of strings, stored as
+`columnar.StringColumn`s; see `encode_ngrams` for n-grams). The tables for the references
+are passed to the metric's `compute` and `aggregate` as `reference_tables` (see
+`AbstractMetric.compute_per_example`). Entries are keyed by the reference texts, IDs and
+tokenizer, and by the metric name and configuration, so a changed reference file never
+uses stale tables.
+"""
+
+from collections.abc import Mapping
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from logzero import logger
+
+from .cache import content_digest, texts_digest
+from .columnar import StringColumn, tokenizer_key
+from .data import _BASE_DIR
+from .tokenize import TOKEN_SEPARATOR
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+DEFAULT_FOLDER = os.path.join(_BASE_DIR, "references", "index")
+
+
+def encode_ngrams(ngrams: Iterable[tuple]) -> List[str]:
+    """Encode n-grams (tuples of tokens) as strings, to be stored in reference tables.
+    Raises a ValueError if any of the tokens contain `TOKEN_SEPARATOR`."""
+    ngrams = list(ngrams)
+    encoded = [TOKEN_SEPARATOR.join(ngram) for ngram in ngrams]
+    separators = sum(len(ngram) - 1 for ngram in ngrams if ngram)
+    if "".join(encoded).count(TOKEN_SEPARATOR) != separators:
+        raise ValueError("Tokens contain the token separator, cannot encode n-grams")
+    return encoded
+
+
+def ngram_index(encoded: Sequence[str]) -> Dict[tuple, int]:
+    """Return a dict of n-grams to their positions, for n-grams from `encode_ngrams`."""
+    return {tuple(ngram.split(TOKEN_SEPARATOR)): i for i, ngram in enumerate(encoded)}
+
+
+class ReferenceTables(Mapping):
+    """Reference-side structures of one metric for one reference set -- a read-only mapping
+    of names to arrays -- and the IDs of the references (one row per ID).
+
+    `memo` holds structures derived from the tables in this process (e.g. lookup dicts), so
+    that they are only built once for each reference set.
+    """
+
+    def __init__(self, tables: Dict, ids: List[str]):
+        self.tables = tables
+        self.ids = ids
+        self.memo = {}
+        self._rows = None
+
+    def __getitem__(self, name: str):
+        return self.tables[name]
+
+    def __iter__(self):
+        return iter(self.tables)
+
+    def __len__(self):
+        return len(self.tables)
+
+    def rows(self, ids: List[str]) -> np.ndarray:
+        """Return the rows of the given reference IDs."""
+        if self._rows is None:
+            self._rows = {gem_id: row for row, gem_id in enumerate(self.ids)}
+        return np.fromiter(
+            (self._rows[gem_id] for gem_id in ids), dtype=np.int64, count=len(ids)
+        )
+
+    def covers(self, rows: np.ndarray) -> bool:
+        """Return true if the given rows are all the rows, in order."""
+        return len(rows) == len(self.ids) and bool(np.all(rows == np.arange(len(rows))))
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        meta = {"format_version": FORMAT_VERSION, "arrays": [], "strings": []}
+        for name, values in self.tables.items():
+            if isinstance(values, np.ndarray):
+                np.save(os.path.join(path, name + ".npy"), values)
+                meta["arrays"].append(name)
+            else:
+                StringColumn.from_list(list(values)).save(path, name)
+                meta["strings"].append(name)
+        StringColumn.from_list(list(self.ids)).save(path, "ids")
+        # written last, so that incomplete entries aren't recognized
+        with open(os.path.join(path, META_FILE), "w", encoding="UTF-8") as fh:
+            json.dump(meta, fh, indent=2)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ReferenceTables":
+        with open(os.path.join(path, META_FILE), encoding="UTF-8") as fh:
+            meta = json.load(fh)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise Exception(
+                f"Unsupported reference index version {meta.get('format_version')} in {path}"
+            )
+        tables = {
+            name: np.load(
+                os.path.join(path, name + ".npy"), mmap_mode="r" if mmap else None
+            )
+            for name in meta["arrays"]
+        }
+        for name in meta["strings"]:
+            tables[name] = StringColumn.load(path, name, mmap)
+        return cls(tables, StringColumn.load(path, "ids", mmap))
+
+
+class ReferenceIndex:
+    """Store of `ReferenceTables` in a folder (disabled while `folder` is None). Tables
+    are built when first requested, saved, and kept in memory for the rest of the run.
+    """
+
+    def __init__(self, folder: Optional[str] = None):
+        self.folder = folder
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def open(self, folder: Optional[str] = None):
+        """Enable the index, stored in the given folder (default: `data/references/index`)."""
+        self.folder = folder or DEFAULT_FOLDER
+
+    def close(self):
+        """Disable the index and forget all loaded tables."""
+        self.folder = None
+        self.clear()
+
+    def clear(self):
+        """Forget all loaded tables (they are loaded again from disk when requested)."""
+        with self._lock:
+            self._loaded.clear()
+
+    def key(self, metric, references) -> str:
+        """Return the key of the tables of the given metric for the given references."""
+        return content_digest(
+            FORMAT_VERSION,
+            metric.__class__.__name__,
+            metric.config(),
+            texts_digest(references),
+            list(references.ids),
+            tokenizer_key(references.tokenize_func),
+        )
+
+    def enabled(self, metric, references=None, predictions=None) -> bool:
+        """Return true if the index is used for the given metric and references -- it is
+        enabled, the metric supports it, the references have IDs and all IDs of the
+        `predictions` (if given) are among them, as tables are looked up by reference ID
+        (cheap, nothing is looked up)."""
+        return (
+            self.folder is not None
+            and references is not None
+            and references.ids is not None
+            and hasattr(metric, "build_reference_tables")
+            and (predictions is None or self._covered(predictions.ids, references.ids))
+        )
+
+    @staticmethod
+    def _covered(ids: Optional[List[str]], reference_ids: List[str]) -> bool:
+        """Return true if all of the `ids` are reference IDs."""
+        if ids is None:
+            return False
+        return ids is reference_ids or set(ids).issubset(reference_ids)
+
+    def get(
+        self, metric, references=None, predictions=None
+    ) -> Optional[ReferenceTables]:
+        """Return the tables of the given metric for the given references -- loaded, or
+        built and saved if they are not in the index yet. Returns None if the index is
+        not `enabled` for them (and the `predictions`, if given), or the tables can't be
+        built for them (the metric then works without the index)."""
+        if not self.enabled(metric, references, predictions):
+            return None
+        key = self.key(metric, references)
+        with self._lock:
+            tables = self._loaded.get(key)
+        if tables is not None:
+            return tables
+
+        path = os.path.join(self.folder, f"{metric.__class__.__name__}-{key}")
+        if os.path.isfile(os.path.join(path, META_FILE)):
+            tables = ReferenceTables.load(path)
+        else:
+            logger.info(
+                f"Building {metric.__class__.__name__} reference index for {references.filename}..."
+            )
+            try:
+                tables = ReferenceTables(
+                    metric.build_reference_tables(references), list(references.ids)
+                )
+            except ValueError as e:
+                logger.warn(f"Not using the reference index: {str(e)}")
+                return None
+            self._save(tables, path)
+        with self._lock:
+            return self._loaded.setdefault(key, tables)
+
+    def _save(self, tables: ReferenceTables, path: str):
+        """Save the tables to a temporary folder and move it into place (so that concurrent
+        runs never see incomplete entries). Failures are only logged."""
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            tmp_path = tempfile.mkdtemp(dir=self.folder, prefix=".tmp-")
+            tables.save(tmp_path)
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                # saved by someone else in the meantime
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        except OSError as e:
+            logger.warn(f"Could not save reference index to {path}: {str(e)}")
+
+
+# Shared by all metrics, disabled unless opened.
+reference_index = ReferenceIndex()
@@ -14,9 +14,15 @@ class ROUGE(ReferencedMetric):
     the jackknifing follows the description of the ROUGE paper.
     """
 
+    def __init__(self):
+        self.rouge_types = ["rouge1", "rouge2", "rougeL", "rougeLsum"]
+        self.scorer = rouge_scorer.RougeScorer(
+            rouge_types=self.rouge_types, use_stemmer=True
+        )
+
     def compute(self, cache, predictions: Predictions, references: References) -> Dict:
-        rouge_types = ["rouge1", "rouge2", "rougeL", "rougeLsum"]
-        rouge = rouge_scorer.RougeScorer(rouge_types=rouge_types, use_stemmer=True)
+        rouge_types = self.rouge_types
+        rouge = self.scorer
         scores = {}
         # TODO expecting pretokenized data, do we want to imitate Rouge-155 tokenizer somehow?
         for refs, pred, pred_id in zip(
@@ -65,10 +71,6 @@ class ROUGE(ReferencedMetric):
                 }
                 for rouge_type in rouge_types
             }
-            # Write to cache if not None.
-            if cache is not None:
-                cache_key = (self.__class__.__name__, predictions.filename, pred_id)
-                cache[cache_key] = score
             scores[pred_id] = score
 
         return scores
@@ -41,14 +41,6 @@ class SARI(SourceAndReferencedMetric):
         for i in range(len(srcs)):
             score = {"sari": self.SARIsent(srcs[i], preds[i], refs[i]) * 100}
             sari_scores[predictions.ids[i]] = score
-            # Write to cache if not None.
-            if cache is not None:
-                cache_key = (
-                    self.__class__.__name__,
-                    predictions.filename,
-                    predictions.ids[i],
-                )
-                cache[cache_key] = score
 
         return sari_scores
 
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Splitting a multi-dataset submission into (dataset, metric) tasks and ordering them so that
+a worker pool finishes as early as possible.
+
+Tasks are handed out longest-first (LPT scheduling), based on a simple cost model:
+the size of the corpus (characters in predictions and references) times a relative
+per-metric cost factor.
+"""
+
+from .texts import Texts, Predictions, References, Sources
+from .metric import ReferencelessMetric
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+# Rough relative costs per character of input, measured on the light metrics
+# (referenceless metrics only see predictions, so their costs are not comparable
+# to referenced ones 1:1 -- but they are all cheap anyway).
+_METRIC_COSTS = {
+    "TTR": 0.1,
+    "Yules_I": 0.1,
+    "MSTTR": 0.3,
+    "NGramStats": 1.0,
+    "LocalRecall": 0.5,
+    "BLEU": 1.0,
+    "NIST": 2.0,
+    "CIDER": 2.0,
+    "CHRF": 3.0,
+    "SARI": 3.0,
+    "ROUGE": 4.0,
+    "TER": 4.0,
+    "WER": 5.0,
+    "Meteor": 5.0,
+}
+_DEFAULT_METRIC_COST = 1.0
+
+
+def get_metric_cost(metric_class) -> float:
+    """Return the relative per-character cost of the given metric class."""
+    return _METRIC_COSTS.get(metric_class.__name__, _DEFAULT_METRIC_COST)
+
+
+@dataclass
+class Task:
+    """A single unit of work -- one metric computed on one dataset."""
+
+    dataset: str
+    metric_class: type
+    cost: float = 0.0
+
+
+def _corpus_size(texts: Union[Texts, int, None]) -> int:
+    """Number of characters in the given texts (summed over multiple references), or the
+    given number if it is already known."""
+    if texts is None:
+        return 0
+    if isinstance(texts, int):
+        return texts
+    if texts.multi_ref:
+        return sum(len(text) for inst in texts.untokenized for text in inst)
+    return sum(len(text) for text in texts.untokenized)
+
+
+def applicable_metrics(
+    metrics_dict: Dict[str, List],
+    refs: Optional[References] = None,
+    srcs: Optional[Sources] = None,
+) -> List:
+    """List all metric classes from `metrics_dict` that can be computed given the available
+    references and sources, in the order in which `compute` would run them."""
+    metric_classes = list(metrics_dict["referenceless_metrics"])
+    if refs is not None:
+        metric_classes.extend(metrics_dict["referenced_metrics"])
+        if srcs is not None:
+            metric_classes.extend(metrics_dict["sourced_and_referenced_metrics"])
+    return metric_classes
+
+
+def build_tasks(
+    outs: Dict[str, Union[Predictions, int]],
+    refs: Dict[str, Optional[References]],
+    srcs: Dict[str, Optional[Sources]],
+    metrics_dict: Dict[str, List],
+) -> List[Task]:
+    """Create all (dataset, metric) tasks for the given datasets, sorted by estimated cost,
+    most expensive first.
+
+    Args:
+      outs: predictions keyed by dataset name (or just their sizes in characters, see
+        `Submission.corpus_size`, so that they don't need to be created yet).
+      refs: references keyed by dataset name (missing or None = no references).
+      srcs: sources keyed by dataset name (missing or None = no sources).
+      metrics_dict: metric classes as returned by `metric_list_to_metric_dict`.
+    """
+    tasks = []
+    for dataset, outs_ds in outs.items():
+        refs_ds, srcs_ds = refs.get(dataset), srcs.get(dataset)
+        outs_size = _corpus_size(outs_ds)
+        refs_size = _corpus_size(refs_ds) + _corpus_size(srcs_ds)
+        for metric_class in applicable_metrics(metrics_dict, refs_ds, srcs_ds):
+            size = outs_size
+            if not issubclass(metric_class, ReferencelessMetric):
+                size += refs_size
+            tasks.append(
+                Task(dataset, metric_class, size * get_metric_cost(metric_class))
+            )
+    # LPT: the longest tasks go first so that the pool does not wait for a straggler.
+    tasks.sort(key=lambda task: task.cost, reverse=True)
+    return tasks
@@ -3,22 +3,37 @@
 from .metric import ReferencedMetric
 from .texts import Predictions, References
 
-from typing import Dict
+from typing import Dict, List
 from sacrebleu.metrics import TER as _TER
+from sacrebleu.utils import sum_of_lists
 from itertools import zip_longest
 
 
 class TER(ReferencedMetric):
-    """Translation error rate (TER) from SacreBLEU."""
+    """Translation error rate (TER) from SacreBLEU.
+
+    TER is corpus-level, so per-example edit counts and reference lengths are computed (and
+    cached) and the corpus score is computed from their sums.
+    """
 
     def __init__(self, normalized: bool = True, case_sensitive: bool = False):
+        self.normalized = normalized
+        self.case_sensitive = case_sensitive
         self.metric = _TER(normalized=normalized, case_sensitive=case_sensitive)
 
-    def support_caching(self):
-        # corpus-level, so individual examples can't be aggregated.
-        return False
+    def config(self):
+        return {"normalized": self.normalized, "case_sensitive": self.case_sensitive}
 
     def compute(self, cache, predictions: Predictions, references: References) -> Dict:
         ref_streams = list(zip_longest(*references.untokenized))
-        ter = self.metric.corpus_score(predictions.untokenized, ref_streams)
+        stats = self.metric._extract_corpus_statistics(
+            predictions.untokenized, ref_streams
+        )
+        return dict(zip(predictions.ids, stats))
+
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Compute the corpus-level score from per-example statistics."""
+        if not score_list:
+            return {}
+        ter = self.metric._compute_score_from_stats(sum_of_lists(score_list))
         return {"ter": round(ter.score, 5)}
@@ -1,23 +1,212 @@
 #!/usr/bin/env python3
-from .tokenize import default_tokenize_func
+from .columnar import is_columnar, load_columnar, tokenizer_key
+from .jsonstream import load_json, slim_instance
+from .tokenize import default_tokenize_func, tokenization_store
+from .vocab import PUNCTUATION, TokenArray, vocabulary
 from gem_metrics.config import get_language_for_dataset, get_task_type_for_dataset
 
+from copy import copy
 import functools
 from typing import List, Optional, Union, Dict
-import json
-import string
+import sys
+import threading
+import weakref
 from pycountry import languages
 from logzero import logger
 
 
+def _estimate_size(texts, value) -> int:
+    """Rough size of a view in bytes -- a (nested) list of strings or a `TokenArray`."""
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(_estimate_size(texts, item) for item in value)
+    if isinstance(value, TokenArray):
+        return value.nbytes
+    return sys.getsizeof(value)
+
+
+def _token_lists_size(texts, value) -> int:
+    """Rough size of (lists of) lists of tokens, without the token strings themselves --
+    they are shared with the `vocabulary` (or the `tokenization_store`)."""
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(
+            _token_lists_size(texts, item) for item in value if isinstance(item, list)
+        )
+    return 0
+
+
+def _tokenized_size(texts, value) -> int:
+    """Rough size of the `_tokenized` view. Token lists from the `tokenization_store`
+    are counted by the store, only the lists holding them belong to the view."""
+    if texts.pretokenized is not None:
+        return _token_lists_size(texts, value)
+    if texts.multi_ref:
+        return sys.getsizeof(value) + sum(sys.getsizeof(inst) for inst in value)
+    return sys.getsizeof(value)
+
+
+class ViewBudget:
+    """Process-wide accounting of the lazily computed views (tokenizations etc.) cached by
+    `Texts` objects. If a `max_bytes` limit is set, it covers the views and the
+    `tokenization_store` together: the least recently used views are dropped (and
+    recomputed on next access) to stay within it, then the least recently used stored
+    tokenizations (views hold on to the token lists they use, so the store is only
+    shrunk once the views are gone). The limit is checked whenever a view is added.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self._entries = {}  # (id(texts), view name) -> size, in LRU order
+        self._refs = {}  # id(texts) -> weakref(texts)
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    @property
+    def bytes(self) -> int:
+        """Estimated total size of all cached views (without the tokenization store)."""
+        return self._bytes
+
+    @property
+    def total_bytes(self) -> int:
+        """Estimated total size of all cached views and the tokenization store."""
+        return self._bytes + tokenization_store.bytes
+
+    def set_limit(self, max_bytes: Optional[int]):
+        """Set the memory limit (`None` = unlimited), evict views if needed."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def add(self, texts, name: str, size: int):
+        """Account for a new view of the given `Texts` object."""
+        key = (id(texts), name)
+        with self._lock:
+            if id(texts) not in self._refs:
+                self._refs[id(texts)] = weakref.ref(texts, self._collected(id(texts)))
+            self._bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict(keep=key)
+
+    def touch(self, texts, name: str):
+        """Mark a view as recently used."""
+        key = (id(texts), name)
+        with self._lock:
+            if key in self._entries:
+                self._entries[key] = self._entries.pop(key)
+
+    def size(self, texts, name: str) -> int:
+        return self._entries.get((id(texts), name), 0)
+
+    def forget(self, texts, name: Optional[str] = None):
+        """Stop accounting for a view (or all views) of the given `Texts` object."""
+        with self._lock:
+            self._forget(id(texts), name)
+
+    def release_all(self):
+        """Drop all cached views of all `Texts` objects."""
+        with self._lock:
+            for texts_id, ref in list(self._refs.items()):
+                texts = ref()
+                if texts is not None:
+                    texts._views.clear()
+                self._forget(texts_id)
+
+    def _forget(self, texts_id: int, name: Optional[str] = None):
+        keys = [
+            key
+            for key in self._entries
+            if key[0] == texts_id and (name is None or key[1] == name)
+        ]
+        for key in keys:
+            self._bytes -= self._entries.pop(key)
+        if name is None:
+            self._refs.pop(texts_id, None)
+
+    def _collected(self, texts_id: int):
+        def callback(_):
+            with self._lock:
+                self._forget(texts_id)
+
+        return callback
+
+    def _evict(self, keep=None):
+        if self.max_bytes is None:
+            return
+        for key in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            texts = self._refs[key[0]]()
+            if texts is not None:
+                texts._views.pop(key[1], None)
+            self._bytes -= self._entries.pop(key)
+        if self.total_bytes > self.max_bytes:
+            tokenization_store.shrink(max(self.max_bytes - self._bytes, 0))
+
+
+# Shared by all `Texts` objects.
+view_budget = ViewBudget()
+
+
+def cached_view(func=None, size=_estimate_size):
+    """Decorator for `Texts` properties that are computed once per object (until released
+    or evicted by the `view_budget`). `size(texts, value)` estimates the memory taken by
+    the view, without anything shared with other objects."""
+    if func is None:
+        return functools.partial(cached_view, size=size)
+    name = func.__name__
+
+    @functools.wraps(func)
+    def view(self):
+        if name in self._views:
+            view_budget.touch(self, name)
+            return self._views[name]
+        value = func(self)
+        self._views[name] = value
+        view_budget.add(self, name, size(self, value))
+        return value
+
+    return property(view)
+
+
+def release_caches():
+    """Drop all cached views of all `Texts` objects, all stored tokenizations and the
+    shared token vocabulary."""
+    view_budget.release_all()
+    tokenization_store.clear()
+    vocabulary.clear()
+
+
 class Texts:
     """Holder class for output texts or references (base class for
     Predictions, References, Sources)."""
 
-    PUNCTUATION = set(string.punctuation)
+    PUNCTUATION = PUNCTUATION
+
+    # Key (or priority list of keys) under which each subclass finds its data.
+    DATA_KEY = None
+    # Other instance fields that are used.
+    ID_FIELDS = ["gem_id", "gem_parent_id"]
+
+    # Default for new objects: drop the original instances (`all_data`) once the data and
+    # IDs are extracted. Off for library use, switched on by the command-line tool.
+    slim = False
+
+    @classmethod
+    def fields(cls, data_key: Union[str, List, None] = None) -> Optional[List[str]]:
+        """Return all instance fields used for the given data key (default: the class's
+        `DATA_KEY`). Other fields are dropped when data is loaded from a file."""
+        data_key = data_key if data_key is not None else cls.DATA_KEY
+        if data_key is None:
+            return None
+        return (data_key if isinstance(data_key, list) else [data_key]) + cls.ID_FIELDS
 
     def __init__(
-        self, data_key: Union[str, List], data: Union[str, List, Dict], language="en"
+        self,
+        data_key: Union[str, List],
+        data: Union[str, List, Dict],
+        language="en",
+        slim: Optional[bool] = None,
     ):
         """
         Constructor, to be used by subclasses (`Sources`, `References`, `Predictions`).
@@ -30,22 +219,30 @@ class Texts:
                 of alternatives.
 
         `data`: Can be a file path (`str`), a `list` of instances, or a `dict` where the `values`
-                key is used to locate the instances.
+                key is used to locate the instances. The file may also be in the columnar format
+                (see `columnar`), which is memory-mapped instead of loaded.
 
         `language`: The language of the data (used for tokenization). Use ISO-639 2-letter codes.
                 Defaults to English.
+
+        `slim`: If true, `all_data` is set to `None` after construction, so the original
+                instances (with all their other fields) can be freed. Defaults to `Texts.slim`.
         """
         self.data_key = data_key
+        # pre-tokenized data (only in columnar files)
+        self.pretokenized = None
+        if is_columnar(data):
+            self._init_columnar(data, language)
+            return
         # allow bare lists
         if isinstance(data, list):
             self.filename = None
             self.all_data = data
-        # strings mean filename paths
+        # strings mean filename paths -- loaded incrementally, keeping the used fields only
         elif not isinstance(data, dict):
             self.filename = data
-            with open(data, "r", encoding="UTF-8") as fh:
-                data = json.load(fh)
-                self.all_data = data
+            data = load_json(data, self.fields(data_key))
+            self.all_data = data
             if isinstance(data, dict) and "values" in data:
                 self.all_data = data["values"]
         # default: dict with the default structure
@@ -84,28 +281,96 @@ class Texts:
             if "gem_parent_id" in self.all_data[0].keys():
                 self.parent_ids = [item["gem_parent_id"] for item in self.all_data]
 
+        # the original instances are no longer needed
+        if slim is None:
+            slim = self.slim
+        if slim:
+            self.all_data = None
+
+        self._init_tokenization()
+
+    def _init_columnar(self, path: str, language: str):
+        """Memory-map data, IDs and parent IDs from a columnar file (see `columnar`)."""
+        self.filename = path
+        logger.info(f"Loading {self.__class__.__name__.lower()} for {path} (columnar)")
+        columns = load_columnar(path)
+        if columns["class"] != self.__class__.__name__:
+            raise Exception(
+                f"{path} contains {columns['class']}, not {self.__class__.__name__}"
+            )
+        self.all_data = None
+        self.data_key = columns["data_key"]
+        self.data = columns["data"]
+        self.ids = columns["ids"]
+        self.parent_ids = columns["parent_ids"]
+        self.language = languages.get(alpha_2=language)
+        self._init_tokenization()
+        # stored tokens are only valid for the same tokenizer
+        tokens = columns["tokens"]
+        if tokens is not None and tokens.tokenizer == tokenizer_key(self.tokenize_func):
+            self.pretokenized = tokens
+
+    def _init_tokenization(self):
         # detect if we're using multiple texts per instance
         self.multi_ref = isinstance(self.data[0], list)
         # tokenize & keep a list and a whitespace version
         self.tokenize_func = default_tokenize_func(self.language)
+        # lazily computed tokenized versions (see `cached_view`)
+        self._views = {}
+
+    def release(self, tokens: bool = False):
+        """Drop all cached tokenized versions of the data (they are recomputed on demand).
+        With `tokens`, the tokenizations of the texts are also dropped from the
+        `tokenization_store` (for texts that are done, whose strings are not expected to
+        come up again)."""
+        self._views.clear()
+        view_budget.forget(self)
+        if tokens and self.pretokenized is None:
+            if self.multi_ref:
+                strings = (text for inst in self.data for text in inst)
+            else:
+                strings = self.data
+            tokenization_store.discard_many(self.tokenize_func, strings)
+
+    def __copy__(self):
+        # Copies share the cached views until their data changes.
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new._views = {}
+        for name, value in self._views.items():
+            new._views[name] = value
+            view_budget.add(new, name, view_budget.size(self, name))
+        return new
+
+    def __getstate__(self):
+        # Cached views are not pickled, they are recomputed on demand.
+        state = dict(self.__dict__)
+        state["_views"] = {}
+        return state
 
     @property
-    @functools.lru_cache()
     def untokenized(self):
         """Return list of (lists of) untokenized strings."""
         return self.data
 
-    @property
-    @functools.lru_cache()
+    @cached_view(size=_tokenized_size)
     def _tokenized(self):
-        """Return list of (lists of) tokenized strings."""
+        """Return list of (lists of) tokenized strings (shared via `tokenization_store`)."""
+        if self.pretokenized is not None:
+            return self.token_array.to_lists()
         if self.multi_ref:
-            return [[self.tokenize_func(i) for i in inst] for inst in self.data]
+            flat = tokenization_store.tokenize_many(
+                self.tokenize_func, (i for inst in self.data for i in inst)
+            )
+            tokenized, start = [], 0
+            for inst in self.data:
+                tokenized.append(flat[start : start + len(inst)])
+                start += len(inst)
+            return tokenized
         else:
-            return [self.tokenize_func(ref) for ref in self.data]
+            return tokenization_store.tokenize_many(self.tokenize_func, self.data)
 
-    @property
-    @functools.lru_cache()
+    @cached_view
     def whitespace_tokenized(self):
         """Return list of (lists of) tokenized strings (tokens separated by space)."""
         if self.multi_ref:
@@ -114,36 +379,37 @@ class Texts:
             return [" ".join(ref) for ref in self._tokenized]
 
     @property
-    @functools.lru_cache()
     def list_tokenized(self):
         """Return list of (lists of) lists of tokens."""
         return self._tokenized
 
-    @property
-    @functools.lru_cache()
+    @cached_view
+    def token_array(self):
+        """Return the tokenized data as a `TokenArray` (token IDs interned in the shared
+        `vocabulary`)."""
+        if self.pretokenized is not None:
+            return self.pretokenized.token_array(vocabulary)
+        return TokenArray.from_lists(vocabulary, self._tokenized, self.multi_ref)
+
+    @cached_view
+    def token_array_lower(self):
+        """Return the tokenized data as a `TokenArray`, lowercased."""
+        return self.token_array.lower()
+
+    @cached_view
+    def token_array_lower_nopunct(self):
+        """Return the tokenized data as a `TokenArray`, lowercased, excluding punctuation."""
+        return self.token_array_lower.without_punct()
+
+    @cached_view(size=_token_lists_size)
     def list_tokenized_lower(self):
         """Return list of (lists of) lists of tokens, lowercased."""
-        if self.multi_ref:
-            return [
-                [[w.lower() for w in ref] for ref in inst] for inst in self._tokenized
-            ]
-        else:
-            return [[w.lower() for w in ref] for ref in self._tokenized]
+        return self.token_array_lower.to_lists()
 
-    @property
-    @functools.lru_cache()
+    @cached_view(size=_token_lists_size)
     def list_tokenized_lower_nopunct(self):
         """Return list of (lists of) lists of tokens, lowercased, excluding punctuation."""
-        if self.multi_ref:
-            return [
-                [[w for w in ref if w not in self.PUNCTUATION] for ref in inst]
-                for inst in self.list_tokenized_lower
-            ]
-        else:
-            return [
-                [w for w in ref if w not in self.PUNCTUATION]
-                for ref in self.list_tokenized_lower
-            ]
+        return self.token_array_lower_nopunct.to_lists()
 
     def assign_ids_and_unscramble(self, id_list: List):
         """Overwrite self.ids with id_list, unscramble and filter data.
@@ -169,6 +435,9 @@ class Texts:
                 # Then overwrite data with ordered version.
                 self.data = [output_lookup[ordered_id] for ordered_id in id_list]
                 self.ids = id_list
+                # Tokenized versions of the old data are no longer valid.
+                self.pretokenized = None
+                self.release()
         else:
             # In this case we simply assume that the predictions were in order.
             # There is no other way to test for this.
@@ -185,19 +454,25 @@ class Texts:
 class Predictions(Texts):
     """Data holder class for system outputs/predictions."""
 
-    def __init__(self, data, language="en", task="agnostic"):
+    DATA_KEY = "generated"
+
+    def __init__(self, data, language="en", task="agnostic", slim=None):
         # Task is used in QuestEval metric to select the correct model.
         self.task = task
-        super().__init__(data_key="generated", data=data, language=language)
+        super().__init__(
+            data_key=self.DATA_KEY, data=data, language=language, slim=slim
+        )
 
 
 class References(Texts):
     """Data holder class for references/targets. Assumes a list of references per
     instance, will create 1-element lists if needed."""
 
-    def __init__(self, data, language="en"):
+    DATA_KEY = ["references", "target"]
+
+    def __init__(self, data, language="en", slim=None):
         super().__init__(
-            data_key=["references", "target"], data=data, language=language
+            data_key=self.DATA_KEY, data=data, language=language, slim=slim
         )
         if not self.multi_ref:
             # convert to fake multi-ref (1-element lists per instance) so that metrics
@@ -213,43 +488,186 @@ class References(Texts):
 class Sources(Texts):
     """Data holder class for sources."""
 
-    def __init__(self, data, language="en"):
-        super().__init__(data_key="source", data=data, language=language)
+    DATA_KEY = "source"
+
+    def __init__(self, data, language="en", slim=None):
+        super().__init__(
+            data_key=self.DATA_KEY, data=data, language=language, slim=slim
+        )
 
 
 class Submission:
-    """Data class for a GEM submission, consiting of (potentially) multiple datasets."""
+    """Data class for a GEM submission, consiting of (potentially) multiple datasets.
+
+    Predictions for each dataset are only created when first requested via
+    `predictions_for`, and can be dropped with `release` once the dataset is scored, so
+    that only the datasets currently being worked on are held as `Predictions`. The raw
+    data is kept per dataset, with only the fields that `Predictions` use.
+
+    Preparation steps are recorded and applied when the predictions are created:
+    reordering to match the references (`order`) and datasets derived from subsets of
+    other datasets (`derive`).
+    """
+
+    # Fields of instances kept in the raw data (others, such as `target` or `concepts`,
+    # are dropped when the submission is loaded).
+    INSTANCE_FIELDS = Predictions.fields()
 
     def __init__(self, data):
         """Create a new Submission.
         @param data: either a `dict` with the submission structure, or a `str` with a JSON filename path.
         """
-        if isinstance(data, dict):
-            self.all_data = data
-        else:
+        if not isinstance(data, dict):
             self.filename = data
-            with open(data, "r", encoding="UTF-8") as fh:
-                self.all_data = json.load(fh)
+            data = load_json(data, self.INSTANCE_FIELDS)
         self.name = data["submission_name"]
         self.param_count = data.get("param_count")
         if not self.param_count:
             logger.warn("Model parameter count not present in the submission file.")
+        self._raw = {}
+        self._orders = {}  # dataset name -> ID list
+        self._derived = {}  # dataset name -> (parent dataset name, ID list)
+        self._released = set()
         self.entries = {}
-        for dataset_name, data in self.all_data["tasks"].items():
-            data["filename"] = self.name + "/" + dataset_name
-            # Create Predictions with correct language - default to en.
+        for dataset_name, dataset_data in data["tasks"].items():
             # Also change dashes to underscores since that is a common error.
-            self.entries[dataset_name.replace("-", "_")] = Predictions(
-                data,
-                language=get_language_for_dataset(dataset_name),
-                task=get_task_type_for_dataset(dataset_name),
+            self._raw[dataset_name.replace("-", "_")] = (
+                dataset_name,
+                self._slim(dataset_data),
+            )
+
+    @classmethod
+    def _slim(cls, data: Union[Dict, List]) -> List:
+        """Return the list of instances of a dataset, keeping only `INSTANCE_FIELDS`."""
+        values = data["values"] if isinstance(data, dict) else data
+        return [slim_instance(item, cls.INSTANCE_FIELDS) for item in values]
+
+    def order(self, dataset_name: str, id_list: List):
+        """Unscramble (and filter) the predictions for the given dataset to the given IDs
+        (see `Texts.assign_ids_and_unscramble`) -- right away if they exist, otherwise
+        when they are created."""
+        if dataset_name in self.entries:
+            self.entries[dataset_name].assign_ids_and_unscramble(id_list)
+        else:
+            self._orders[dataset_name] = id_list
+
+    def derive(self, dataset_name: str, parent_name: str, id_list: List):
+        """Add a dataset with the predictions of another dataset for the given IDs (e.g. a
+        challenge set's parent subset), created when first requested."""
+        self._derived[dataset_name] = (parent_name, id_list)
+
+    def create_predictions(self, dataset_name: str) -> Optional[Predictions]:
+        """Create new predictions for the given dataset (with all preparation steps
+        applied), without keeping them. Works for released datasets as long as their raw
+        data is still needed by other datasets."""
+        if dataset_name in self.entries:
+            return copy(self.entries[dataset_name])
+        if dataset_name in self._derived:
+            parent_name, id_list = self._derived[dataset_name]
+            parent = self.entries.get(parent_name) or self.create_predictions(
+                parent_name
             )
+            if parent is None:
+                return None
+            predictions = copy(parent)
+            predictions.assign_ids_and_unscramble(id_list)
+            return predictions
+        if dataset_name not in self._raw:
+            return None
+        original_name, values = self._raw[dataset_name]
+        # Create Predictions with correct language - default to en.
+        predictions = Predictions(
+            {"filename": self.name + "/" + original_name, "values": values},
+            language=get_language_for_dataset(original_name),
+            task=get_task_type_for_dataset(original_name),
+        )
+        if dataset_name in self._orders:
+            predictions.assign_ids_and_unscramble(self._orders[dataset_name])
+        # make caching work if the predictions have no IDs of their own
+        if predictions.ids is None:
+            predictions.assign_ids_and_unscramble(None)
+        return predictions
 
     def predictions_for(self, dataset_name: str) -> Optional[Predictions]:
-        """Return per-dataset predictions"""
+        """Return per-dataset predictions (created on first access)."""
+        if dataset_name not in self.entries and dataset_name not in self._released:
+            predictions = self.create_predictions(dataset_name)
+            if predictions is not None:
+                self.entries[dataset_name] = predictions
+                self._drop_raw()
         return self.entries.get(dataset_name)
 
+    def corpus_size(self, dataset_name: str) -> int:
+        """Number of characters in the predictions for the given dataset, without creating
+        them (estimated for derived datasets)."""
+        if dataset_name in self.entries:
+            return sum(len(text) for text in self.entries[dataset_name].untokenized)
+        if dataset_name in self._derived:
+            parent_name, id_list = self._derived[dataset_name]
+            parent_len = self._num_instances(parent_name)
+            if not parent_len:
+                return 0
+            return self.corpus_size(parent_name) * len(id_list) // parent_len
+        if dataset_name not in self._raw:
+            return 0
+        size = 0
+        for item in self._raw[dataset_name][1]:
+            if isinstance(item, dict):
+                item = item.get(Predictions.DATA_KEY)
+            if isinstance(item, str):
+                size += len(item)
+        return size
+
+    def _num_instances(self, dataset_name: str) -> int:
+        if dataset_name in self.entries:
+            return len(self.entries[dataset_name])
+        if dataset_name in self._derived:
+            return len(self._derived[dataset_name][1])
+        if dataset_name in self._raw:
+            return len(self._raw[dataset_name][1])
+        return 0
+
+    def _needed(self, dataset_name: str) -> bool:
+        """Return true if a derived dataset will still be created from the given one
+        (directly, or through other derived datasets)."""
+        return any(
+            parent_name == dataset_name
+            and (
+                (name not in self.entries and name not in self._released)
+                or self._needed(name)
+            )
+            for name, (parent_name, _) in self._derived.items()
+        )
+
+    def _drop_raw(self):
+        """Drop raw data that is no longer needed -- of released datasets and of slim
+        predictions (which don't refer to the raw instances), unless other datasets are
+        still to be derived from them."""
+        for dataset_name in list(self._raw):
+            if self._needed(dataset_name):
+                continue
+            predictions = self.entries.get(dataset_name)
+            if dataset_name in self._released or (
+                predictions is not None and predictions.all_data is None
+            ):
+                del self._raw[dataset_name]
+
+    def release(self, dataset_name: str):
+        """Drop the predictions (and raw data) for the given dataset, e.g. once it is
+        scored. The dataset is no longer listed among `datasets` afterwards."""
+        self._released.add(dataset_name)
+        predictions = self.entries.pop(dataset_name, None)
+        if predictions is not None:
+            predictions.release(tokens=True)
+        self._drop_raw()
+
     @property
     def datasets(self):
         """List of datasets for which there are predictions available."""
-        return list(self.entries.keys())
+        return [
+            dataset_name
+            for dataset_name in dict.fromkeys(
+                list(self._raw) + list(self._derived) + list(self.entries)
+            )
+            if dataset_name not in self._released
+        ]
@@ -1,85 +1,402 @@
 #!/usr/bin/env python3
+from .cache import content_digest, get_many, set_many
 from .data import nltk_ensure_download
 
-from typing import List
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
 import re
 from functools import partial
+import hashlib
+import multiprocessing
+import pickle
+import sys
+import threading
 import nltk
+from logzero import logger
+from pycountry import languages
 
 
-def default_tokenize_func(lang: str):
-    """Return the default tokenizer function for a given language (Punkt, backoff to dumb_tokenize).
+class TokenizerRegistry:
+    """Process-wide registry of the default tokenizer functions per language.
+
+    Each language's tokenizer is resolved once (Punkt if NLTK has a model for the
+    language, backoff to `dumb_tokenize`) and its Punkt model is loaded at that point --
+    NLTK keeps loaded models, so all `Texts` objects share them. Use `warm_up` to load
+    the tokenizers of the expected languages in advance (e.g. in a server, or before
+    forking worker processes).
+    """
+
+    def __init__(self):
+        self._funcs = {}
+        self._punkt_checked = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(lang) -> Optional[str]:
+        return getattr(lang, "name", None)
+
+    def _load(self, lang) -> Callable:
+        """Resolve and load the tokenizer for the given language."""
+        if not self._punkt_checked:
+            nltk_ensure_download("tokenizers/punkt")
+            self._punkt_checked = True
+        func = dumb_tokenize
+        if lang is not None:
+            try:
+                func = partial(nltk.tokenize.word_tokenize, language=lang.name.lower())
+                # loads the model, raises an exception if Punkt doesn't have the language
+                func(".")
+            except LookupError:
+                func = dumb_tokenize  # punkt
+        return func
+
+    def get(self, lang) -> Callable:
+        """Return the tokenizer function for the given language (a pycountry Language
+        object, or `None` for the language-agnostic `dumb_tokenize`)."""
+        key = self._key(lang)
+        with self._lock:
+            func = self._funcs.get(key)
+            if func is None:
+                func = self._funcs[key] = self._load(lang)
+        return func
+
+    def warm_up(self, language_codes: Iterable[str]) -> Dict[str, Callable]:
+        """Load the tokenizers for the given ISO-639 2-letter language codes, return them
+        keyed by the codes."""
+        return {code: self.get(languages.get(alpha_2=code)) for code in language_codes}
+
+    def clear(self):
+        """Forget all loaded tokenizers."""
+        with self._lock:
+            self._funcs.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._funcs)
+
+
+# Shared by all `Texts` objects.
+tokenizer_registry = TokenizerRegistry()
+
+
+def default_tokenize_func(lang):
+    """Return the default tokenizer function for a given language (Punkt, backoff to dumb_tokenize),
+    loaded only once per process (see `TokenizerRegistry`).
     @param lang: pycountry.db.Language object representing the language (result of pycountry.languages.get)
     @return tokenizer function, taking one parameter (text) and returning list of tokens.
     """
-    nltk_ensure_download("tokenizers/punkt")
-    func = dumb_tokenize
-    if lang is not None:
-        try:
-            func = partial(nltk.tokenize.word_tokenize, language=lang.name.lower())
-            func(
-                "."
-            )  # this will trigger an exception if Punkt doesn't have the language
-        except LookupError:
-            func = dumb_tokenize  # punkt
-    return func
+    return tokenizer_registry.get(lang)
 
 
-def dumb_tokenize(text: str) -> List[str]:
-    """Tokenize text (separate tokens by spaces), language-agnostic failsafe version.
-    @param text: String to be tokenized
-    @return list of tokens
+def tokenizer_id(func: Callable) -> Hashable:
+    """Return a hashable identity of a tokenizer function -- its name and, for partials,
+    the fixed arguments (e.g. the Punkt language)."""
+    if isinstance(func, partial):
+        return (
+            tokenizer_id(func.func),
+            func.args,
+            tuple(sorted(func.keywords.items())),
+        )
+    return (
+        getattr(func, "__module__", None),
+        getattr(func, "__qualname__", repr(func)),
+    )
+
+
+def tokenizer_version(func: Callable) -> Optional[str]:
+    """Return the version of a tokenizer function -- its `version` attribute if set,
+    otherwise the version of the package it comes from (e.g. NLTK)."""
+    if isinstance(func, partial):
+        return tokenizer_version(func.func)
+    version = getattr(func, "version", None)
+    if version is None:
+        package = (getattr(func, "__module__", None) or "").split(".")[0]
+        version = getattr(sys.modules.get(package), "__version__", None)
+    return version
+
+
+# Separates tokens in the persistent tokenization cache (and in other compactly stored
+# token lists, see `encode_tokens`). It counts as whitespace, so tokenizers (all of which
+# split on whitespace) never produce tokens containing it.
+TOKEN_SEPARATOR = "\x1f"
+
+
+def encode_tokens(tokens: List[str]) -> str:
+    """Encode a list of tokens as a single string (see `decode_tokens`)."""
+    return "".join(TOKEN_SEPARATOR + token for token in tokens)
+
+
+def decode_tokens(value: str) -> List[str]:
+    return value.split(TOKEN_SEPARATOR)[1:]
+
+
+def _tokenize_chunk(func: Callable, texts: List[str]) -> List[List[str]]:
+    # tokenizers may provide a batch entry point (see `dumb_tokenize_many`)
+    tokenize_many = getattr(func, "tokenize_many", None)
+    if tokenize_many is not None:
+        return tokenize_many(texts)
+    return [func(text) for text in texts]
+
+
+def tokenize_batch(
+    func: Callable,
+    texts: List[str],
+    num_workers: Optional[int] = None,
+    min_parallel: int = 10000,
+    chunks_per_worker: int = 4,
+) -> List[List[str]]:
+    """Tokenize all given strings with `func`, in order, splitting the work across a pool of
+    `num_workers` processes (default: all CPUs). The output is the same as of the serial
+    `[func(text) for text in texts]`, which is used for fewer than `min_parallel` texts,
+    a single worker, tokenizers that can't be pickled, or inside daemonic processes (such as
+    `process_submission` workers) which can't start a pool of their own.
     """
+    num_workers = num_workers or multiprocessing.cpu_count()
+    if (
+        len(texts) < max(min_parallel, 2)
+        or num_workers < 2
+        or multiprocessing.current_process().daemon
+    ):
+        return _tokenize_chunk(func, texts)
+    try:
+        pickle.dumps(func)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        logger.warning(f"Cannot tokenize in parallel, {func} can't be pickled.")
+        return _tokenize_chunk(func, texts)
+
+    num_workers = min(num_workers, len(texts))
+    chunk_size = -(-len(texts) // (num_workers * chunks_per_worker))
+    chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    with multiprocessing.get_context().Pool(processes=num_workers) as pool:
+        tokenized = pool.map(partial(_tokenize_chunk, func), chunks, chunksize=1)
+    return [tokens for chunk in tokenized for tokens in chunk]
 
-    toks = text
-    # separate quotes everywhere
-    toks = re.sub(r'(["<>{}“”«»–|—„‚‘]|\[|\]|``|\'\'|‘‘|\^)', r" \1 ", toks)
 
-    # the following characters (double-characters) are separated everywhere (except inside URLs)
-    toks = re.sub(r"([;!()?#\$£%&*…]|--)", r" \1 ", toks)
+class TokenizationStore:
+    """Process-wide store of tokenizer outputs, keyed by (tokenizer, text), so that each
+    distinct string is tokenized at most once per process, no matter how many `Texts`
+    objects (or copies of them) contain it.
 
-    # short hyphen is separated if it is followed or preceeded by non-alphanuneric character and
-    # is not a part of --, or a unary minus
-    toks = re.sub(r"([^\-\w])\-([^\-0-9])", r"\1 - \2", toks)
-    toks = re.sub(
-        r"([0-9]\s+)\-([0-9])", r"\1 - \2", toks
-    )  # preceded by a number - not a unary minus
-    toks = re.sub(r"([^\-])\-([^\-\w])", r"\1 - \2", toks)
+    The returned token lists are shared and must not be modified.
 
-    # plus is separated everywhere, except at the end of a word (separated by a space) and as unary plus
-    toks = re.sub(r"(\w)\+(\w)", r"\1 + \2", toks)
-    toks = re.sub(r"([0-9]\s*)\+([0-9])", r"\1 + \2", toks)
-    toks = re.sub(r"\+([^\w\+])", r"+ \1", toks)
+    The store keeps track of the (estimated) size of the stored tokenizations; `shrink`
+    drops the least recently used ones. `texts.view_budget` counts the store against its
+    memory limit together with the views of `Texts` objects.
 
+    Strings that are not stored yet are tokenized with `tokenize_batch`, in parallel if
+    `num_workers` is set to more than 1 and there are at least `min_parallel` of them.
+
+    If a `persistent` cache is given (a `diskcache.Cache`, see `cache.open_cache`, or a
+    dict), it is consulted before tokenizing, so that tokenization is also shared across
+    runs. Keys are built from the text, the tokenizer identity (including the language,
+    see `tokenizer_id`) and its version (see `tokenizer_version`); the tokens are stored
+    as a single string (joined with `TOKEN_SEPARATOR`).
+    """
+
+    def __init__(
+        self, num_workers: int = 1, min_parallel: int = 10000, persistent=None
+    ):
+        self._store = {}  # (tokenizer number, text) -> tokens, in LRU order
+        self._tokenizers = {}  # tokenizer ID -> number
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self.num_workers = num_workers
+        self.min_parallel = min_parallel
+        self.persistent = persistent
+
+    def _persistent_keys(self, func: Callable, texts: List[str]) -> List:
+        prefix = content_digest(tokenizer_id(func), tokenizer_version(func)) + "\n"
+        return [
+            ("tokenize", hashlib.sha256((prefix + text).encode("UTF-8")).hexdigest())
+            for text in texts
+        ]
+
+    def _tokenize_missing(self, func: Callable, texts: List[str]) -> Dict:
+        """Tokenize the given strings, using the persistent cache if there is one."""
+        tokenized, missing = {}, texts
+        if self.persistent is not None:
+            keys = dict(zip(texts, self._persistent_keys(func, texts)))
+            found = get_many(self.persistent, keys.values())
+            tokenized = {
+                text: decode_tokens(found[key])
+                for text, key in keys.items()
+                if key in found
+            }
+            missing = [text for text in texts if text not in tokenized]
+            with self._lock:
+                self.persistent_hits += len(tokenized)
+
+        computed = dict(
+            zip(
+                missing,
+                tokenize_batch(func, missing, self.num_workers, self.min_parallel),
+            )
+        )
+        if self.persistent is not None and computed:
+            set_many(
+                self.persistent,
+                {
+                    keys[text]: encode_tokens(tokens)
+                    for text, tokens in computed.items()
+                    if not any(TOKEN_SEPARATOR in token for token in tokens)
+                },
+            )
+        tokenized.update(computed)
+        return tokenized
+
+    def tokenize(self, func: Callable, text: str) -> List[str]:
+        """Tokenize a single string, or return its stored tokenization."""
+        return self.tokenize_many(func, [text])[0]
+
+    def tokenize_many(self, func: Callable, texts: Iterable[str]) -> List[List[str]]:
+        """Tokenize all given strings (in order), reusing stored tokenizations."""
+        texts = list(texts)
+        with self._lock:
+            number = self._tokenizers.setdefault(
+                tokenizer_id(func), len(self._tokenizers)
+            )
+            result = [self._lookup((number, text)) for text in texts]
+        missing = list(
+            dict.fromkeys(text for text, tokens in zip(texts, result) if tokens is None)
+        )
+        tokenized = self._tokenize_missing(func, missing) if missing else {}
+        with self._lock:
+            for text, tokens in tokenized.items():
+                self._add((number, text), tokens)
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [
+            tokens if tokens is not None else tokenized[text]
+            for text, tokens in zip(texts, result)
+        ]
+
+    def _lookup(self, key):
+        """Return stored tokens (marked as recently used), or None. Must hold the lock."""
+        tokens = self._store.pop(key, None)
+        if tokens is not None:
+            self._store[key] = tokens
+        return tokens
+
+    def _add(self, key, tokens: List[str]):
+        """Store tokens. Must hold the lock."""
+        size = sys.getsizeof(tokens) + sum(sys.getsizeof(token) for token in tokens)
+        self._bytes += size - self._sizes.get(key, 0)
+        self._store.pop(key, None)
+        self._store[key] = tokens
+        self._sizes[key] = size
+
+    @property
+    def bytes(self) -> int:
+        """Estimated total size of all stored tokenizations."""
+        return self._bytes
+
+    def shrink(self, max_bytes: int):
+        """Drop the least recently used tokenizations until the store takes at most
+        `max_bytes` (they are tokenized again when requested)."""
+        with self._lock:
+            for key in list(self._store):
+                if self._bytes <= max_bytes:
+                    break
+                del self._store[key]
+                self._bytes -= self._sizes.pop(key)
+
+    def discard_many(self, func: Callable, texts: Iterable[str]):
+        """Forget the stored tokenizations of the given strings (e.g. of a dataset that is
+        done), they are tokenized again if requested later."""
+        with self._lock:
+            number = self._tokenizers.get(tokenizer_id(func))
+            if number is None:
+                return
+            for text in texts:
+                if self._store.pop((number, text), None) is not None:
+                    self._bytes -= self._sizes.pop((number, text))
+
+    def clear(self):
+        """Forget all stored tokenizations."""
+        with self._lock:
+            self._store.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._store)
+
+
+# Shared by all `Texts` objects.
+tokenization_store = TokenizationStore()
+
+
+# Precompiled rules of `dumb_tokenize`, in the order of application. Each rule is only
+# applied if the text contains one of its trigger strings (a cheap substring test) -- it
+# can't match otherwise -- so most texts only go through a few regex passes.
+_DUMB_TOKENIZE_RULES = [
+    (
+        # separate quotes everywhere, and the following characters (double-characters)
+        # everywhere (except inside URLs)
+        None,
+        re.compile(r'(["<>{}“”«»–|—„‚‘]|\[|\]|``|\'\'|‘‘|\^|[;!()?#\$£%&*…]|--)'),
+        r" \1 ",
+    ),
+    # short hyphen is separated if it is followed or preceeded by non-alphanuneric character
+    # and is not a part of --, or a unary minus
+    (("-",), re.compile(r"([^\-\w])\-([^\-0-9])"), r"\1 - \2"),
+    # preceded by a number - not a unary minus
+    (("-",), re.compile(r"([0-9]\s+)\-([0-9])"), r"\1 - \2"),
+    (("-",), re.compile(r"([^\-])\-([^\-\w])"), r"\1 - \2"),
+    # plus is separated everywhere, except at the end of a word (separated by a space) and
+    # as unary plus
+    (("+",), re.compile(r"(\w)\+(\w)"), r"\1 + \2"),
+    (("+",), re.compile(r"([0-9]\s*)\+([0-9])"), r"\1 + \2"),
+    (("+",), re.compile(r"\+([^\w\+])"), r"+ \1"),
     # apostrophe is separated if it is followed or preceeded by non-alphanumeric character,
     # is not part of '', and is not followed by a digit (e.g. '60).
-    toks = re.sub(r"([^\'’\w])([\'’])([^\'’\d])", r"\1 \2 \3", toks)
-    toks = re.sub(r"([^\'’])([\'’])([^\'’\w])", r"\1 \2 \3", toks)
-
+    (("'", "’"), re.compile(r"([^\'’\w])([\'’])([^\'’\d])"), r"\1 \2 \3"),
+    (("'", "’"), re.compile(r"([^\'’])([\'’])([^\'’\w])"), r"\1 \2 \3"),
     # dot, comma, slash, and colon are separated if they do not connect two numbers
-    toks = re.sub(r"(\D|^)([\.,:\/])", r"\1 \2", toks)
-    toks = re.sub(r"([\.,:\/])(\D|$)", r"\1 \2", toks)
-
+    ((".", ",", ":", "/"), re.compile(r"(\D|^)([\.,:\/])"), r"\1 \2"),
+    ((".", ",", ":", "/"), re.compile(r"([\.,:\/])(\D|$)"), r"\1 \2"),
     # three dots belong together
-    toks = re.sub(r"\.\s*\.\s*\.", r"...", toks)
+    ((".",), re.compile(r"\.\s*\.\s*\."), r"..."),
+    # most common contractions: I'm, I've etc., do n't
+    (("'", "’", "´"), re.compile(r"([\'’´])(s|m|d|ll|re|ve)\s"), r" \1\2 "),
+    (("'", "’", "´"), re.compile(r"(n[\'’´]t\s)"), r" \1 "),
+    # other contractions, as implemented in Treex
+    (("annot",), re.compile(r" ([Cc])annot\s"), r" \1an not "),
+    (("'ye",), re.compile(r" ([Dd])\'ye\s"), r" \1\' ye "),
+    (("imme",), re.compile(r" ([Gg])imme\s"), r" \1im me "),
+    (("onna",), re.compile(r" ([Gg])onna\s"), r" \1on na "),
+    (("otta",), re.compile(r" ([Gg])otta\s"), r" \1ot ta "),
+    (("emme",), re.compile(r" ([Ll])emme\s"), r" \1em me "),
+    (("ore'n",), re.compile(r" ([Mm])ore\'n\s"), r" \1ore \'n "),
+    (("'",), re.compile(r" \'([Tt])is\s"), r" \'\1 is "),
+    (("'",), re.compile(r" \'([Tt])was\s"), r" \'\1 was "),
+    (("anna",), re.compile(r" ([Ww])anna\s"), r" \1an na "),
+]
 
-    # most common contractions
-    toks = re.sub(r"([\'’´])(s|m|d|ll|re|ve)\s", r" \1\2 ", toks)  # I'm, I've etc.
-    toks = re.sub(r"(n[\'’´]t\s)", r" \1 ", toks)  # do n't
 
-    # other contractions, as implemented in Treex
-    toks = re.sub(r" ([Cc])annot\s", r" \1an not ", toks)
-    toks = re.sub(r" ([Dd])\'ye\s", r" \1\' ye ", toks)
-    toks = re.sub(r" ([Gg])imme\s", r" \1im me ", toks)
-    toks = re.sub(r" ([Gg])onna\s", r" \1on na ", toks)
-    toks = re.sub(r" ([Gg])otta\s", r" \1ot ta ", toks)
-    toks = re.sub(r" ([Ll])emme\s", r" \1em me ", toks)
-    toks = re.sub(r" ([Mm])ore\'n\s", r" \1ore \'n ", toks)
-    toks = re.sub(r" \'([Tt])is\s", r" \'\1 is ", toks)
-    toks = re.sub(r" \'([Tt])was\s", r" \'\1 was ", toks)
-    toks = re.sub(r" ([Ww])anna\s", r" \1an na ", toks)
-
-    # clean extra space
-    toks = re.sub(r"\s+", " ", toks)
-    toks = toks.strip()
-    return toks.split(" ")
+def dumb_tokenize(text: str) -> List[str]:
+    """Tokenize text (separate tokens by spaces), language-agnostic failsafe version.
+    @param text: String to be tokenized
+    @return list of tokens
+    """
+    toks = text
+    for triggers, pattern, replacement in _DUMB_TOKENIZE_RULES:
+        if triggers is None or any(trigger in toks for trigger in triggers):
+            toks = pattern.sub(replacement, toks)
+
+    # clean extra space (same as replacing \s+ by a space, stripping and splitting)
+    return toks.split() or [""]
+
+
+def dumb_tokenize_many(texts: Iterable[str]) -> List[List[str]]:
+    """Tokenize all given strings with `dumb_tokenize` (batch entry point)."""
+    return [dumb_tokenize(text) for text in texts]
+
+
+dumb_tokenize.tokenize_many = dumb_tokenize_many
+# Bump when the output changes (invalidates the persistent tokenization cache).
+dumb_tokenize.version = "1"
@@ -4,7 +4,7 @@ from numpy import NaN
 from .metric import ReferencelessMetric
 from .texts import Predictions
 
-from typing import Dict
+from typing import Dict, List
 
 
 class TTR(ReferencelessMetric):
@@ -16,11 +16,10 @@ class TTR(ReferencelessMetric):
     to the total number of words (tokens).
     Higher TTR indicates a higher degree of lexical diversity.
     This is implemented below using a simple dictionary counter.
-    """
 
-    def support_caching(self):
-        # corpus-level, so individual examples can't be aggregated.
-        return False
+    TTR is corpus-level, so per-example token counts are computed (and cached) and merged
+    to compute the score.
+    """
 
     def get_vocabulary(self, sentence_array):
         """Compute vocabulary
@@ -41,7 +40,20 @@ class TTR(ReferencelessMetric):
         return total, data_vocabulary
 
     def compute(self, cache, predictions: Predictions) -> Dict:
-        total, vocabulary = self.get_vocabulary(predictions.untokenized)
+        results = {}
+        for pred_id, sentence in zip(predictions.ids, predictions.untokenized):
+            total, vocabulary = self.get_vocabulary([sentence])
+            results[pred_id] = {"total": total, "vocabulary": vocabulary}
+        return results
+
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Compute the corpus-level score from per-example token counts."""
+        if not score_list:
+            return {}
+        total, vocabulary = 0, set()
+        for stats in score_list:
+            total += stats["total"]
+            vocabulary.update(stats["vocabulary"])
         if total == 0:
             score = NaN
         else:
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Compact representation of tokenized texts: tokens are interned to integer IDs in a shared
+`Vocabulary` and each `Texts` object keeps flat int32 arrays of IDs with offsets
+(`TokenArray`) instead of nested lists of strings.
+"""
+
+import string
+import threading
+import numpy as np
+from typing import Iterator, List, Optional, Union
+
+PUNCTUATION = set(string.punctuation)
+
+
+class Vocabulary:
+    """Interning of token strings to int32 IDs. Each distinct token is stored once, along
+    with the ID of its lowercased version and a punctuation flag, so that lowercasing and
+    punctuation removal on a `TokenArray` are just an ID remapping and a mask.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Forget all tokens. Token IDs (and `TokenArray`s) created before are invalid."""
+        with self._lock:
+            self._index = {}
+            self._tokens = []
+            self._lower = []
+            self._punct = []
+            self._tables = None
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def _add(self, token: str) -> int:
+        """Return the ID of `token`, add it if needed (must be called with the lock held)."""
+        token_id = self._index.get(token)
+        if token_id is None:
+            lower = token.lower()
+            lower_id = self._add(lower) if lower != token else None
+            token_id = len(self._tokens)
+            self._index[token] = token_id
+            self._tokens.append(token)
+            self._lower.append(token_id if lower_id is None else lower_id)
+            self._punct.append(token in PUNCTUATION)
+        return token_id
+
+    def encode(self, sentences: List[List[str]]):
+        """Intern all tokens of the given sentences, return a flat array of their IDs and
+        sentence offsets (sentence `i` has the IDs `ids[offsets[i]:offsets[i + 1]]`)."""
+        ids = []
+        offsets = np.zeros(len(sentences) + 1, dtype=np.int64)
+        with self._lock:
+            index = self._index
+            for i, sentence in enumerate(sentences):
+                for token in sentence:
+                    token_id = index.get(token)
+                    ids.append(token_id if token_id is not None else self._add(token))
+                offsets[i + 1] = len(ids)
+        return np.array(ids, dtype=np.int32), offsets
+
+    def decode(self, ids: np.ndarray) -> List[str]:
+        """Return the token strings for the given IDs (shared, not copied)."""
+        tokens = self._tokens
+        return [tokens[token_id] for token_id in ids.tolist()]
+
+    def _get_tables(self):
+        with self._lock:
+            if self._tables is None or len(self._tables[0]) != len(self._tokens):
+                self._tables = (
+                    np.array(self._lower, dtype=np.int32),
+                    np.array(self._punct, dtype=bool),
+                )
+            return self._tables
+
+    @property
+    def lower_map(self) -> np.ndarray:
+        """Array mapping each token ID to the ID of the lowercased token."""
+        return self._get_tables()[0]
+
+    @property
+    def punct_mask(self) -> np.ndarray:
+        """Boolean array, true for IDs of punctuation tokens."""
+        return self._get_tables()[1]
+
+
+# Shared by all `Texts` objects.
+vocabulary = Vocabulary()
+
+
+class TokenArray:
+    """Tokenized texts as a flat int32 array of token IDs (see `Vocabulary`).
+
+    Sentence `i` consists of the IDs `ids[offsets[i]:offsets[i + 1]]`. For multiple texts
+    per instance (references), instance `j` consists of sentences `groups[j]` to
+    `groups[j + 1]`; otherwise (`groups` is `None`), each sentence is an instance.
+    """
+
+    __slots__ = ("vocab", "ids", "offsets", "groups")
+
+    def __init__(
+        self,
+        vocab: Vocabulary,
+        ids: np.ndarray,
+        offsets: np.ndarray,
+        groups: Optional[np.ndarray] = None,
+    ):
+        self.vocab = vocab
+        self.ids = ids
+        self.offsets = offsets
+        self.groups = groups
+
+    @classmethod
+    def from_lists(cls, vocab: Vocabulary, data: List, multi_ref: bool = False):
+        """Create from a list of lists of tokens (or a list of lists of lists of tokens
+        for `multi_ref` data)."""
+        groups = None
+        if multi_ref:
+            groups = np.cumsum([0] + [len(inst) for inst in data], dtype=np.int64)
+            data = [sentence for inst in data for sentence in inst]
+        ids, offsets = vocab.encode(data)
+        return cls(vocab, ids, offsets, groups)
+
+    def __len__(self):
+        """Number of instances."""
+        if self.groups is not None:
+            return len(self.groups) - 1
+        return len(self.offsets) - 1
+
+    @property
+    def num_sentences(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        groups = self.groups.nbytes if self.groups is not None else 0
+        return self.ids.nbytes + self.offsets.nbytes + groups
+
+    def sentence(self, i: int) -> np.ndarray:
+        """Return token IDs of the `i`-th sentence (a view, not a copy)."""
+        return self.ids[self.offsets[i] : self.offsets[i + 1]]
+
+    def instance(self, j: int) -> Union[np.ndarray, List[np.ndarray]]:
+        """Return token IDs of the `j`-th instance (a list of arrays for multi-ref data)."""
+        if self.groups is None:
+            return self.sentence(j)
+        return [self.sentence(i) for i in range(self.groups[j], self.groups[j + 1])]
+
+    def __iter__(self) -> Iterator:
+        return (self.instance(j) for j in range(len(self)))
+
+    def lower(self) -> "TokenArray":
+        """Return the lowercased version (IDs remapped, offsets shared)."""
+        return TokenArray(
+            self.vocab, self.vocab.lower_map[self.ids], self.offsets, self.groups
+        )
+
+    def select(self, keep: np.ndarray) -> "TokenArray":
+        """Return a version with only the tokens where the boolean mask `keep` is true."""
+        kept = np.concatenate(([0], np.cumsum(keep, dtype=np.int64)))
+        return TokenArray(self.vocab, self.ids[keep], kept[self.offsets], self.groups)
+
+    def without_punct(self) -> "TokenArray":
+        """Return a version without punctuation tokens."""
+        return self.select(~self.vocab.punct_mask[self.ids])
+
+    def to_lists(self) -> List:
+        """Return the tokens as (lists of) lists of strings, as in `Texts.list_tokenized`."""
+        tokens = self.vocab.decode(self.ids)
+        offsets = self.offsets.tolist()
+        sentences = [tokens[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+        if self.groups is None:
+            return sentences
+        groups = self.groups.tolist()
+        return [sentences[start:end] for start, end in zip(groups[:-1], groups[1:])]
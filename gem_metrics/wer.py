@@ -1,6 +1,7 @@
 import numpy as np
-from typing import Dict
+from typing import Dict, List, Optional
 
+from .edit_distance import edit_distance, word_error_rates, word_error_stats
 from .metric import ReferencedMetric
 from .texts import Predictions, References
 
@@ -11,47 +12,48 @@ class WER(ReferencedMetric):
     This implementation is based on scripts from Josef Hölzl et al. at:
         https://github.com/evanmiltenburg/NLG-diversity/blob/main/diversity.py
     Lower is better. The score range is [0,∞).
+
+    Per-example scores (the lowest WER against any reference, with the corresponding edit
+    count and reference length) are computed (and cached), the result is their mean.
     """
 
-    def support_caching(self):
-        return False
+    # Processes used to compute edit distances on large datasets (see `word_error_stats`).
+    num_workers = 1
+
+    def __init__(self, num_workers: Optional[int] = None):
+        if num_workers is not None:
+            self.num_workers = num_workers
 
     @staticmethod
     def get_wer(r, h):
         """
         This function is to calculate the edit distance of reference sentence and the hypothesis sentence.
-        Main algorithm used is dynamic programming.
+        The distance is computed bit-parallel (see `edit_distance`), without length limits.
         Attributes:
             r -> the list of words produced by splitting reference sentence.
             h -> the list of words produced by splitting hypothesis sentence.
         """
-        d = np.zeros((len(r) + 1) * (len(h) + 1), dtype=np.uint8).reshape(
-            (len(r) + 1, len(h) + 1)
-        )
-        for i in range(len(r) + 1):
-            d[i][0] = i
-        for j in range(len(h) + 1):
-            d[0][j] = j
-        for i in range(1, len(r) + 1):
-            for j in range(1, len(h) + 1):
-                if r[i - 1] == h[j - 1]:
-                    d[i][j] = d[i - 1][j - 1]
-                else:
-                    substitute = d[i - 1][j - 1] + 1
-                    insert = d[i][j - 1] + 1
-                    delete = d[i - 1][j] + 1
-                    d[i][j] = min(substitute, insert, delete)
-        result = float(d[len(r)][len(h)]) / len(r) * 100
-        return result
+        return float(edit_distance(r, h)) / len(r) * 100
 
     def compute_score(self, prediction, references):
-        scores = []
-        for ref in references:
-            scores.append(self.get_wer(ref, prediction))
-        return np.min(scores)
+        return min(word_error_rates([prediction], [references]))
 
     def compute(self, cache, predictions: Predictions, references: References) -> Dict:
-        refs = references.list_tokenized_lower_nopunct
-        preds = predictions.list_tokenized_lower_nopunct
-        scores = [self.compute_score(i, j) for i, j in zip(preds, refs)]
-        return {"wer": round(np.mean(scores), 5)}
+        # token IDs are compared instead of strings (see `Texts.token_array`)
+        refs = references.token_array_lower_nopunct
+        preds = predictions.token_array_lower_nopunct
+        stats = word_error_stats(
+            [pred.tolist() for pred in preds],
+            [[ref.tolist() for ref in inst_refs] for inst_refs in refs],
+            self.num_workers,
+        )
+        return {
+            pred_id: {"wer": wer, "edits": edits, "ref_len": ref_len}
+            for pred_id, (wer, edits, ref_len) in zip(predictions.ids, stats)
+        }
+
+    def _aggregate_scores(self, score_list: List) -> Dict:
+        """Mean of the per-example WERs."""
+        if not score_list:
+            return {}
+        return {"wer": round(np.mean([score["wer"] for score in score_list]), 5)}
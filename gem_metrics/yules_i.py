@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 
+from collections import Counter
 import itertools
 
 from .metric import ReferencelessMetric
 from .texts import Predictions
 
-from typing import Dict
+from typing import Dict, List
 
 
 class Yules_I(ReferencelessMetric):
@@ -21,11 +22,10 @@ class Yules_I(ReferencelessMetric):
     For a history of constancy measures of text, see Tanaka-Ishii et al,
     "Computational Constancy Measures of Texts—Yule's K and Rényi's Entropy".
     The implementation follows equation (1) in the above paper.
-    """
 
-    def support_caching(self):
-        # corpus-level, so individual examples can't be aggregated.
-        return False
+    Yule's I is corpus-level, so per-example token counts are computed (and cached) and
+    merged to compute the score.
+    """
 
     def get_vocabulary(self, sentence_array):
         """Compute vocabulary
@@ -46,12 +46,22 @@ class Yules_I(ReferencelessMetric):
         return total, data_vocabulary
 
     def compute(self, cache, predictions: Predictions) -> Dict:
+        return {
+            pred_id: self.get_vocabulary([sentence])[1]
+            for pred_id, sentence in zip(predictions.ids, predictions.untokenized)
+        }
+
+    def _aggregate_scores(self, score_list: List) -> Dict:
 
         """Computing Yules I measure
-        :param sentences: dictionary with all words and their frequencies
+        :param score_list: list of per-example dictionaries with words and their frequencies
         :returns: Yules I (the inverse of yule's K measure) (float) - the higher the better
         """
-        _, vocabulary = self.get_vocabulary(predictions.untokenized)
+        if not score_list:
+            return {}
+        vocabulary = Counter()
+        for stats in score_list:
+            vocabulary.update(stats)
 
         M1 = float(len(vocabulary))
         M2 = sum(
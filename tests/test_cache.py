@@ -0,0 +1,230 @@
+import pickle
+import shutil
+import tempfile
+import unittest
+from copy import copy
+from functools import partial
+from unittest import mock
+from gem_metrics import compute_metric
+from gem_metrics.cache import (
+    TieredCache,
+    get_many,
+    open_cache,
+    set_many,
+    texts_digest,
+)
+from gem_metrics.bleu import BLEU
+from gem_metrics.chrf import CHRF
+from gem_metrics.cider import CIDER
+from gem_metrics.local_recall import LocalRecall
+from gem_metrics.metric import ReferencedMetric
+from gem_metrics.msttr import MSTTR
+from gem_metrics.ngrams import NGramStats
+from gem_metrics.nist import NIST
+from gem_metrics.rouge import ROUGE
+from gem_metrics.ter import TER
+from gem_metrics.ttr import TTR
+from gem_metrics.yules_i import Yules_I
+from gem_metrics.texts import Predictions, References
+from tests.inputs import TestData
+
+
+class TestContentAddressedCache(unittest.TestCase):
+    def setUp(self):
+        self.metric = ROUGE()
+        self.predictions = copy(TestData.predictions)
+        self.predictions.ids = [str(i) for i in range(len(self.predictions))]
+
+    def test_keys_ignore_filename_and_ids(self):
+        renamed = copy(self.predictions)
+        renamed.filename = "renamed.json"
+        renamed.ids = ["other-%d" % i for i in range(len(renamed))]
+        self.assertEqual(
+            self.metric.cache_keys(self.predictions, TestData.references),
+            self.metric.cache_keys(renamed, TestData.references),
+        )
+
+    def test_keys_depend_on_references(self):
+        changed = References([["something else"]] * len(TestData.references))
+        keys = self.metric.cache_keys(self.predictions, TestData.references)
+        changed_keys = self.metric.cache_keys(self.predictions, changed)
+        self.assertTrue(all(k1 != k2 for k1, k2 in zip(keys, changed_keys)))
+
+    def test_keys_depend_on_config(self):
+        preds = Predictions(["a b c"])
+        self.assertNotEqual(
+            MSTTR(window_size=10).cache_keys(preds),
+            MSTTR(window_size=20).cache_keys(preds),
+        )
+
+    def test_keys_depend_on_tokenizer_version(self):
+        def tokenize(text):
+            return text.split()
+
+        preds = Predictions(["a b c"])
+        preds.tokenize_func = tokenize
+        tokenize.version = "1"
+        keys = self.metric.cache_keys(preds)
+        tokenize.version = "2"
+        self.assertNotEqual(keys, self.metric.cache_keys(preds))
+
+    def test_dataset_key_depends_on_config(self):
+        cache = {}
+        compute_metric(TTR, self.predictions, cache=cache)
+        num_entries = len(cache)
+        with mock.patch.object(TTR, "config", return_value={"other": True}):
+            compute_metric(TTR, self.predictions, cache=cache)
+        # all scores and the dataset result are computed again
+        self.assertEqual(len(cache), 2 * num_entries)
+
+    def test_cached_scores_are_reused(self):
+        cache = {}
+        result = self.metric.compute_cached(
+            cache, self.predictions, TestData.references
+        )
+        keys = self.metric.cache_keys(self.predictions, TestData.references)
+        self.assertEqual(set(cache), set(keys))
+
+        renamed = copy(self.predictions)
+        renamed.filename = "renamed.json"
+        self.metric.compute = None  # any recomputation would fail
+        self.assertEqual(
+            self.metric.compute_cached(cache, renamed, TestData.references), result
+        )
+
+    def test_texts_digest(self):
+        self.assertEqual(
+            texts_digest(self.predictions, TestData.references),
+            texts_digest(copy(self.predictions), TestData.references),
+        )
+        self.assertNotEqual(
+            texts_digest(self.predictions, TestData.references),
+            texts_digest(self.predictions, None),
+        )
+
+
+class TestSufficientStatistics(unittest.TestCase):
+    """Corpus-level metrics cache per-example statistics, so scores for any subset can be
+    computed from the cache alone, and they match scores computed from scratch."""
+
+    METRICS = [
+        BLEU,
+        CHRF,
+        TER,
+        NIST,
+        CIDER,
+        LocalRecall,
+        TTR,
+        Yules_I,
+        partial(MSTTR, window_size=4),
+        NGramStats,
+    ]
+
+    def setUp(self):
+        ids = [str(i) for i in range(len(TestData.predictions))]
+        self.predictions = copy(TestData.predictions)
+        self.predictions.ids = ids
+        self.references = copy(TestData.references)
+        self.references.ids = ids
+
+    def subset(self, texts, ids):
+        texts = copy(texts)
+        texts.assign_ids_and_unscramble(ids)
+        return texts
+
+    def test_subset_scores_from_cache(self):
+        subset_ids = ["2", "0"]
+        for metric_class in self.METRICS:
+            metric = metric_class()
+            with self.subTest(metric=metric.__class__.__name__):
+                args = [self.predictions]
+                if isinstance(metric, ReferencedMetric):
+                    args.append(self.references)
+                subset_args = [self.subset(arg, subset_ids) for arg in args]
+                expected = metric_class().compute_cached(None, *subset_args)
+
+                cache = {}
+                metric.compute_cached(cache, *args)
+                metric.compute = None  # any recomputation would fail
+                self.assertEqual(metric.compute_cached(cache, *subset_args), expected)
+
+    def test_token_statistics_are_compact(self):
+        for metric_class in [MSTTR, NGramStats]:
+            with self.subTest(metric=metric_class.__name__):
+                scores = metric_class().compute(None, self.predictions)
+                for stats in scores.values():
+                    self.assertEqual(list(stats), ["tokens"])
+                    self.assertIsInstance(stats["tokens"], str)
+
+
+class TestBulkCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = open_cache(self.cache_dir)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.cache_dir)
+
+    def test_set_and_get_many(self):
+        items = {("metric", str(i)): {"score": i} for i in range(20)}
+        set_many(self.cache, items)
+        self.assertEqual(self.cache[("metric", "3")], {"score": 3})
+        keys = list(items) + [("metric", "missing")]
+        self.assertEqual(get_many(self.cache, keys), items)
+
+    def test_plain_dict(self):
+        cache = {}
+        set_many(cache, {"a": 1, "b": 2})
+        self.assertEqual(get_many(cache, ["a", "c"]), {"a": 1})
+
+
+class TestTieredCache(unittest.TestCase):
+    def setUp(self):
+        self.store = {}
+        self.cache = TieredCache(self.store, max_bytes=2000)
+
+    def test_repeated_lookups_stay_in_memory(self):
+        self.store["a"] = 1
+        self.assertEqual(self.cache.get("a"), 1)
+        del self.store["a"]  # second lookup must not reach the store
+        self.assertEqual(self.cache["a"], 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_writes_go_to_both_tiers(self):
+        set_many(self.cache, {"a": 1, "b": 2})
+        self.cache["c"] = 3
+        self.assertEqual(self.store, {"a": 1, "b": 2, "c": 3})
+        self.store.clear()
+        self.assertEqual(
+            get_many(self.cache, ["a", "b", "c", "d"]), {"a": 1, "b": 2, "c": 3}
+        )
+        self.assertIsNone(self.cache.get("d"))
+
+    def test_byte_budget(self):
+        set_many(self.cache, {str(i): "x" * 100 for i in range(100)})
+        stats = self.cache.stats()
+        self.assertLessEqual(stats["bytes"], 2000)
+        self.assertLess(stats["entries"], 100)
+        # least recently used entries are evicted first
+        self.store.clear()
+        self.assertIsNone(self.cache.get("0"))
+        self.assertEqual(self.cache.get("99"), "x" * 100)
+
+    def test_sampled_sizes(self):
+        with mock.patch("gem_metrics.cache.pickle.dumps", wraps=pickle.dumps) as dumps:
+            set_many(self.cache, {("M", str(i)): "x" * 100 for i in range(32)})
+        self.assertEqual(dumps.call_count, 2)
+        # the other entries are assumed to have the same size
+        self.assertEqual(self.cache.stats()["bytes"] % self.cache._sizes["M", "31"], 0)
+
+    def test_pickled_cache_has_empty_memory(self):
+        self.cache["a"] = 1
+        restored = pickle.loads(pickle.dumps(self.cache))
+        self.assertEqual(restored.stats()["entries"], 0)
+        self.assertEqual(restored.get("a"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,6 @@
+import random
 import unittest
+from itertools import zip_longest
 import gem_metrics.chrf
 from tests.test_referenced import TestReferencedMetric
 
@@ -25,5 +27,43 @@ class TestCHRF(TestReferencedMetric, unittest.TestCase):
         self.true_results_empty_pred = {"chrf": 0.0, "chrf+": 0.0, "chrf++": 0.0}
 
 
+class TestChrfEngine(unittest.TestCase):
+    def test_same_as_sacrebleu(self):
+        rnd = random.Random(0)
+        words = ["a", "the", "cat", "sat", "(on)", "mat.", "Mat", "x,", "-", "'s"]
+
+        def sentence():
+            return " ".join(rnd.choice(words) for _ in range(rnd.randint(0, 12)))
+
+        hyps = [sentence() for _ in range(200)]
+        # variable numbers of references, including none and empty ones
+        refs = [[sentence() for _ in range(rnd.randint(0, 4))] for _ in hyps]
+        metric = gem_metrics.chrf.CHRF()
+        stats = [metric.engine.segment_statistics(h, r) for h, r in zip(hyps, refs)]
+        with_refs = [i for i, r in enumerate(refs) if r]
+        ref_streams = list(zip_longest(*[refs[i] for i in with_refs]))
+        for key, variant in metric.metrics.items():
+            expected = variant._extract_corpus_statistics(
+                [hyps[i] for i in with_refs], ref_streams
+            )
+            self.assertEqual([stats[i][key] for i in with_refs], expected)
+        self.assertTrue(all(not stats[i]["chrf"] for i, r in enumerate(refs) if not r))
+
+    def test_corpus_scores(self):
+        metric = gem_metrics.chrf.CHRF()
+        hyps = ["The cat sat on the mat.", "A dog.", "Nothing in common"]
+        refs = [["The cat is on the mat.", "A cat sat."], ["The dog!"], ["zzz"]]
+        stats = [metric.engine.segment_statistics(h, r) for h, r in zip(hyps, refs)]
+        for key, variant in metric.metrics.items():
+            for subset in [[0, 1, 2], [0, 2], [1]]:
+                self.assertEqual(
+                    metric.engine.corpus_scores([stats[i] for i in subset])[key],
+                    variant.corpus_score(
+                        [hyps[i] for i in subset],
+                        list(zip_longest(*[refs[i] for i in subset])),
+                    ).score,
+                )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,8 @@
+import random
 import unittest
+import numpy as np
 import gem_metrics.cider
+from gem_metrics.cider import CIDER, CiderEngine
 from tests.test_referenced import TestReferencedMetric
 
 
@@ -13,5 +16,66 @@ class TestCider(TestReferencedMetric, unittest.TestCase):
         self.true_results_empty_pred = {"CIDEr": 0.0}
 
 
+class TestCiderEngine(unittest.TestCase):
+    def random_data(self, rnd, num_examples, vocab_size=10):
+        words = [f"w{i}" for i in range(vocab_size)]
+
+        def sentence(min_len):
+            return [rnd.choice(words) for _ in range(rnd.randint(min_len, 15))]
+
+        metric = CIDER()
+        ctest = [dict(metric.cook_test(sentence(0))) for _ in range(num_examples)]
+        crefs = [
+            [dict(ref) for ref in metric.cook_refs([sentence(1) for _ in range(3)])]
+            for _ in range(num_examples)
+        ]
+        return ctest, crefs
+
+    def compute_score(self, ctest, crefs):
+        metric = CIDER()
+        metric.ctest = [dict(test) for test in ctest]
+        metric.crefs = [[dict(ref) for ref in refs] for refs in crefs]
+        return metric.compute_score()
+
+    def test_same_as_compute_score(self):
+        rnd = random.Random(0)
+        for _ in range(50):
+            ctest, crefs = self.random_data(rnd, rnd.randint(2, 15))
+            mean, scores = self.compute_score(ctest, crefs)
+            engine_scores = CiderEngine(crefs).scores(ctest)
+            np.testing.assert_allclose(engine_scores, scores, rtol=1e-9, atol=1e-12)
+            self.assertAlmostEqual(np.mean(engine_scores), mean)
+
+    def test_reused_for_other_tests(self):
+        rnd = random.Random(1)
+        ctest, crefs = self.random_data(rnd, 10)
+        other_ctest, _ = self.random_data(rnd, 10, vocab_size=15)
+        engine = CiderEngine(crefs)
+        for test in [ctest, other_ctest, ctest]:
+            np.testing.assert_allclose(
+                engine.scores(test), self.compute_score(test, crefs)[1], atol=1e-12
+            )
+
+    def test_subset_and_tables(self):
+        rnd = random.Random(2)
+        ctest, crefs = self.random_data(rnd, 12)
+        engine = CiderEngine.from_tables(CiderEngine(crefs).tables())
+        rows = [7, 2, 3, 11]
+        np.testing.assert_allclose(
+            engine.subset(np.array(rows)).scores([ctest[i] for i in rows]),
+            self.compute_score([ctest[i] for i in rows], [crefs[i] for i in rows])[1],
+            atol=1e-12,
+        )
+        np.testing.assert_allclose(
+            engine.scores(ctest), self.compute_score(ctest, crefs)[1], atol=1e-12
+        )
+
+    def test_subset_without_reference_ngrams(self):
+        precook = CIDER.precook
+        engine = CiderEngine([[precook("the cat sat")], [precook("")]])
+        scores = engine.subset(np.array([1])).scores([precook("the cat")])
+        np.testing.assert_array_equal(scores, [0.0])
+
+
 if __name__ == "__main__":
     unittest.main()
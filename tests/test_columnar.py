@@ -0,0 +1,154 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from copy import copy
+import gem_metrics
+from gem_metrics.columnar import (
+    StringColumn,
+    convert,
+    is_columnar,
+    load_columnar,
+    save_columnar,
+)
+from gem_metrics.texts import Predictions, References, Sources
+
+
+class TestStringColumn(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def roundtrip(self, data):
+        StringColumn.from_list(data).save(self.folder.name, "col")
+        return StringColumn.load(self.folder.name, "col")
+
+    def test_single(self):
+        data = ["A text.", "", "Ünïcödé – ✓", "last"]
+        column = self.roundtrip(data)
+        self.assertEqual(len(column), 4)
+        self.assertEqual(list(column), data)
+        self.assertEqual(column[2], data[2])
+        self.assertEqual(column[-1], "last")
+        self.assertEqual(column[1:3], data[1:3])
+        self.assertEqual(column, data)
+        self.assertNotEqual(column, data[:-1])
+        self.assertEqual(column, StringColumn.from_list(data))
+        with self.assertRaises(IndexError):
+            column[4]
+
+    def test_multi(self):
+        data = [["a", "b"], ["ç"], ["", "d", "e"]]
+        column = self.roundtrip(data)
+        self.assertEqual(len(column), 3)
+        self.assertEqual(list(column), data)
+        self.assertEqual(column[0], ["a", "b"])
+        self.assertIsInstance(column[0], list)
+        self.assertEqual(column, data)
+
+    def test_empty(self):
+        self.assertEqual(list(self.roundtrip([])), [])
+
+    def test_pickle_reopens_file(self):
+        column = self.roundtrip(["x", "y"])
+        pickled = pickle.dumps(column)
+        # only the location is pickled, not the data
+        self.assertLess(len(pickled), 300)
+        self.assertNotIn(b"x", pickled.replace(self.folder.name.encode(), b""))
+        self.assertEqual(pickle.loads(pickled), column)
+
+
+class TestColumnarTexts(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        values = [
+            {"gem_id": f"id-{i}", "gem_parent_id": f"p-{i}", "target": [text]}
+            for i, text in enumerate(
+                ["A first text.", "Another, different TEXT!", "Ünïcödé (text) here."]
+            )
+        ]
+        for i, item in enumerate(values):
+            item["source"] = f"Source {i}."
+        self.json_file = os.path.join(self.folder.name, "dataset.json")
+        with open(self.json_file, "w", encoding="UTF-8") as fh:
+            json.dump({"values": values}, fh)
+        self.refs = References(self.json_file)
+        self.path = os.path.join(self.folder.name, "refs")
+
+    def test_roundtrip(self):
+        save_columnar(self.refs, self.path)
+        self.assertTrue(is_columnar(self.path))
+        refs = References(self.path)
+        self.assertIsNone(refs.all_data)
+        self.assertEqual(refs.data, self.refs.data)
+        self.assertEqual(refs.ids, self.refs.ids)
+        self.assertEqual(refs.parent_ids, self.refs.parent_ids)
+        self.assertTrue(refs.multi_ref)
+        self.assertIsNone(refs.pretokenized)
+        self.assertEqual(refs.list_tokenized, self.refs.list_tokenized)
+
+    def test_wrong_class(self):
+        save_columnar(self.refs, self.path)
+        with self.assertRaises(Exception):
+            Predictions(self.path)
+
+    def test_pretokenized(self):
+        save_columnar(self.refs, self.path, tokenized=True)
+        refs = References(self.path)
+        self.assertIsNotNone(refs.pretokenized)
+        self.assertEqual(refs.list_tokenized, self.refs.list_tokenized)
+        self.assertEqual(
+            refs.list_tokenized_lower_nopunct, self.refs.list_tokenized_lower_nopunct
+        )
+        self.assertEqual(refs.whitespace_tokenized, self.refs.whitespace_tokenized)
+
+        # reordering invalidates the stored tokens
+        reordered = References(self.path)
+        reordered.assign_ids_and_unscramble(["id-2", "id-0", "id-1"])
+        self.assertIsNone(reordered.pretokenized)
+        expected = self.refs.list_tokenized
+        self.assertEqual(
+            reordered.list_tokenized, [expected[2], expected[0], expected[1]]
+        )
+
+    def test_other_tokenizer(self):
+        save_columnar(self.refs, self.path, tokenized=True)
+        meta_file = os.path.join(self.path, "meta.json")
+        with open(meta_file, encoding="UTF-8") as fh:
+            meta = json.load(fh)
+        meta["tokenizer"] = "other"
+        with open(meta_file, "w", encoding="UTF-8") as fh:
+            json.dump(meta, fh)
+        self.assertIsNotNone(load_columnar(self.path)["tokens"])
+        refs = References(self.path)
+        self.assertIsNone(refs.pretokenized)
+        self.assertEqual(refs.list_tokenized, self.refs.list_tokenized)
+
+    def test_convert(self):
+        paths = convert(self.json_file, tokenized=True)
+        self.assertEqual(
+            [os.path.basename(path) for path in paths],
+            ["dataset.references", "dataset.sources"],
+        )
+        self.assertEqual(References(paths[0]).data, self.refs.data)
+        self.assertEqual(Sources(paths[1]).data, Sources(self.json_file).data)
+
+    def test_same_scores(self):
+        save_columnar(self.refs, self.path, tokenized=True)
+        preds = Predictions(
+            [{"gem_id": f"id-{i}", "generated": f"A text {i}."} for i in range(3)]
+        )
+        metrics = ["bleu", "rouge", "wer", "ttr"]
+        results = gem_metrics.compute(
+            copy(preds), References(self.path), metrics_list=metrics
+        )
+        expected = gem_metrics.compute(copy(preds), self.refs, metrics_list=metrics)
+        self.assertEqual(results.pop("references_file"), self.path)
+        expected.pop("references_file")
+        self.assertEqual(results, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
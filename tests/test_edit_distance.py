@@ -0,0 +1,83 @@
+import random
+import unittest
+from gem_metrics.edit_distance import (
+    edit_distance,
+    edit_distances_one_to_many,
+    word_error_rates,
+    word_error_stats,
+)
+
+
+def dp_edit_distance(a, b):
+    """Reference implementation -- full dynamic programming."""
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            if a[i - 1] == b[j - 1]:
+                cur[j] = prev[j - 1]
+            else:
+                cur[j] = 1 + min(prev[j - 1], prev[j], cur[j - 1])
+        prev = cur
+    return prev[-1]
+
+
+class TestEditDistance(unittest.TestCase):
+    def test_examples(self):
+        self.assertEqual(edit_distance("kitten", "sitting"), 3)
+        self.assertEqual(edit_distance([], []), 0)
+        self.assertEqual(edit_distance([], [1, 2, 3]), 3)
+        self.assertEqual(edit_distance(["a", "b"], []), 2)
+        self.assertEqual(edit_distance("the cat sat".split(), "a cat sat".split()), 1)
+
+    def test_same_as_dp(self):
+        rnd = random.Random(0)
+        for _ in range(2000):
+            a = [rnd.randint(0, 4) for _ in range(rnd.randint(0, 15))]
+            b = [rnd.randint(0, 4) for _ in range(rnd.randint(0, 15))]
+            self.assertEqual(edit_distance(a, b), dp_edit_distance(a, b), (a, b))
+            self.assertEqual(edit_distance(b, a), dp_edit_distance(a, b), (a, b))
+
+    def test_long(self):
+        # well over 255 tokens and 64 bits
+        rnd = random.Random(1)
+        a = [rnd.randint(0, 50) for _ in range(700)]
+        b = [rnd.randint(0, 50) for _ in range(400)]
+        self.assertEqual(edit_distance(a, b), dp_edit_distance(a, b))
+        self.assertEqual(edit_distance(a, []), 700)
+
+    def test_one_to_many(self):
+        refs = [[1, 2, 3], [], [3, 2, 1, 0], [1, 2, 3, 4]]
+        self.assertEqual(
+            edit_distances_one_to_many([1, 2, 3], refs),
+            [dp_edit_distance([1, 2, 3], ref) for ref in refs],
+        )
+
+    def test_word_error_rates(self):
+        scores = word_error_rates(
+            [[1, 2, 3], [1]],
+            [[[1, 2, 4], [1, 2, 3, 4]], [[2, 2]]],
+        )
+        self.assertEqual(scores, [25.0, 100.0])
+
+    def test_word_error_stats(self):
+        rnd = random.Random(2)
+        preds = [
+            [rnd.randint(0, 9) for _ in range(rnd.randint(0, 20))] for _ in range(50)
+        ]
+        refs = [
+            [[rnd.randint(0, 9) for _ in range(rnd.randint(1, 20))] for _ in range(3)]
+            for _ in range(50)
+        ]
+        stats = word_error_stats(preds, refs)
+        self.assertEqual([wer for wer, _, _ in stats], word_error_rates(preds, refs))
+        for wer, edits, ref_len in stats:
+            self.assertEqual(wer, edits / ref_len * 100)
+        # sharded over worker processes
+        self.assertEqual(
+            word_error_stats(preds, refs, num_workers=2, min_parallel=0), stats
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
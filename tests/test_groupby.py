@@ -0,0 +1,108 @@
+import unittest
+from copy import copy
+import numpy as np
+import gem_metrics
+from gem_metrics.groupby import group_means
+from gem_metrics.texts import References, Submission
+from tests.utils import assertDeepAlmostEqual
+
+WORDS = "the cat dog sat on a mat near city centre with food good cheap".split()
+
+
+def make_sentence(seed: int, length: int) -> str:
+    return " ".join(WORDS[(seed * 7 + i * 3) % len(WORDS)] for i in range(length))
+
+
+class TestGroupMeans(unittest.TestCase):
+    def setUp(self):
+        self.scores = {
+            str(i): {"a": float(i), "b": {"x": i * 2.0, "y": 1.0 / (i + 1)}}
+            for i in range(10)
+        }
+
+    def test_matches_mean(self):
+        groups = {"even": ["0", "2", "4", "6", "8"], "low": ["0", "1", "2"]}
+        results = group_means(self.scores, groups)
+        for name, ids in groups.items():
+            self.assertEqual(
+                results[name]["a"],
+                round(np.mean([self.scores[i]["a"] for i in ids]), 5),
+            )
+            self.assertEqual(
+                results[name]["b"]["y"],
+                round(np.mean([self.scores[i]["b"]["y"] for i in ids]), 5),
+            )
+
+    def test_empty_group(self):
+        results = group_means(self.scores, {"empty": [], "one": ["3"]})
+        self.assertEqual(results["empty"], {})
+        self.assertEqual(results["one"], {"a": 3.0, "b": {"x": 6.0, "y": 0.25}})
+
+
+class TestSubsets(unittest.TestCase):
+    """Aggregated subset results must match computing the subsets as separate datasets."""
+
+    METRICS = ["rouge", "bleu", "ttr", "wer"]
+
+    def setUp(self):
+        ids = [f"synthetic-{i}" for i in range(12)]
+        self.data = {
+            "submission_name": "test",
+            "param_count": 1,
+            "tasks": {
+                "synthetic": {
+                    "values": [
+                        {"gem_id": i, "generated": make_sentence(n, 5 + n % 4)}
+                        for n, i in enumerate(ids)
+                    ]
+                }
+            },
+        }
+        self.refs = {
+            "synthetic": References(
+                {
+                    "values": [
+                        {"gem_id": i, "target": [make_sentence(n + 1, 6)]}
+                        for n, i in enumerate(ids)
+                    ]
+                }
+            )
+        }
+        self.subsets = {
+            "synthetic_contrast_set-a": ids[:5],
+            "synthetic_contrast_set-b": ids[5:],
+            "synthetic_contrast_other-a": ids[::-3],
+        }
+
+    def process(self, submission, refs, subsets=None):
+        return gem_metrics.process_submission(
+            submission,
+            refs,
+            {},
+            gem_metrics.metric_list_to_metric_dict(self.METRICS),
+            gem_metrics.metric_list_to_metric_dict([]),
+            num_threads=1,
+            parallel_backend="thread",
+            subsets=subsets,
+        )
+
+    def test_subsets_match_separate_datasets(self):
+        submission = Submission(self.data)
+        refs = dict(self.refs)
+        for name, id_list in self.subsets.items():
+            outs = copy(submission.predictions_for("synthetic"))
+            outs.assign_ids_and_unscramble(id_list)
+            submission.entries[name] = outs
+            refs[name] = copy(self.refs["synthetic"])
+            refs[name].assign_ids_and_unscramble(id_list)
+        expected = self.process(submission, refs)
+
+        results = self.process(
+            Submission(self.data), self.refs, {"synthetic": self.subsets}
+        )
+        self.assertEqual(list(results), list(expected))
+        assertDeepAlmostEqual(self, expected, results, places=4)
+
+
+if __name__ == "__main__":
+    unittest.main()
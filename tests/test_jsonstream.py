@@ -0,0 +1,93 @@
+import glob
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+from gem_metrics.jsonstream import load_json
+from gem_metrics.texts import Predictions, References, Submission
+
+
+class TestLoadJSON(unittest.TestCase):
+    def test_same_as_json_load(self):
+        files = glob.glob("test_data/*.json") + glob.glob("test_data/unit_tests/*.json")
+        for filename in files:
+            with open(filename, encoding="UTF-8") as fh:
+                expected = json.load(fh)
+            for chunk_size in (1, 7, 4096):
+                self.assertEqual(
+                    load_json(filename, chunk_size=chunk_size), expected, filename
+                )
+
+    def test_chunk_boundaries(self):
+        doc = '{"a": 12345, "values": [1.5e3, true, null, "x\\"y", {"b": [1, 2]}] } '
+        for chunk_size in range(1, len(doc) + 1):
+            self.assertEqual(
+                load_json(io.StringIO(doc), chunk_size=chunk_size), json.loads(doc)
+            )
+        for bad in ('{"a": 1', '{"a": 1}}', "[1, 2", '{"a" 1}', "[1 2]", ""):
+            with self.assertRaises(json.JSONDecodeError, msg=bad):
+                load_json(io.StringIO(bad), chunk_size=2)
+
+    def test_fields(self):
+        doc = {
+            "submission_name": "x",
+            "tasks": {
+                "a": {"values": [{"gem_id": "1", "generated": "g", "target": "t"}]}
+            },
+        }
+        result = load_json(io.StringIO(json.dumps(doc)), Predictions.fields())
+        self.assertEqual(
+            result["tasks"]["a"]["values"], [{"gem_id": "1", "generated": "g"}]
+        )
+        refs = [{"gem_id": "1", "target": "t", "concepts": ["c"]}, "bare"]
+        self.assertEqual(
+            load_json(io.StringIO(json.dumps(refs)), References.fields()),
+            [{"gem_id": "1", "target": "t"}, "bare"],
+        )
+
+    def test_fields_of_bare_dataset_lists(self):
+        instances = [{"gem_id": "1", "generated": "g", "target": "t"}]
+        submission = {"submission_name": "x", "tasks": {"a": instances}}
+        result = load_json(io.StringIO(json.dumps(submission)), Predictions.fields())
+        self.assertEqual(result["tasks"]["a"], [{"gem_id": "1", "generated": "g"}])
+        references = {"a": instances, "b": {"values": instances}}
+        result = load_json(io.StringIO(json.dumps(references)), References.fields())
+        expected = [{"gem_id": "1", "target": "t"}]
+        self.assertEqual(result, {"a": expected, "b": {"values": expected}})
+        # other nested arrays are kept as they are
+        doc = {"a": {"other": [{"gem_id": "1", "x": 1}]}}
+        self.assertEqual(load_json(io.StringIO(json.dumps(doc)), ["gem_id"]), doc)
+
+
+class TestStreamingMemory(unittest.TestCase):
+    def test_document_not_held_in_memory(self):
+        values = [
+            {"gem_id": f"id-{i}", "generated": f"Text {i}.", "target": "x" * 2000}
+            for i in range(2000)
+        ]
+        doc = {"submission_name": "test", "param_count": 1, "tasks": {"a": values}}
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "submission.json")
+            with open(filename, "w", encoding="UTF-8") as fh:
+                json.dump({**doc, "tasks": {"a": {"values": values}}}, fh)
+            file_size = os.path.getsize(filename)
+            del values, doc
+
+            # memory use is bounded by the chunk size, not the file size
+            tracemalloc.start()
+            try:
+                data = load_json(filename, Predictions.fields(), chunk_size=1 << 16)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            submission = Submission(filename)
+        self.assertEqual(len(data["tasks"]["a"]["values"]), 2000)
+        self.assertNotIn("target", data["tasks"]["a"]["values"][0])
+        self.assertEqual(len(submission.predictions_for("a")), 2000)
+        self.assertLess(peak, file_size / 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
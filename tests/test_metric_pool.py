@@ -0,0 +1,55 @@
+import unittest
+from gem_metrics.cider import CIDER
+from gem_metrics.metric import MetricPool
+from gem_metrics.msttr import MSTTR
+from tests.inputs import TestData
+
+
+class TestMetricPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = MetricPool()
+        TestData.predictions.ids = [str(i) for i in range(len(TestData.predictions))]
+
+    def test_instances_are_reused(self):
+        with self.pool.use(CIDER) as metric:
+            first = metric
+        with self.pool.use(CIDER) as metric:
+            self.assertIs(metric, first)
+        self.assertEqual(len(self.pool), 1)
+
+    def test_instances_are_keyed_by_config(self):
+        with self.pool.use(MSTTR, window_size=4) as metric:
+            self.assertEqual(metric.window_size, 4)
+        with self.pool.use(MSTTR) as metric:
+            self.assertEqual(metric.window_size, 100)
+        self.assertEqual(len(self.pool), 2)
+
+    def test_borrowed_instances_are_not_shared(self):
+        with self.pool.use(CIDER) as outer:
+            with self.pool.use(CIDER) as inner:
+                self.assertIsNot(outer, inner)
+
+    def test_reused_instance_gives_same_results(self):
+        results = []
+        for _ in range(2):
+            with self.pool.use(CIDER) as metric:
+                results.append(
+                    metric.compute_cached(
+                        None, TestData.predictions, TestData.references
+                    )
+                )
+        self.assertEqual(results[0], results[1])
+
+    def test_release(self):
+        with self.pool.use(CIDER):
+            pass
+        with self.pool.use(MSTTR):
+            pass
+        self.pool.release(CIDER)
+        self.assertEqual(len(self.pool), 1)
+        self.pool.release()
+        self.assertEqual(len(self.pool), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,7 +24,7 @@ class TestMSTTR(TestReferenceLessMetric, unittest.TestCase):
             "msttr-12_nopunct": 0.91667,
         }
 
-        calculated_metrics = self.metric.compute({}, TestData.predictions)
+        calculated_metrics = self.compute_metric(self.metric, TestData.predictions)
 
         assertDeepAlmostEqual(self, expected_metrics, calculated_metrics)
 
@@ -32,8 +32,8 @@ class TestMSTTR(TestReferenceLessMetric, unittest.TestCase):
         """Tests with empty inputs"""
         text = ["", ""]
 
-        calculated_metrics = self.metric.compute(
-            {}, Predictions({"values": text, "language": "en"})
+        calculated_metrics = self.compute_metric(
+            self.metric, Predictions({"values": text, "language": "en"})
         )
 
         self.assertTrue(math.isnan(calculated_metrics["msttr-4"]))
@@ -49,8 +49,8 @@ class TestMSTTR(TestReferenceLessMetric, unittest.TestCase):
         ]
         for window_size in range(1, 11):
             metric = MSTTR(window_size=window_size)
-            calculated_metrics = metric.compute(
-                {}, Predictions({"values": text, "language": "en"})
+            calculated_metrics = self.compute_metric(
+                metric, Predictions({"values": text, "language": "en"})
             )
             self.assertAlmostEquals(calculated_metrics[f"msttr-{window_size}"], 1)
 
@@ -64,8 +64,8 @@ class TestMSTTR(TestReferenceLessMetric, unittest.TestCase):
         ]
         for window_size in range(1, 11):
             metric = MSTTR(window_size=window_size)
-            calculated_metrics = metric.compute(
-                {}, Predictions({"values": text, "language": "en"})
+            calculated_metrics = self.compute_metric(
+                metric, Predictions({"values": text, "language": "en"})
             )
             self.assertAlmostEqual(
                 calculated_metrics[f"msttr-{window_size}"], round(1 / window_size, 5)
@@ -59,7 +59,9 @@ class TestNGram(TestReferenceLessMetric, unittest.TestCase):
             "cond_entropy-3-nopunct": -0.04644297947538351,
         }
 
-        calculated_metrics = self.ngram_metric.compute({}, TestData.predictions)
+        calculated_metrics = self.compute_metric(
+            self.ngram_metric, TestData.predictions
+        )
         assertDeepAlmostEqual(self, expected_metrics, calculated_metrics)
 
     def test_ngram_metric_empty(self):
@@ -105,8 +107,8 @@ class TestNGram(TestReferenceLessMetric, unittest.TestCase):
             "entropy-3-nopunct": 0,
         }
 
-        calculated_metrics = self.ngram_metric.compute(
-            {}, Predictions({"values": text, "language": "en"})
+        calculated_metrics = self.compute_metric(
+            self.ngram_metric, Predictions({"values": text, "language": "en"})
         )
 
         assertDeepAlmostEqual(self, expected_metrics, calculated_metrics)
@@ -158,8 +160,8 @@ class TestNGram(TestReferenceLessMetric, unittest.TestCase):
             "cond_entropy-3-nopunct": 0.486624565223814,
         }
 
-        calculated_metrics = self.ngram_metric.compute(
-            {}, Predictions({"values": text, "language": "en"})
+        calculated_metrics = self.compute_metric(
+            self.ngram_metric, Predictions({"values": text, "language": "en"})
         )
         assertDeepAlmostEqual(self, expected_metrics, calculated_metrics)
 
@@ -210,8 +212,8 @@ class TestNGram(TestReferenceLessMetric, unittest.TestCase):
             "cond_entropy-3-nopunct": -0.0,
         }
 
-        calculated_metrics = self.ngram_metric.compute(
-            {}, Predictions({"values": text, "language": "en"})
+        calculated_metrics = self.compute_metric(
+            self.ngram_metric, Predictions({"values": text, "language": "en"})
         )
         assertDeepAlmostEqual(self, expected_metrics, calculated_metrics)
 
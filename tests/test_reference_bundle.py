@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import gem_metrics
+
+
+class TestReferenceBundle(unittest.TestCase):
+    def load(self, values):
+        """Load a bundle for a fake standard dataset whose reference file has `values`,
+        return it with the number of times the file was parsed."""
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "dataset.json")
+            with open(filename, "w", encoding="UTF-8") as fh:
+                json.dump({"language": "en", "values": values}, fh)
+            load_json = mock.Mock(wraps=gem_metrics.load_json)
+            with mock.patch.multiple(
+                gem_metrics,
+                get_all_datasets=lambda: ["dataset"],
+                get_language_for_dataset=lambda name: "en",
+                get_url_for_dataset=lambda name: None,
+                ensure_download=lambda *args: filename,
+                load_json=load_json,
+            ):
+                return (
+                    gem_metrics.load_reference_bundle("dataset"),
+                    load_json.call_count,
+                )
+
+    def test_single_parse(self):
+        values = [
+            {"gem_id": "a", "gem_parent_id": "p", "target": "A.", "source": "Src A."},
+            {"gem_id": "b", "gem_parent_id": "q", "target": "B.", "source": "Src B."},
+        ]
+        bundle, parses = self.load(values)
+        self.assertEqual(parses, 1)
+        self.assertEqual(bundle.references.untokenized, [["A."], ["B."]])
+        self.assertEqual(bundle.sources.untokenized, ["Src A.", "Src B."])
+        self.assertEqual(bundle.references.ids, ["a", "b"])
+        self.assertEqual(bundle.parent_ids, ["p", "q"])
+        self.assertTrue(bundle.references.filename.endswith("dataset.json"))
+
+    def test_no_sources(self):
+        bundle, parses = self.load([{"gem_id": "a", "target": "A."}])
+        self.assertEqual(parses, 1)
+        self.assertEqual(bundle.references.untokenized, [["A."]])
+        self.assertIsNone(bundle.sources)
+        self.assertIsNone(bundle.parent_ids)
+
+    def test_unknown_dataset(self):
+        bundle = gem_metrics.load_reference_bundle("no_such_dataset")
+        self.assertIsNone(bundle.references)
+        self.assertIsNone(bundle.sources)
+
+
+if __name__ == "__main__":
+    unittest.main()
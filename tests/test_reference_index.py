@@ -0,0 +1,155 @@
+import os
+import tempfile
+import unittest
+from copy import copy
+from unittest import mock
+import numpy as np
+import gem_metrics
+from gem_metrics.cider import CIDER
+from gem_metrics.nist import NIST
+from gem_metrics.reference_index import ReferenceTables, reference_index
+from gem_metrics.texts import Predictions, References
+
+TEXTS = [
+    "Alimentum is not family-friendly, and is near the Burger King in the city centre.",
+    "There is a place in the city centre, Alimentum, that is not family-friendly.",
+    "There is a house in New Orleans.",
+    "The Eagle is a cheap coffee shop near Burger King.",
+    "Near the river, there is a family-friendly pub called The Mill.",
+]
+
+
+class TestReferenceIndex(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.addCleanup(reference_index.close)
+        self.refs = References(
+            {
+                "values": [
+                    {"gem_id": f"id-{i}", "target": [text, TEXTS[(i + 1) % len(TEXTS)]]}
+                    for i, text in enumerate(TEXTS)
+                ]
+            }
+        )
+        self.preds = Predictions(
+            {
+                "values": [
+                    {"gem_id": f"id-{i}", "generated": text.replace("is", "was")}
+                    for i, text in enumerate(TEXTS)
+                ]
+            }
+        )
+        self.subsets = {"first": ["id-0", "id-1", "id-2"], "others": ["id-4", "id-3"]}
+
+    def compute(self, metric_class, preds=None):
+        return gem_metrics.compute_metric_with_subsets(
+            metric_class,
+            copy(preds or self.preds),
+            copy(self.refs),
+            subsets=self.subsets,
+        )
+
+    def test_same_scores(self):
+        for metric_class in [CIDER, NIST]:
+            expected = self.compute(metric_class)
+            reference_index.open(self.folder.name)
+            self.assertEqual(self.compute(metric_class), expected)
+            # loaded from disk
+            reference_index.clear()
+            self.assertEqual(self.compute(metric_class), expected)
+            reference_index.close()
+
+    def test_partial_predictions(self):
+        preds = copy(self.preds)
+        preds.assign_ids_and_unscramble(["id-3", "id-1"])
+        self.subsets = {"one": ["id-1"]}
+        for metric_class in [CIDER, NIST]:
+            expected = self.compute(metric_class, preds)
+            reference_index.open(self.folder.name)
+            self.assertEqual(self.compute(metric_class, preds), expected)
+            reference_index.close()
+
+    def test_empty_predictions(self):
+        preds = copy(self.preds)
+        preds.data = [""] * len(preds)
+        for metric_class in [CIDER, NIST]:
+            expected = self.compute(metric_class, preds)
+            reference_index.open(self.folder.name)
+            self.assertEqual(self.compute(metric_class, preds), expected)
+            reference_index.close()
+
+    def test_mismatched_ids(self):
+        # IDs assigned to predictions without any (`generated-00000`...), scored against
+        # references aligned by position
+        preds = Predictions({"values": [{"generated": text} for text in TEXTS]})
+        preds.assign_ids_and_unscramble(None)
+        aligned_refs = References({"values": [{"target": t} for t in self.refs.data]})
+        reference_index.open(self.folder.name)
+        for metric_class in [CIDER, NIST]:
+            metric = metric_class()
+            self.assertTrue(reference_index.enabled(metric, self.refs, self.preds))
+            self.assertFalse(reference_index.enabled(metric, self.refs, preds))
+            self.assertIsNone(metric.lookup_reference_tables(preds, self.refs))
+            scores = metric.compute_per_example(None, preds, aligned_refs)
+            tables = metric.lookup_reference_tables(preds, self.refs)
+            self.assertEqual(metric.aggregate(scores, tables), metric.aggregate(scores))
+            subsets = {"first": preds.ids[:3]}
+            self.assertEqual(
+                metric.aggregate_subsets(scores, subsets, tables),
+                metric.aggregate_subsets(scores, subsets),
+            )
+        # nothing was built for the mismatched predictions
+        self.assertEqual(os.listdir(self.folder.name), [])
+
+    def test_cached_scores(self):
+        cache = {}
+        CIDER().compute_per_example(cache, self.preds, self.refs)
+        num_entries = len(cache)
+        reference_index.open(self.folder.name)
+        metric = CIDER()
+        # scores without the index (with reference n-gram counts) have other keys
+        metric.compute_per_example(cache, self.preds, self.refs)
+        self.assertEqual(len(cache), 2 * num_entries)
+        # the tables are not needed if everything is cached
+        with mock.patch.object(reference_index, "get", side_effect=AssertionError):
+            scores = metric.compute_per_example(cache, copy(self.preds), self.refs)
+        self.assertEqual(list(scores), self.preds.ids)
+        self.assertFalse(hasattr(metric, "reference_tables"))
+
+    def test_persisted(self):
+        reference_index.open(self.folder.name)
+        metric = CIDER()
+        tables = reference_index.get(metric, self.refs)
+        self.assertEqual(list(tables.ids), self.refs.ids)
+        self.assertIs(reference_index.get(metric, copy(self.refs)), tables)
+        entries = os.listdir(self.folder.name)
+        self.assertEqual(len(entries), 1)
+        self.assertTrue(entries[0].startswith("CIDER-"))
+
+        loaded = ReferenceTables.load(os.path.join(self.folder.name, entries[0]))
+        self.assertIsInstance(loaded["ref_keys"], np.memmap)
+        self.assertEqual(sorted(loaded), sorted(tables))
+        for name in tables:
+            np.testing.assert_array_equal(
+                np.asarray(loaded[name], dtype=object),
+                np.asarray(tables[name], dtype=object),
+            )
+
+        # other references or settings get their own tables
+        other_refs = copy(self.refs)
+        other_refs.assign_ids_and_unscramble(self.refs.ids[::-1])
+        reference_index.get(metric, other_refs)
+        reference_index.get(CIDER(n=2), self.refs)
+        self.assertEqual(len(os.listdir(self.folder.name)), 3)
+
+    def test_disabled(self):
+        self.assertIsNone(reference_index.get(CIDER(), self.refs))
+        reference_index.open(self.folder.name)
+        no_ids = References({"values": [{"target": TEXTS[:1]}]})
+        self.assertIsNone(reference_index.get(CIDER(), no_ids))
+        self.assertEqual(os.listdir(self.folder.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
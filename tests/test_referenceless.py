@@ -1,10 +1,18 @@
-"""Test class for metrics that don't use a reference.
-"""
+"""Test class for metrics that don't use a reference."""
+
 import unittest
+from copy import copy
 
 
 class TestReferenceLessMetric(object):
-    pass
+    def compute_metric(self, metric, predictions):
+        """Compute the corpus-level scores the way callers do (`compute_cached`, which
+        aggregates per-example scores/statistics for metrics that support caching). Works
+        on a copy, the shared test data is left as it is."""
+        predictions = copy(predictions)
+        # (default IDs if there are none)
+        predictions.assign_ids_and_unscramble(None)
+        return metric.compute_cached({}, predictions)
 
 
 if __name__ == "__main__":
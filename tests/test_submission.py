@@ -0,0 +1,254 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+from copy import copy
+from unittest import mock
+import gem_metrics
+from gem_metrics.texts import References, Submission, Texts
+from gem_metrics.tokenize import tokenization_store
+
+
+class TestSubmission(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            "submission_name": "test",
+            "param_count": 1,
+            "tasks": {
+                "common-gen_val": {
+                    "values": [
+                        {
+                            "gem_id": "a",
+                            "generated": "A text.",
+                            "concepts": ["text"],
+                            "target": "Another text.",
+                        }
+                    ]
+                },
+                "synthetic": {"values": [{"gem_id": "b", "generated": "B."}]},
+            },
+        }
+        # a bigger dataset, with references, for scoring
+        self.ids = [f"synthetic-{i}" for i in range(20)]
+        self.synthetic = {
+            "submission_name": "test",
+            "param_count": 1,
+            "tasks": {
+                "synthetic": {
+                    "values": [
+                        {"gem_id": i, "generated": self.sentence(n)}
+                        for n, i in enumerate(self.ids)
+                    ]
+                }
+            },
+        }
+        self.refs = {
+            "synthetic": References(
+                {
+                    "values": [
+                        {
+                            "gem_id": i,
+                            "target": [self.sentence(n + 1), self.sentence(n + 2)],
+                        }
+                        for n, i in enumerate(self.ids)
+                    ]
+                }
+            )
+        }
+
+    @staticmethod
+    def sentence(n: int) -> str:
+        return " ".join(f"word{(n * 7 + k) % 50}" for k in range(15)) + "."
+
+    def test_lazy_predictions(self):
+        submission = Submission(self.data)
+        self.assertEqual(submission.entries, {})
+        self.assertEqual(submission.datasets, ["common_gen_val", "synthetic"])
+
+        preds = submission.predictions_for("common_gen_val")
+        self.assertIs(submission.predictions_for("common_gen_val"), preds)
+        self.assertEqual(preds.filename, "test/common-gen_val")
+        self.assertEqual(preds.all_data, [{"gem_id": "a", "generated": "A text."}])
+        self.assertEqual(list(submission.entries), ["common_gen_val"])
+        self.assertIsNone(submission.predictions_for("missing"))
+
+        submission.entries["common_gen_val_subset"] = copy(preds)
+        submission.release("common_gen_val")
+        self.assertEqual(submission.datasets, ["synthetic", "common_gen_val_subset"])
+        self.assertIsNone(submission.predictions_for("common_gen_val"))
+
+    def test_release_after_scoring(self):
+        submission = Submission(self.synthetic)
+        args = (
+            self.refs,
+            {},
+            gem_metrics.metric_list_to_metric_dict(["bleu"]),
+            gem_metrics.metric_list_to_metric_dict(["ttr"]),
+        )
+        kwargs = {"num_threads": 1, "parallel_backend": "thread"}
+        expected = gem_metrics.process_submission(submission, *args, **kwargs)
+        self.assertEqual(submission.datasets, ["synthetic"])
+        results = gem_metrics.process_submission(
+            submission, *args, release_datasets=True, **kwargs
+        )
+        self.assertEqual(results, expected)
+        self.assertEqual(submission.datasets, [])
+
+    def test_order_and_derive(self):
+        ids = self.ids
+        expected = copy(Submission(self.synthetic).predictions_for("synthetic"))
+        expected.assign_ids_and_unscramble(ids[::-1])
+        subset = copy(expected)
+        subset.assign_ids_and_unscramble(ids[:3])
+
+        submission = Submission(self.synthetic)
+        submission.order("synthetic", ids[::-1])
+        submission.derive("synthetic_subset", "synthetic", ids[:3])
+        self.assertEqual(submission.entries, {})
+        self.assertEqual(submission.datasets, ["synthetic", "synthetic_subset"])
+        self.assertEqual(
+            submission.corpus_size("synthetic_subset"),
+            submission.corpus_size("synthetic") * 3 // len(ids),
+        )
+        # the parent's raw data is kept until the derived dataset is created
+        submission.release("synthetic")
+        self.assertIn("synthetic", submission._raw)
+        preds = submission.predictions_for("synthetic_subset")
+        self.assertEqual(preds.ids, subset.ids)
+        self.assertEqual(preds.untokenized, subset.untokenized)
+        self.assertEqual(submission._raw, {})
+
+        # ordering existing predictions applies right away
+        submission = Submission(self.synthetic)
+        submission.predictions_for("synthetic")
+        submission.order("synthetic", ids[::-1])
+        self.assertEqual(
+            submission.predictions_for("synthetic").untokenized, expected.untokenized
+        )
+
+    def test_datasets_are_created_when_processed(self):
+        def build():
+            submission = Submission(self.synthetic)
+            submission.derive("synthetic_subset", "synthetic", self.ids[:5])
+            return submission
+
+        refs = dict(self.refs, synthetic_subset=copy(self.refs["synthetic"]))
+        refs["synthetic_subset"].assign_ids_and_unscramble(self.ids[:5])
+        args = (
+            refs,
+            {},
+            gem_metrics.metric_list_to_metric_dict(["bleu", "ngrams"]),
+            gem_metrics.metric_list_to_metric_dict(["ttr"]),
+        )
+        expected = gem_metrics.process_submission(
+            build(), *args, num_threads=1, parallel_backend="thread"
+        )
+
+        context = multiprocessing.get_context()
+        pools = {"thread": ("ThreadPool", gem_metrics), "process": ("Pool", context)}
+        for backend, (pool_name, pool_owner) in pools.items():
+            with self.subTest(backend=backend):
+                tokenization_store.clear()
+                submission = build()
+                created, created_before_pool = [], []
+                create = submission.create_predictions
+                make_pool = getattr(pool_owner, pool_name)
+
+                def create_predictions(dataset_name):
+                    created.append(dataset_name)
+                    return create(dataset_name)
+
+                def pool(*args, **kwargs):
+                    created_before_pool.extend(created)
+                    return make_pool(*args, **kwargs)
+
+                with mock.patch.object(
+                    submission, "create_predictions", create_predictions
+                ), mock.patch.object(pool_owner, pool_name, pool):
+                    results = gem_metrics.process_submission(
+                        submission,
+                        *args,
+                        num_threads=2,
+                        parallel_backend=backend,
+                        release_datasets=True,
+                    )
+                self.assertEqual(results, expected)
+                self.assertEqual(list(results), list(expected))
+                # nothing is created up front (workers create their own), each
+                # dataset is created once in this process and released when done
+                self.assertEqual(created_before_pool, [])
+                self.assertEqual(created[0], "synthetic")
+                self.assertEqual(created.count("synthetic_subset"), 1)
+                self.assertEqual(submission.entries, {})
+                self.assertEqual(submission.datasets, [])
+                # along with the tokenizations of their texts
+                self.assertEqual(len(tokenization_store), 0)
+
+    def test_workers_release_done_datasets(self):
+        tokenization_store.clear()
+        submission = Submission(self.synthetic)
+        gem_metrics._WORKER_DATA.update(
+            {"outs": submission, "refs": self.refs, "srcs": {}, "own_predictions": True}
+        )
+        try:
+            preds = gem_metrics._worker_predictions("synthetic")
+            self.assertIs(gem_metrics._worker_predictions("synthetic"), preds)
+            self.assertEqual(submission.entries, {})
+            preds.list_tokenized
+            self.refs["synthetic"].list_tokenized
+            stored = len(tokenization_store)
+            self.assertGreater(stored, 0)
+
+            gem_metrics._release_worker_datasets(("other",))
+            self.assertEqual(len(tokenization_store), stored)
+            gem_metrics._release_worker_datasets(("synthetic",))
+            self.assertEqual(gem_metrics._WORKER_DATA["predictions"], {})
+            self.assertEqual(len(tokenization_store), 0)
+            self.assertEqual(self.refs["synthetic"]._views, {})
+        finally:
+            gem_metrics._WORKER_DATA.clear()
+
+
+class TestWorkerSettings(unittest.TestCase):
+    def test_settings_are_applied_in_workers(self):
+        settings = gem_metrics._global_settings()
+        changed = {
+            **settings,
+            "slim_texts": True,
+            "texts_max_bytes": 2**20,
+            "reference_index": "index",
+            "tokenize_workers": 3,
+        }
+        try:
+            gem_metrics._init_worker({"settings": changed})
+            self.assertEqual(gem_metrics._global_settings(), changed)
+        finally:
+            gem_metrics._WORKER_DATA.clear()
+            gem_metrics._apply_global_settings(settings)
+            gem_metrics.reference_index.close()
+        self.assertFalse(Texts.slim)
+
+    def test_process_files_restores_settings(self):
+        settings = gem_metrics._global_settings()
+        with tempfile.TemporaryDirectory() as folder:
+            config = gem_metrics.Config(
+                predictions_file=os.path.join(folder, "predictions.json"),
+                metric_list=["bleu"],
+                texts_memory_mb=1,
+                tokenize_workers=3,
+                tokenization_cache_folder=folder,
+                slim_texts=True,
+                wer_workers=2,
+                reference_index=True,
+            )
+            # fails after all settings are made (loading the predictions)
+            with mock.patch.object(
+                gem_metrics, "load_json", side_effect=RuntimeError
+            ), self.assertRaises(RuntimeError):
+                gem_metrics.process_files(config)
+        self.assertEqual(gem_metrics._global_settings(), settings)
+        self.assertIsNone(gem_metrics.tokenization_store.persistent)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import gc
+import tracemalloc
+import unittest
+from copy import copy
+import gem_metrics
+from gem_metrics.texts import (
+    Predictions,
+    References,
+    Submission,
+    Texts,
+    release_caches,
+    view_budget,
+)
+from gem_metrics.tokenize import tokenization_store
+
+
+class TestCachedViews(unittest.TestCase):
+    def setUp(self):
+        self.preds = Predictions(
+            {
+                "values": [
+                    {"gem_id": str(i), "generated": f"Text {w}."}
+                    for i, w in enumerate(["zero", "one", "two", "three"])
+                ]
+            }
+        )
+
+    def tearDown(self):
+        view_budget.set_limit(None)
+        release_caches()
+
+    def test_views_are_per_instance(self):
+        lower = self.preds.list_tokenized_lower
+        self.assertIs(self.preds.list_tokenized_lower, lower)
+        self.assertIn("list_tokenized_lower", self.preds._views)
+        self.preds.release()
+        self.assertEqual(self.preds._views, {})
+        self.assertEqual(self.preds.list_tokenized_lower, lower)
+
+    def test_reordering_invalidates_views(self):
+        self.assertEqual(self.preds.list_tokenized_lower[0], ["text", "zero", "."])
+        subset = copy(self.preds)
+        subset.assign_ids_and_unscramble(["3", "1"])
+        self.assertEqual(
+            subset.list_tokenized_lower, [["text", "three", "."], ["text", "one", "."]]
+        )
+        self.assertEqual(self.preds.list_tokenized_lower[0], ["text", "zero", "."])
+
+    def test_memory_budget(self):
+        self.preds.list_tokenized_lower
+        self.preds.list_tokenized_lower_nopunct
+        size = view_budget.size(self.preds, "list_tokenized_lower_nopunct")
+        # the budget covers the views and the tokenization store
+        limit = size + tokenization_store.bytes
+        view_budget.set_limit(limit)
+        # least recently used views are dropped first
+        self.assertEqual(list(self.preds._views), ["list_tokenized_lower_nopunct"])
+        self.assertLessEqual(view_budget.total_bytes, limit)
+        self.assertEqual(len(tokenization_store), 4)
+        self.assertEqual(self.preds.whitespace_tokenized[0], "Text zero .")
+        self.assertEqual(list(self.preds._views), ["whitespace_tokenized"])
+
+    def test_memory_budget_shrinks_store(self):
+        self.preds.list_tokenized_lower
+        self.assertGreater(tokenization_store.bytes, 0)
+        view_budget.set_limit(0)
+        self.assertEqual(self.preds._views, {})
+        self.assertEqual(len(tokenization_store), 0)
+        self.assertEqual(tokenization_store.bytes, 0)
+        # tokenized again on demand
+        self.assertEqual(self.preds.list_tokenized_lower[1], ["text", "one", "."])
+
+    def test_garbage_collected_views_are_forgotten(self):
+        before = view_budget.bytes
+        self.preds.list_tokenized_lower
+        self.assertGreater(view_budget.bytes, before)
+        del self.preds
+        gc.collect()
+        self.assertEqual(view_budget.bytes, before)
+
+
+class TestSlimTexts(unittest.TestCase):
+    def setUp(self):
+        self.values = [
+            {"gem_id": "a", "gem_parent_id": "p", "target": "A.", "other": [1]},
+            {"gem_id": "b", "gem_parent_id": "q", "target": "B.", "other": [2]},
+        ]
+
+    def test_same_data(self):
+        full = References({"values": self.values})
+        slim = References({"values": self.values}, slim=True)
+        self.assertEqual(full.all_data, self.values)
+        self.assertIsNone(slim.all_data)
+        for attr in ["data", "ids", "parent_ids", "multi_ref", "data_key"]:
+            self.assertEqual(getattr(slim, attr), getattr(full, attr))
+        self.assertEqual(slim.untokenized, full.untokenized)
+
+    def test_class_default(self):
+        self.assertFalse(Texts.slim)
+        Texts.slim = True
+        try:
+            self.assertIsNone(Predictions(["A.", "B."]).all_data)
+            self.assertIsNotNone(Predictions(["A.", "B."], slim=False).all_data)
+            submission = Submission(
+                {"submission_name": "test", "tasks": {"synthetic": ["A.", "B."]}}
+            )
+            preds = submission.predictions_for("synthetic")
+            self.assertIsNone(preds.all_data)
+            # the raw data is dropped too, the predictions are still available
+            self.assertEqual(submission._raw, {})
+            self.assertEqual(submission.datasets, ["synthetic"])
+            self.assertIs(submission.predictions_for("synthetic"), preds)
+        finally:
+            Texts.slim = False
+
+
+class TestMemoryRelease(unittest.TestCase):
+    def build_submission(self, seed: int, size: int = 200):
+        ids = [f"synthetic-{i}" for i in range(size)]
+        words = [f"word{seed}_{i}" for i in range(50)]
+        sentence = lambda n: " ".join(words[(n * 7 + k) % 50] for k in range(15)) + "."
+        submission = Submission(
+            {
+                "submission_name": "test",
+                "param_count": 1,
+                "tasks": {
+                    "synthetic": {
+                        "values": [
+                            {"gem_id": i, "generated": sentence(n)}
+                            for n, i in enumerate(ids)
+                        ]
+                    }
+                },
+            }
+        )
+        refs = {
+            "synthetic": References(
+                {
+                    "values": [
+                        {"gem_id": i, "target": [sentence(n + 1), sentence(n + 2)]}
+                        for n, i in enumerate(ids)
+                    ]
+                }
+            )
+        }
+        return submission, refs
+
+    def process(self, seed: int):
+        submission, refs = self.build_submission(seed)
+        gem_metrics.process_submission(
+            submission,
+            refs,
+            {},
+            gem_metrics.metric_list_to_metric_dict(["rouge", "ngrams", "cider"]),
+            gem_metrics.metric_list_to_metric_dict([]),
+            num_threads=1,
+            parallel_backend="thread",
+        )
+
+    def test_memory_returns_to_baseline(self):
+        # warm-up: imports, compiled regexes etc.
+        self.process(0)
+        release_caches()
+        gc.collect()
+
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            self.process(1)
+            peak = tracemalloc.get_traced_memory()[1]
+            release_caches()
+            gc.collect()
+            current = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(current - baseline, 0.05 * (peak - baseline))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import json
+import tempfile
+import unittest
+from copy import copy
+from functools import partial
+import nltk
+from gem_metrics.cache import open_cache
+from gem_metrics.texts import Predictions, References
+from gem_metrics.tokenize import (
+    TokenizationStore,
+    TokenizerRegistry,
+    default_tokenize_func,
+    dumb_tokenize,
+    dumb_tokenize_many,
+    tokenization_store,
+    tokenize_batch,
+    tokenizer_id,
+    tokenizer_version,
+)
+from pycountry import languages
+
+
+class TestDumbTokenize(unittest.TestCase):
+    """Compare against outputs of the original (one regex pass per rule) implementation."""
+
+    def setUp(self):
+        with open("test_data/unit_tests/dumb_tokenize.json", encoding="UTF-8") as fh:
+            self.golden = json.load(fh)["values"]
+
+    def test_golden_outputs(self):
+        for item in self.golden:
+            self.assertEqual(dumb_tokenize(item["text"]), item["tokens"], item["text"])
+
+    def test_tokenize_many(self):
+        texts = [item["text"] for item in self.golden]
+        expected = [item["tokens"] for item in self.golden]
+        self.assertEqual(dumb_tokenize_many(texts), expected)
+        self.assertEqual(tokenize_batch(dumb_tokenize, texts), expected)
+
+
+class CountingRegistry(TokenizerRegistry):
+    def __init__(self):
+        super().__init__()
+        self.loads = []
+
+    def _load(self, lang):
+        self.loads.append(self._key(lang))
+        return super()._load(lang)
+
+
+class TestTokenizerRegistry(unittest.TestCase):
+    def test_loaded_once(self):
+        registry = CountingRegistry()
+        english = languages.get(alpha_2="en")
+        func = registry.get(english)
+        self.assertIs(registry.get(languages.get(alpha_2="en")), func)
+        self.assertIs(registry.get(None), dumb_tokenize)
+        self.assertEqual(registry.loads, ["English", None])
+
+    def test_warm_up(self):
+        registry = CountingRegistry()
+        funcs = registry.warm_up(["en", "ru", "en"])
+        self.assertEqual(list(funcs), ["en", "ru"])
+        self.assertEqual(registry.loads, ["English", "Russian"])
+        self.assertIs(registry.get(languages.get(alpha_2="ru")), funcs["ru"])
+        self.assertEqual(len(registry), 2)
+
+    def test_shared_by_texts(self):
+        preds = Predictions(["a"], language="de")
+        refs = References([["b"]], language="de")
+        self.assertIs(preds.tokenize_func, refs.tokenize_func)
+        self.assertIs(
+            preds.tokenize_func, default_tokenize_func(languages.get(alpha_2="de"))
+        )
+
+
+class CountingTokenizer:
+    """Whitespace tokenizer counting its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return text.split()
+
+
+class TestTokenizationStore(unittest.TestCase):
+    def setUp(self):
+        tokenization_store.clear()
+        self.tokenizer = CountingTokenizer()
+
+    def test_tokenize_many(self):
+        store = TokenizationStore()
+        texts = ["a b", "c", "a b"]
+        self.assertEqual(
+            store.tokenize_many(self.tokenizer, texts), [["a", "b"], ["c"], ["a", "b"]]
+        )
+        self.assertEqual(self.tokenizer.calls, 2)
+        self.assertEqual(store.tokenize(self.tokenizer, "c"), ["c"])
+        self.assertEqual(self.tokenizer.calls, 2)
+        self.assertEqual(len(store), 2)
+
+    def test_discard_many(self):
+        store = TokenizationStore()
+        store.tokenize_many(self.tokenizer, ["a b", "c", "d e f"])
+        size = store.bytes
+        store.discard_many(self.tokenizer, ["a b", "d e f", "missing"])
+        self.assertEqual(len(store), 1)
+        self.assertLess(store.bytes, size)
+        store.discard_many(dumb_tokenize, ["c"])
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.tokenize(self.tokenizer, "a b"), ["a", "b"])
+        self.assertEqual(self.tokenizer.calls, 4)
+
+    def test_copies_share_tokenization(self):
+        refs = References([["a b", "c d"], ["e f g"]])
+        refs.tokenize_func = self.tokenizer
+        self.assertEqual(
+            refs.list_tokenized, [[["a", "b"], ["c", "d"]], [["e", "f", "g"]]]
+        )
+        self.assertEqual(self.tokenizer.calls, 3)
+
+        refs_copy = copy(refs)
+        refs_copy.assign_ids_and_unscramble(None)
+        self.assertEqual(refs_copy.list_tokenized_lower, refs.list_tokenized_lower)
+        self.assertEqual(self.tokenizer.calls, 3)
+
+    def test_tokenizer_id(self):
+        self.assertEqual(
+            tokenizer_id(partial(dumb_tokenize)), tokenizer_id(partial(dumb_tokenize))
+        )
+        self.assertNotEqual(
+            tokenizer_id(partial(dumb_tokenize, "x")), tokenizer_id(dumb_tokenize)
+        )
+
+    def test_persistent_cache(self):
+        texts = ["a b", "", "c"]
+        tokenizer = lambda text: text.split() if text else [""]  # noqa: E731
+        with tempfile.TemporaryDirectory() as folder:
+            cache = open_cache(folder)
+            store = TokenizationStore(persistent=cache)
+            expected = store.tokenize_many(tokenizer, texts)
+            self.assertEqual(len(cache), 3)
+
+            # a new store (= a new run) reads everything from the cache
+            store = TokenizationStore(persistent=cache)
+            self.assertEqual(store.tokenize_many(tokenizer, texts), expected)
+            self.assertEqual(store.persistent_hits, 3)
+            self.assertEqual(expected[1], [""])
+            # other tokenizers are cached separately
+            store.tokenize_many(self.tokenizer, texts)
+            self.assertEqual(self.tokenizer.calls, 3)
+            cache.close()
+
+    def test_tokenizer_version(self):
+        self.assertEqual(tokenizer_version(partial(dumb_tokenize)), "1")
+        self.assertEqual(
+            tokenizer_version(partial(nltk.word_tokenize)), nltk.__version__
+        )
+
+    def test_texts_tokenization(self):
+        preds = Predictions(["Hello, world!", "Hello, world!"])
+        self.assertEqual(preds.list_tokenized_lower_nopunct, [["hello", "world"]] * 2)
+
+
+class TestParallelTokenization(unittest.TestCase):
+    TEXTS = [
+        f"Sentence number {i}, with ({i % 7}) tokens -- isn't it?" for i in range(50)
+    ]
+
+    def test_same_as_serial(self):
+        serial = [dumb_tokenize(text) for text in self.TEXTS]
+        self.assertEqual(
+            tokenize_batch(dumb_tokenize, self.TEXTS, num_workers=3, min_parallel=0),
+            serial,
+        )
+        # below the threshold and with unpicklable tokenizers, it stays serial
+        tokenizer = CountingTokenizer()
+        tokenize_batch(tokenizer, self.TEXTS, num_workers=3)
+        self.assertEqual(tokenizer.calls, len(self.TEXTS))
+        self.assertEqual(
+            tokenize_batch(lambda t: t.split(), self.TEXTS, 3, min_parallel=0),
+            [text.split() for text in self.TEXTS],
+        )
+
+    def test_store(self):
+        store = TokenizationStore(num_workers=2, min_parallel=0)
+        self.assertEqual(
+            store.tokenize_many(dumb_tokenize, self.TEXTS + self.TEXTS[:10]),
+            [dumb_tokenize(text) for text in self.TEXTS + self.TEXTS[:10]],
+        )
+        self.assertEqual(store.misses, len(self.TEXTS))
+
+
+if __name__ == "__main__":
+    unittest.main()
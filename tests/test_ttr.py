@@ -18,14 +18,16 @@ class TestTTR(TestReferenceLessMetric, unittest.TestCase):
 
         expected_metrics = {"ttr": 0.72414}
 
-        calculated_metrics = self.metric.compute({}, TestData.predictions)
+        calculated_metrics = self.compute_metric(self.metric, TestData.predictions)
         assertDeepAlmostEqual(self, expected_metrics, calculated_metrics)
 
     def test_ttr_metric_empty(self):
         """Tests with list of empty sentences."""
         text = ["", ""]
 
-        calculated_metrics = self.metric.compute({}, Predictions({"values": text}))
+        calculated_metrics = self.compute_metric(
+            self.metric, Predictions({"values": text})
+        )
 
         self.assertTrue(math.isnan(calculated_metrics["ttr"]))
 
@@ -37,7 +39,7 @@ class TestTTR(TestReferenceLessMetric, unittest.TestCase):
         ]
 
         metric = TTR()
-        calculated_metrics = metric.compute({}, Predictions({"values": text}))
+        calculated_metrics = self.compute_metric(metric, Predictions({"values": text}))
         self.assertAlmostEqual(calculated_metrics[f"ttr"], 1)
 
     def test_ttr_identical_tokens(self):
@@ -50,7 +52,7 @@ class TestTTR(TestReferenceLessMetric, unittest.TestCase):
         ]
 
         metric = TTR()
-        calculated_metrics = metric.compute({}, Predictions({"values": text}))
+        calculated_metrics = self.compute_metric(metric, Predictions({"values": text}))
         self.assertAlmostEqual(
             calculated_metrics[f"ttr"], round(1 / sum(len(s.split()) for s in text), 5)
         )
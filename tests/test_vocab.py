@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+from gem_metrics.texts import References
+from gem_metrics.vocab import TokenArray, Vocabulary
+
+
+class TestTokenArray(unittest.TestCase):
+    def setUp(self):
+        self.refs = References(
+            [["The cat sat .", "A cat , sat !"], ["!"], ["Cat, cat and CAT."]]
+        )
+
+    def test_lists_match_tokenization(self):
+        lower = [
+            [[w.lower() for w in ref] for ref in inst] for inst in self.refs._tokenized
+        ]
+        self.assertEqual(self.refs.list_tokenized_lower, lower)
+        self.assertEqual(
+            self.refs.list_tokenized_lower_nopunct,
+            [
+                [[w for w in ref if w not in References.PUNCTUATION] for ref in inst]
+                for inst in lower
+            ],
+        )
+        self.assertEqual(self.refs.token_array.to_lists(), self.refs.list_tokenized)
+
+    def test_arrays(self):
+        tokens = self.refs.token_array_lower_nopunct
+        self.assertEqual(len(tokens), 3)
+        self.assertEqual(tokens.num_sentences, 4)
+        self.assertEqual(tokens.ids.dtype, np.int32)
+        self.assertEqual(len(tokens.instance(1)[0]), 0)
+        cat = tokens.instance(0)[0][1]
+        self.assertTrue(all(ids[0] == cat for ids in tokens.instance(2)))
+        # offsets are shared by the lowercased version
+        self.assertIs(
+            self.refs.token_array_lower.offsets, self.refs.token_array.offsets
+        )
+
+    def test_vocabulary(self):
+        vocab = Vocabulary()
+        tokens = TokenArray.from_lists(vocab, [["Cat", "cat", "."], ["CAT"]])
+        self.assertEqual(len(vocab), 4)
+        self.assertEqual(tokens.ids.tolist(), [1, 0, 2, 3])
+        self.assertEqual(tokens.lower().ids.tolist(), [0, 0, 2, 0])
+        self.assertEqual(tokens.without_punct().to_lists(), [["Cat", "cat"], ["CAT"]])
+        # interned strings are shared by all views
+        lists = tokens.lower().to_lists()
+        self.assertIs(lists[0][0], lists[1][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
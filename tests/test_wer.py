@@ -1,5 +1,8 @@
 import unittest
+from functools import partial
+from unittest import mock
 import gem_metrics.wer
+from gem_metrics.texts import Predictions, References
 from tests.test_referenced import TestReferencedMetric
 
 
@@ -12,6 +15,37 @@ class TestWer(TestReferencedMetric, unittest.TestCase):
         self.true_results_mismatched_pred_ref = {"wer": 102.38095}
         self.true_results_empty_pred = {"wer": 100.0}
 
+    def test_long_texts(self):
+        # edit distances over 255 tokens used to overflow
+        ref = " ".join(f"w{i}" for i in range(600))
+        preds = Predictions([ref, " ".join(f"x{i}" for i in range(300))])
+        preds.ids = ["a", "b"]
+        refs = References([ref, ref])
+        scores = self.metric.compute(None, preds, refs)
+        self.assertEqual(
+            scores,
+            {
+                "a": {"wer": 0.0, "edits": 0, "ref_len": 600},
+                "b": {"wer": 100.0, "edits": 600, "ref_len": 600},
+            },
+        )
+        self.assertEqual(
+            self.metric._aggregate_scores(list(scores.values())), {"wer": 50.0}
+        )
+
+    def test_sharded(self):
+        preds = Predictions([f"text {i} a b" for i in range(40)])
+        preds.ids = [str(i) for i in range(40)]
+        refs = References([[f"text {i % 7} a", "a b c"] for i in range(40)])
+        expected = self.metric.compute(None, preds, refs)
+        sharded = gem_metrics.wer.WER(num_workers=2)
+        with mock.patch.object(
+            gem_metrics.wer,
+            "word_error_stats",
+            partial(gem_metrics.wer.word_error_stats, min_parallel=0),
+        ):
+            self.assertEqual(sharded.compute(None, preds, refs), expected)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -15,14 +15,16 @@ class TestYULES_I(TestReferenceLessMetric, unittest.TestCase):
         """Tests for the base case."""
         expected_metrics = {"yules_i": 16.962}
 
-        calculated_metrics = self.metric.compute({}, TestData.predictions)
+        calculated_metrics = self.compute_metric(self.metric, TestData.predictions)
         assertDeepAlmostEqual(self, expected_metrics, calculated_metrics)
 
     def test_yules_i_metric_empty(self):
         """Tests with empty inputs"""
         text = ["", ""]
 
-        calculated_metrics = self.metric.compute({}, Predictions({"values": text}))
+        calculated_metrics = self.compute_metric(
+            self.metric, Predictions({"values": text})
+        )
 
         self.assertAlmostEqual(calculated_metrics[f"yules_i"], 0)
 
@@ -33,7 +35,7 @@ class TestYULES_I(TestReferenceLessMetric, unittest.TestCase):
             "eleven twelve thirteen fourteen fifteen sixteen",
         ]
         metric = Yules_I()
-        calculated_metrics = metric.compute({}, Predictions({"values": text}))
+        calculated_metrics = self.compute_metric(metric, Predictions({"values": text}))
         self.assertAlmostEqual(calculated_metrics[f"yules_i"], 0.0)
 
     def test_yules_i_mixed_tokens(self):
@@ -43,7 +45,7 @@ class TestYULES_I(TestReferenceLessMetric, unittest.TestCase):
             "six seven eight eight nine ten ten ten ten",
         ]
         metric = Yules_I()
-        calculated_metrics = metric.compute({}, Predictions({"values": text}))
+        calculated_metrics = self.compute_metric(metric, Predictions({"values": text}))
         self.assertAlmostEqual(calculated_metrics[f"yules_i"], 2.857)
 
     def test_yules_i_identical_tokens(self):
@@ -53,7 +55,7 @@ class TestYULES_I(TestReferenceLessMetric, unittest.TestCase):
             "token token token token token token token token token token token token token",
         ]
         metric = Yules_I()
-        calculated_metrics = metric.compute({}, Predictions({"values": text}))
+        calculated_metrics = self.compute_metric(metric, Predictions({"values": text}))
         self.assertAlmostEqual(calculated_metrics[f"yules_i"], 0.001)
 
 